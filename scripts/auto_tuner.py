@@ -4,11 +4,14 @@ Autonomous Emotion Recognition Testing Pipeline - Auto-Tuner
 Automatically adjusts model parameters and triggers retraining.
 """
 
+import copy
 import json
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, replace
+
+from background_writer import BackgroundWriter, persist_json
 
 from pipeline_config import (
     EMOTION_LABELS, CNN_MODEL_PATH, SCRIPTS_DIR,
@@ -51,15 +54,24 @@ class AutoTuner:
     - Retraining orchestration
     """
     
-    def __init__(self, cycle_number: int = 1):
+    def __init__(self, cycle_number: int = 1, state: Optional[TuningState] = None,
+                 writer: Optional[BackgroundWriter] = None):
         """
         Initialize the auto-tuner.
         
         Args:
             cycle_number: Current training cycle number
+            state: Tuning state carried over from the previous cycle's tuner
+                (None = load it from tuning_state.json)
+            writer: Background writer for the state and summary files
+                (None = write them before returning)
         """
         self.cycle_number = cycle_number
-        self.state = self._load_or_init_state()
+        self.writer = writer
+        if state is not None:
+            self.state = replace(state, cycle_number=cycle_number)
+        else:
+            self.state = self._load_or_init_state()
         self.actions: List[TuningAction] = []
         
     def _load_or_init_state(self) -> TuningState:
@@ -80,31 +92,34 @@ class AutoTuner:
                 history=data.get("history", []),
             )
         else:
-            return TuningState(
-                cycle_number=self.cycle_number,
-                confidence_thresholds={e: 0.75 for e in EMOTION_LABELS},
-                class_weights={e: 1.0 for e in EMOTION_LABELS},
-                augmentation_targets=[],
-                last_accuracy=0.0,
-                history=[],
-            )
+            return self.default_state(self.cycle_number)
+    
+    @staticmethod
+    def default_state(cycle_number: int = 1) -> TuningState:
+        """Initial tuning state, before any cycle has been tuned."""
+        return TuningState(
+            cycle_number=cycle_number,
+            confidence_thresholds={e: 0.75 for e in EMOTION_LABELS},
+            class_weights={e: 1.0 for e in EMOTION_LABELS},
+            augmentation_targets=[],
+            last_accuracy=0.0,
+            history=[],
+        )
     
     def _save_state(self):
         """Save current tuning state."""
         state_path = REPORTS_DIR / "tuning_state.json"
-        state_path.parent.mkdir(parents=True, exist_ok=True)
         
-        data = {
+        # Snapshot: the state keeps changing while a background write is pending
+        data = copy.deepcopy({
             "cycle_number": self.state.cycle_number,
             "confidence_thresholds": self.state.confidence_thresholds,
             "class_weights": self.state.class_weights,
             "augmentation_targets": self.state.augmentation_targets,
             "last_accuracy": self.state.last_accuracy,
             "history": self.state.history,
-        }
-        
-        with open(state_path, "w") as f:
-            json.dump(data, f, indent=2)
+        })
+        persist_json(state_path, data, writer=self.writer)
     
     def load_results(self) -> Dict:
         """Load evaluation results for current cycle."""
@@ -321,10 +336,16 @@ class AutoTuner:
         
         return False, "No retraining needed"
     
-    def tune(self) -> Dict:
+    def tune(self, results: Optional[Dict] = None, analysis: Optional[Dict] = None) -> Dict:
         """
         Perform complete auto-tuning based on latest results.
         
+        Args:
+            results: Evaluation results handed over in memory (None = load
+                them from the cycle's results file)
+            analysis: Failure analysis handed over in memory (None = load it
+                from the cycle's analysis file, if any)
+        
         Returns:
             Dictionary with tuning summary
         """
@@ -332,9 +353,11 @@ class AutoTuner:
         print(f"🔧 Auto-Tuning - Cycle {self.cycle_number}")
         print("=" * 60)
         
-        # Load data
-        results = self.load_results()
-        analysis = self.load_analysis()
+        # Load data not handed over
+        if results is None:
+            results = self.load_results()
+        if analysis is None:
+            analysis = self.load_analysis()
         
         # Perform tuning actions
         threshold_actions = self.adjust_thresholds(results, analysis)
@@ -384,10 +407,7 @@ class AutoTuner:
     def _save_summary(self, summary: Dict):
         """Save tuning summary."""
         summary_path = REPORTS_DIR / f"cycle_{self.cycle_number:03d}_tuning.json"
-        summary_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        with open(summary_path, "w") as f:
-            json.dump(summary, f, indent=2)
+        persist_json(summary_path, copy.deepcopy(summary), writer=self.writer)
         
         print(f"💾 Tuning summary saved to: {summary_path}")
     
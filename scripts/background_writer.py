@@ -0,0 +1,143 @@
+"""
+Autonomous Emotion Recognition Testing Pipeline - Background Writer
+===================================================================
+Asynchronous persistence for the main loop.
+
+When phases hand their outputs to each other in memory, files are only
+needed for inspection, resuming and the final report. Persistence jobs
+(metadata stores, results, analyses, tuning state) are queued to a single
+background thread that runs them in submission order, so serialization
+overlaps the next phase instead of adding to the cycle's wall time. JSON
+is written to a temporary file and renamed, so readers never see a
+partial file.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, List, Optional, Tuple
+
+from pipeline_config import WRITER_QUEUE_DEPTH
+
+
+_STOP = object()  # Shutdown marker
+
+
+def write_json(path: Path, data: Any, indent: Optional[int] = 2):
+    """Write JSON atomically (temporary file + rename)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, "w") as f:
+        json.dump(data, f, indent=indent)
+    os.replace(temp_path, path)
+
+
+class BackgroundWriter:
+    """Runs persistence jobs on one background thread, in submission order."""
+    
+    def __init__(self, queue_depth: int = WRITER_QUEUE_DEPTH):
+        """
+        Start the writer thread.
+        
+        Args:
+            queue_depth: Pending jobs before submit blocks (bounds the memory
+                held by queued payloads)
+        """
+        self._queue: queue.Queue = queue.Queue(max(1, queue_depth))
+        self._errors: List[Tuple[str, BaseException]] = []
+        self._closed = False
+        self.jobs = 0
+        self.busy_s = 0.0     # Time spent running jobs
+        self.blocked_s = 0.0  # Time submitters waited on a full queue
+        self._thread = threading.Thread(target=self._run, name="background-writer", daemon=True)
+        self._thread.start()
+    
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is _STOP:
+                    return
+                fn, args, description = job
+                start_time = time.perf_counter()
+                try:
+                    fn(*args)
+                except BaseException as e:
+                    self._errors.append((description, e))
+                self.busy_s += time.perf_counter() - start_time
+                self.jobs += 1
+            finally:
+                self._queue.task_done()
+    
+    def submit(self, fn: Callable, *args, description: str = ""):
+        """
+        Queue a job.
+        
+        The arguments must not be mutated afterwards; the job may run at any
+        later time.
+        
+        Args:
+            fn: Callable to run on the writer thread
+            *args: Its arguments
+            description: Name of the job for error messages
+        """
+        if self._closed:
+            raise RuntimeError("BackgroundWriter is closed")
+        start_time = time.perf_counter()
+        self._queue.put((fn, args, description or getattr(fn, "__name__", "job")))
+        self.blocked_s += time.perf_counter() - start_time
+    
+    def write_json(self, path: Path, data: Any, indent: Optional[int] = 2):
+        """Queue an atomic JSON write of ``data`` to ``path``."""
+        self.submit(write_json, path, data, indent, description=str(path))
+    
+    def flush(self):
+        """
+        Wait for all queued jobs.
+        
+        Raises:
+            RuntimeError: If a job failed (chained to the first failure)
+        """
+        self._queue.join()
+        if self._errors:
+            description, error = self._errors[0]
+            failed = len(self._errors)
+            self._errors = []
+            raise RuntimeError(f"Background write failed ({failed} job(s)): {description}") from error
+    
+    def close(self):
+        """Flush and stop the writer thread."""
+        if self._closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self._closed = True
+            self._queue.put(_STOP)
+            self._thread.join()
+    
+    def __enter__(self) -> "BackgroundWriter":
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+def persist(fn: Callable, *args, writer: Optional[BackgroundWriter] = None, description: str = ""):
+    """Run a persistence job now, or queue it when a writer is given."""
+    if writer is None:
+        fn(*args)
+    else:
+        writer.submit(fn, *args, description=description)
+
+
+def persist_json(path: Path, data: Any, writer: Optional[BackgroundWriter] = None, indent: Optional[int] = 2):
+    """Write JSON now, or queue the write when a writer is given."""
+    if writer is None:
+        write_json(path, data, indent)
+    else:
+        writer.write_json(path, data, indent)
@@ -0,0 +1,294 @@
+"""
+Autonomous Emotion Recognition Testing Pipeline - Model Benchmark
+=================================================================
+Compares CNN architectures and quantization variants on a fixed generated
+cycle.
+
+Each architecture/width (see create_model.ARCHITECTURES) is built once and
+converted into each variant (fp32, fp16, dynamic-range, full-int8), then
+evaluated twice with ModelEvaluator: unbatched for single-sample latency
+percentiles and batched for throughput. The table reports parameters, FLOPs,
+model size, load time, latency, throughput and accuracy relative to the
+first model, and the fastest model meeting TARGET_OVERALL_ACCURACY is
+recommended.
+"""
+
+import argparse
+import json
+import sys
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from pipeline_config import (
+    BENCHMARK_CYCLE, BENCHMARK_SEED, BENCHMARK_DIR, EVAL_BATCH_SIZE,
+    REPORTS_DIR, TARGET_OVERALL_ACCURACY, get_metadata_store_path
+)
+from create_model import (
+    ARCHITECTURES, QUANTIZATION_VARIANTS, build_keras_model, convert_model, model_cost,
+    representative_dataset
+)
+from data_generator import DataGenerator
+from inference_backend import write_quantization_params
+from model_evaluator import ModelEvaluator
+
+
+@dataclass
+class VariantBenchmark:
+    """Benchmark results of one model variant."""
+    variant: str
+    model_path: str
+    size_kb: float
+    load_ms: float
+    latency_ms: Dict[str, float]  # Single-sample invoke p50/p90/p95/p99/max
+    throughput_sps: float          # Batched invoke throughput, samples/s
+    accuracy: float
+    accuracy_delta: float = 0.0    # Versus the baseline model
+    architecture: str = "minixception"
+    width: float = 1.0
+    params: int = 0
+    flops: int = 0                 # Estimated, per inference
+    
+    @property
+    def label(self) -> str:
+        return f"{self.architecture}@{self.width:g}/{self.variant}"
+
+
+def ensure_benchmark_cycle(cycle_number: int = BENCHMARK_CYCLE, seed: int = BENCHMARK_SEED):
+    """Generate the fixed benchmark cycle unless it already exists."""
+    if get_metadata_store_path(cycle_number).exists():
+        return
+    DataGenerator(cycle_number=cycle_number, seed=seed, reuse_samples=False).generate_all_emotions()
+
+
+def build_variants(variants: List[str], output_dir: Path = BENCHMARK_DIR,
+                   cycle_number: int = BENCHMARK_CYCLE, architecture: str = "minixception",
+                   width: float = 1.0) -> Dict[str, Path]:
+    """
+    Convert one architecture into each variant.
+    
+    Args:
+        variants: Names from QUANTIZATION_VARIANTS
+        output_dir: Directory for the .tflite files
+        cycle_number: Cycle providing int8 calibration data
+        architecture: Name from ARCHITECTURES
+        width: Width multiplier
+    
+    Returns:
+        {variant: model path}
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    model = build_keras_model(architecture, width)
+    
+    paths = {}
+    for variant in variants:
+        representative = representative_dataset([cycle_number]) if variant == "int8" else None
+        model_bytes = convert_model(model, variant, representative)
+        
+        path = output_dir / f"cnn_{architecture}_w{width:g}_{variant}.tflite"
+        path.write_bytes(model_bytes)
+        paths[variant] = path
+        print(f"✅ Built {architecture}@{width:g}/{variant}: {path} ({len(model_bytes) / 1024:.1f} KB)")
+        if variant == "int8":
+            print(f"   Quantization params: {write_quantization_params(path)}")
+    
+    return paths
+
+
+def benchmark_variant(variant: str, model_path: Path, cycle_number: int = BENCHMARK_CYCLE,
+                      batch_size: int = EVAL_BATCH_SIZE,
+                      num_threads: Optional[int] = None) -> VariantBenchmark:
+    """
+    Evaluate one variant unbatched and batched on the benchmark cycle.
+    
+    Args:
+        variant: Variant name
+        model_path: Path to its .tflite file
+        cycle_number: Benchmark cycle
+        batch_size: Batch size of the throughput run
+        num_threads: Interpreter threads (None = runtime default)
+    
+    Returns:
+        VariantBenchmark
+    
+    Raises:
+        RuntimeError: If no TFLite runtime is available
+    """
+    runs = {}
+    for run_batch_size in (1, batch_size):
+        evaluator = ModelEvaluator(cycle_number, reuse_samples=False, batch_size=run_batch_size,
+                                   num_threads=num_threads, workers=1, model="tflite",
+                                   prefetch_threads=0, model_path=model_path)
+        results = evaluator.evaluate_cycle()
+        if results.backend == "mock":
+            raise RuntimeError("No TFLite runtime available; install ai-edge-litert or tflite-runtime")
+        runs[run_batch_size] = (results, evaluator.stage_latency.get("invoke"))
+    
+    single, _ = runs[1]
+    batched, batched_invoke = runs[batch_size]
+    throughput = batched_invoke.count / (batched_invoke.total_ms / 1000) if batched_invoke.total_ms else 0.0
+    
+    return VariantBenchmark(
+        variant=variant,
+        model_path=str(model_path),
+        size_kb=model_path.stat().st_size / 1024,
+        load_ms=single.model_load_ms,
+        latency_ms=single.latency_percentiles_ms,
+        throughput_sps=throughput,
+        accuracy=batched.overall_accuracy,
+    )
+
+
+def print_table(benchmarks: List[VariantBenchmark], batch_size: int = EVAL_BATCH_SIZE):
+    """Print the comparison table."""
+    print("=" * 137)
+    print("📊 Model Benchmark")
+    print("=" * 137)
+    print(f"{'Model':<30}{'Params':>11}{'MFLOPs':>9}{'Size KB':>10}{'Load ms':>10}{'p50 ms':>9}"
+          f"{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}{f'Thru/s (b{batch_size})':>16}{'Accuracy':>10}{'Delta':>8}")
+    for b in benchmarks:
+        print(f"{b.label:<30}{b.params:>11,}{b.flops / 1e6:>9.1f}{b.size_kb:>10.1f}{b.load_ms:>10.1f}"
+              f"{b.latency_ms['p50']:>9.3f}{b.latency_ms['p90']:>9.3f}{b.latency_ms['p99']:>9.3f}"
+              f"{b.latency_ms['max']:>9.3f}{b.throughput_sps:>16.0f}{b.accuracy * 100:>9.1f}%"
+              f"{b.accuracy_delta * 100:>+7.1f}%")
+    print("=" * 137)
+
+
+def select_model(benchmarks: List[VariantBenchmark],
+                 target_accuracy: float = TARGET_OVERALL_ACCURACY) -> Optional[VariantBenchmark]:
+    """
+    Pick the fastest model that meets the accuracy target.
+    
+    Args:
+        benchmarks: Benchmarked models
+        target_accuracy: Minimum overall accuracy
+    
+    Returns:
+        The qualifying model with the lowest single-sample p50 latency, or
+        None if no model meets the target
+    """
+    qualifying = [b for b in benchmarks if b.accuracy >= target_accuracy]
+    return min(qualifying, key=lambda b: b.latency_ms["p50"], default=None)
+
+
+def run_benchmark(variants: List[str] = QUANTIZATION_VARIANTS, cycle_number: int = BENCHMARK_CYCLE,
+                  batch_size: int = EVAL_BATCH_SIZE, num_threads: Optional[int] = None,
+                  architectures: List[str] = ("minixception",),
+                  widths: List[float] = (1.0,)) -> List[VariantBenchmark]:
+    """
+    Build, evaluate and compare every architecture/width/variant combination.
+    
+    Args:
+        variants: Variants to benchmark
+        cycle_number: Fixed generated cycle to evaluate on
+        batch_size: Batch size of the throughput runs
+        num_threads: Interpreter threads (None = runtime default)
+        architectures: Architectures to benchmark
+        widths: Width multipliers to benchmark each architecture at
+    
+    Returns:
+        List of VariantBenchmark, architecture-major; accuracy deltas are
+        relative to the first
+    """
+    ensure_benchmark_cycle(cycle_number)
+    
+    benchmarks = []
+    for architecture in architectures:
+        for width in widths:
+            cost = model_cost(architecture, width)
+            paths = build_variants(variants, cycle_number=cycle_number, architecture=architecture, width=width)
+            for variant in variants:
+                benchmark = benchmark_variant(variant, paths[variant], cycle_number, batch_size, num_threads)
+                benchmark.architecture = architecture
+                benchmark.width = width
+                benchmark.params = cost["params"]
+                benchmark.flops = cost["flops"]
+                benchmarks.append(benchmark)
+    for b in benchmarks:
+        b.accuracy_delta = b.accuracy - benchmarks[0].accuracy
+    
+    print_table(benchmarks, batch_size)
+    
+    selected = select_model(benchmarks)
+    if selected:
+        print(f"🏆 Fastest model meeting {TARGET_OVERALL_ACCURACY * 100:.0f}% accuracy: {selected.label} "
+              f"(p50 {selected.latency_ms['p50']:.3f} ms, {selected.accuracy * 100:.1f}%)")
+    else:
+        print(f"⚠️  No model meets the {TARGET_OVERALL_ACCURACY * 100:.0f}% accuracy target")
+    
+    REPORTS_DIR.mkdir(parents=True, exist_ok=True)
+    report_path = REPORTS_DIR / f"model_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(report_path, "w") as f:
+        json.dump({
+            "cycle_number": cycle_number,
+            "batch_size": batch_size,
+            "num_threads": num_threads,
+            "baseline": benchmarks[0].label,
+            "target_accuracy": TARGET_OVERALL_ACCURACY,
+            "selected": selected.label if selected else None,
+            "variants": [{"label": b.label, **asdict(b)} for b in benchmarks],
+        }, f, indent=2)
+    print(f"💾 Benchmark saved to: {report_path}")
+    
+    return benchmarks
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark architectures and quantization variants of the emotion CNN"
+    )
+    parser.add_argument(
+        "--architectures",
+        nargs="+",
+        choices=ARCHITECTURES,
+        default=["minixception"],
+        help="Architectures to benchmark (default: minixception)"
+    )
+    parser.add_argument(
+        "--widths",
+        type=float,
+        nargs="+",
+        default=[1.0],
+        help="Width multipliers to benchmark each architecture at (default: 1.0)"
+    )
+    parser.add_argument(
+        "--variants",
+        nargs="+",
+        choices=QUANTIZATION_VARIANTS,
+        default=QUANTIZATION_VARIANTS,
+        help="Variants to benchmark (default: all)"
+    )
+    parser.add_argument(
+        "--cycle",
+        type=int,
+        default=BENCHMARK_CYCLE,
+        help=f"Generated cycle to evaluate on (default: {BENCHMARK_CYCLE})"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=EVAL_BATCH_SIZE,
+        help=f"Batch size of the throughput runs (default: {EVAL_BATCH_SIZE})"
+    )
+    parser.add_argument(
+        "--num-threads",
+        type=int,
+        default=None,
+        help="Interpreter threads (default: runtime default)"
+    )
+    
+    args = parser.parse_args()
+    
+    try:
+        run_benchmark(args.variants, args.cycle, args.batch_size, args.num_threads,
+                      args.architectures, args.widths)
+    except (ImportError, RuntimeError) as e:
+        print(f"❌ Benchmark failed: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
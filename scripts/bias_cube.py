@@ -0,0 +1,369 @@
+"""
+Autonomous Emotion Recognition Testing Pipeline - Bias Cube
+===========================================================
+Precomputed count cube for intersectional bias analysis.
+
+Every evaluated sample is counted once into a cell indexed by its category
+on each metadata dimension, its true emotion and its predicted emotion (plus
+a slot for no prediction). Most of the millions of possible cells are empty,
+so only the non-empty ones are kept, counted with a single ``np.unique``
+and persisted per cycle; any combination of dimensions (e.g. dark skin x low
+lighting x partial-profile) can then be rolled up, sliced and compared
+without touching the per-sample results again. Only roll-ups are dense.
+"""
+
+import itertools
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from pipeline_config import (
+    EMOTION_LABELS, DEMOGRAPHICS, ENVIRONMENTAL_VARIATIONS, ACCESSORIES,
+    BIAS_THRESHOLD, BIAS_CUBE_MAX_ORDER, BIAS_CUBE_MIN_SAMPLES, get_bias_cube_path
+)
+
+
+# Metadata columns spanned by the cube, with their expected categories
+CUBE_DIMENSIONS = {
+    "skin_tone": DEMOGRAPHICS["skin_tone"],
+    "age_group": DEMOGRAPHICS["age_group"],
+    "gender": DEMOGRAPHICS["gender"],
+    "face_shape": DEMOGRAPHICS["face_shape"],
+    "lighting_condition": ENVIRONMENTAL_VARIATIONS["lighting"],
+    "head_pose": ENVIRONMENTAL_VARIATIONS["head_pose"],
+    "background": ENVIRONMENTAL_VARIATIONS["background"],
+    "glasses": ACCESSORIES["glasses"],
+}
+
+NO_PREDICTION = len(EMOTION_LABELS)  # Predicted-emotion slot for samples with no prediction
+
+
+@dataclass
+class IntersectionalCell:
+    """A combination of metadata categories and its accuracy."""
+    categories: Dict[str, str]  # {dimension: category}
+    samples: int
+    accuracy: float
+    gap: float                  # Overall accuracy minus cell accuracy
+    marginal_gap: float         # Largest gap of the cell's single categories
+    top_confusion: Optional[str] = None  # Most frequent "true->predicted" error
+
+
+class BiasCube:
+    """
+    Sparse sample counts over metadata dimensions x true x predicted emotion.
+    
+    The cube has one axis per dimension (in ``dimensions`` order), then the
+    true emotion (EMOTION_LABELS) and the predicted emotion (EMOTION_LABELS
+    plus NO_PREDICTION). ``cells`` holds the flat indices of its non-empty
+    cells into ``shape`` and ``cell_counts`` their counts.
+    """
+    
+    def __init__(self, cycle_number: int, dimensions: Dict[str, List[str]],
+                 cells: np.ndarray, cell_counts: np.ndarray):
+        """
+        Wrap already-counted cells.
+        
+        Args:
+            cycle_number: Cycle the counts belong to
+            dimensions: {dimension: categories}, in axis order
+            cells: Flat indices of the non-empty cells (see class docstring)
+            cell_counts: Sample count of each cell
+        """
+        self.cycle_number = cycle_number
+        self.dimensions = dict(dimensions)
+        self.shape = tuple(len(c) for c in self.dimensions.values()) + (len(EMOTION_LABELS), NO_PREDICTION + 1)
+        self.cells = np.asarray(cells, dtype=np.int64)
+        self.cell_counts = np.asarray(cell_counts, dtype=np.int32)
+        self._coordinates: Optional[Tuple[np.ndarray, ...]] = None
+        
+        # Correct/total per metadata cell, shared by every roll-up
+        metadata_cells, emotion_cells = np.divmod(self.cells, len(EMOTION_LABELS) * (NO_PREDICTION + 1))
+        true, predicted = np.divmod(emotion_cells, NO_PREDICTION + 1)
+        self._total = self._sum_into(metadata_cells, self.cell_counts, self.shape[:-2])
+        self._correct = self._sum_into(metadata_cells[true == predicted], self.cell_counts[true == predicted],
+                                       self.shape[:-2])
+    
+    @classmethod
+    def build(cls, cycle_number: int, true_index: np.ndarray, predicted_index: np.ndarray,
+              dimension_codes: Dict[str, np.ndarray],
+              dimensions: Dict[str, List[str]] = CUBE_DIMENSIONS) -> "BiasCube":
+        """
+        Count samples into a cube in one vectorized pass.
+        
+        Samples with an unknown true emotion, or without a known category on
+        every dimension, are left out.
+        
+        Args:
+            cycle_number: Cycle of the results
+            true_index: Index into EMOTION_LABELS per sample (-1 = unknown)
+            predicted_index: Index into EMOTION_LABELS per sample (-1 = none)
+            dimension_codes: {dimension: index into its categories, -1 = none}
+            dimensions: {dimension: categories} to span
+        
+        Returns:
+            BiasCube
+        """
+        shape = tuple(len(c) for c in dimensions.values()) + (len(EMOTION_LABELS), NO_PREDICTION + 1)
+        predicted = np.where(predicted_index >= 0, predicted_index, NO_PREDICTION)
+        coordinates = [dimension_codes[d] for d in dimensions] + [true_index, predicted]
+        
+        valid = np.logical_and.reduce([c >= 0 for c in coordinates])
+        flat = np.ravel_multi_index([c[valid].astype(np.intp) for c in coordinates], shape)
+        cells, counts = np.unique(flat, return_counts=True)
+        return cls(cycle_number, dimensions, cells, counts)
+    
+    @staticmethod
+    def _sum_into(cells: np.ndarray, counts: np.ndarray, shape: Tuple[int, ...]) -> np.ndarray:
+        """Add counts into a dense array of some shape at flat indices."""
+        size = int(np.prod(shape))
+        return np.bincount(cells, weights=counts, minlength=size).astype(np.int64).reshape(shape)
+    
+    def coordinates(self) -> Tuple[np.ndarray, ...]:
+        """Index of every non-empty cell on each axis (computed once)."""
+        if self._coordinates is None:
+            self._coordinates = np.unravel_index(self.cells, self.shape)
+        return self._coordinates
+    
+    def save(self, path: Optional[Path] = None) -> Path:
+        """
+        Persist the non-empty cells of the cube as an ``.npz`` archive.
+        
+        Args:
+            path: Destination (default: get_bias_cube_path(cycle_number))
+        
+        Returns:
+            Path written
+        """
+        path = Path(path) if path is not None else get_bias_cube_path(self.cycle_number)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        header = {
+            "cycle_number": self.cycle_number,
+            "dimensions": self.dimensions,
+            "shape": list(self.shape),
+        }
+        
+        # np.savez appends .npz to names without it; write via a handle instead
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                __header__=np.frombuffer(json.dumps(header).encode("utf-8"), dtype=np.uint8),
+                cells=self.cells,
+                counts=self.cell_counts,
+            )
+        return path
+    
+    @classmethod
+    def load(cls, source: Union[int, Path]) -> Optional["BiasCube"]:
+        """
+        Load a persisted cube.
+        
+        Args:
+            source: Cycle number or path of the archive
+        
+        Returns:
+            BiasCube or None if it does not exist
+        """
+        path = get_bias_cube_path(source) if isinstance(source, int) else Path(source)
+        if not path.exists():
+            return None
+        with np.load(path, allow_pickle=False) as archive:
+            header = json.loads(archive["__header__"].tobytes().decode("utf-8"))
+            return cls(header["cycle_number"], header["dimensions"], archive["cells"], archive["counts"])
+    
+    @property
+    def total_samples(self) -> int:
+        return int(self._total.sum())
+    
+    @property
+    def overall_accuracy(self) -> float:
+        total = self.total_samples
+        return float(self._correct.sum()) / total if total else 0.0
+    
+    def _axes_except(self, keep: List[str]) -> Tuple[int, ...]:
+        """Metadata axes not in ``keep``."""
+        unknown = set(keep) - set(self.dimensions)
+        if unknown:
+            raise KeyError(f"Not a cube dimension: {', '.join(sorted(unknown))}")
+        return tuple(i for i, d in enumerate(self.dimensions) if d not in keep)
+    
+    def _cell_counts(self, selection: Dict[str, str]) -> np.ndarray:
+        """True x predicted counts of the samples in one combination of categories."""
+        self._axes_except(list(selection))
+        coordinates = self.coordinates()
+        selected = np.ones(len(self.cells), dtype=bool)
+        for axis, (dimension, categories) in enumerate(self.dimensions.items()):
+            if dimension in selection:
+                selected &= coordinates[axis] == categories.index(selection[dimension])
+        
+        emotion_cells = self.cells[selected] % (len(EMOTION_LABELS) * (NO_PREDICTION + 1))
+        return self._sum_into(emotion_cells, self.cell_counts[selected], self.shape[-2:])
+    
+    def slice(self, selection: Dict[str, Union[str, List[str]]]) -> "BiasCube":
+        """
+        Restrict the cube to some categories.
+        
+        Args:
+            selection: {dimension: category} drops the dimension and keeps
+                that category; {dimension: [categories]} keeps the dimension
+                with only those categories
+        
+        Returns:
+            New BiasCube over the selected samples
+        
+        Raises:
+            KeyError: If a dimension is not in the cube
+            ValueError: If a category is not in its dimension
+        """
+        self._axes_except(list(selection))
+        coordinates = self.coordinates()
+        selected = np.ones(len(self.cells), dtype=bool)
+        kept = []
+        
+        # Keep the cells in the chosen categories, renumbering each kept
+        # dimension's categories in the order they were chosen
+        for axis, (dimension, categories) in enumerate(self.dimensions.items()):
+            chosen = selection.get(dimension)
+            if isinstance(chosen, str):
+                selected &= coordinates[axis] == categories.index(chosen)
+                continue
+            if chosen is None:
+                kept.append(coordinates[axis])
+                continue
+            renumber = np.full(len(categories), -1, dtype=np.int64)
+            renumber[[categories.index(c) for c in chosen]] = np.arange(len(chosen))
+            selected &= renumber[coordinates[axis]] >= 0
+            kept.append(renumber[coordinates[axis]])
+        
+        dimensions = {
+            d: (list(selection[d]) if selection.get(d) is not None else c)
+            for d, c in self.dimensions.items() if not isinstance(selection.get(d), str)
+        }
+        shape = tuple(len(c) for c in dimensions.values()) + self.shape[-2:]
+        cells = np.ravel_multi_index([c[selected] for c in kept + list(coordinates[-2:])], shape)
+        return BiasCube(self.cycle_number, dimensions, cells, self.cell_counts[selected])
+    
+    def rollup(self, dimensions: List[str]) -> np.ndarray:
+        """
+        Sum the counts over every other metadata dimension.
+        
+        Args:
+            dimensions: Dimensions to keep, in cube order
+        
+        Returns:
+            Counts of shape (*kept categories, true emotion, predicted emotion)
+        """
+        dropped = self._axes_except(dimensions)
+        axes = [axis for axis in range(len(self.shape)) if axis not in dropped]
+        shape = tuple(self.shape[axis] for axis in axes)
+        coordinates = self.coordinates()
+        cells = np.ravel_multi_index([coordinates[axis] for axis in axes], shape)
+        return self._sum_into(cells, self.cell_counts, shape)
+    
+    def accuracy_table(self, dimensions: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Correct and total counts per cell of some dimensions.
+        
+        Args:
+            dimensions: Dimensions to keep, in cube order
+        
+        Returns:
+            (correct, total) arrays of shape (*kept categories)
+        """
+        axes = self._axes_except(dimensions)
+        return self._correct.sum(axis=axes), self._total.sum(axis=axes)
+    
+    def cell(self, selection: Dict[str, str]) -> Dict:
+        """
+        Drill into one combination of categories.
+        
+        Args:
+            selection: {dimension: category}
+        
+        Returns:
+            Dict with samples, correct, accuracy, per-emotion accuracy and the
+            confusion counts ({true: {predicted: count}}, "none" = no prediction)
+        """
+        counts = self._cell_counts(selection)
+        totals = counts.sum(axis=1)
+        correct = np.diag(counts[:, :NO_PREDICTION])
+        predicted_labels = EMOTION_LABELS + ["none"]
+        
+        return {
+            "categories": dict(selection),
+            "samples": int(totals.sum()),
+            "correct": int(correct.sum()),
+            "accuracy": float(correct.sum() / totals.sum()) if totals.sum() else 0.0,
+            "per_emotion_accuracy": {
+                e: float(correct[i] / totals[i]) for i, e in enumerate(EMOTION_LABELS) if totals[i]
+            },
+            "confusion": {
+                e: {p: int(counts[i, j]) for j, p in enumerate(predicted_labels) if counts[i, j]}
+                for i, e in enumerate(EMOTION_LABELS) if totals[i]
+            },
+        }
+    
+    def _top_confusion(self, selection: Dict[str, str]) -> Optional[str]:
+        """Most frequent error of a cell as "true->predicted"."""
+        counts = self._cell_counts(selection)
+        counts[np.arange(len(EMOTION_LABELS)), np.arange(len(EMOTION_LABELS))] = 0
+        if not counts.any():
+            return None
+        true, predicted = np.unravel_index(int(counts.argmax()), counts.shape)
+        return f"{EMOTION_LABELS[true]}->{(EMOTION_LABELS + ['none'])[predicted]}"
+    
+    def intersectional_gaps(self, max_order: int = BIAS_CUBE_MAX_ORDER, min_order: int = 2,
+                            min_samples: int = BIAS_CUBE_MIN_SAMPLES,
+                            threshold: float = BIAS_THRESHOLD,
+                            limit: Optional[int] = 20) -> List[IntersectionalCell]:
+        """
+        Flag combinations of categories whose accuracy trails the overall.
+        
+        Every combination of ``min_order`` to ``max_order`` dimensions is
+        rolled up from the cached per-cell correct/total counts, so the scan
+        never revisits the samples.
+        
+        Args:
+            max_order: Most dimensions combined in a cell
+            min_order: Fewest dimensions combined in a cell
+            min_samples: Cells with fewer samples are skipped
+            threshold: Flag cells whose gap exceeds this
+            limit: Most cells to return (None = all)
+        
+        Returns:
+            Flagged cells, largest gap first
+        """
+        overall = self.overall_accuracy
+        names = list(self.dimensions)
+        
+        # Single-category gaps, for comparing a cell with its constituents
+        marginal = {}
+        for dimension in names:
+            correct, total = self.accuracy_table([dimension])
+            for i, category in enumerate(self.dimensions[dimension]):
+                marginal[(dimension, category)] = overall - correct[i] / total[i] if total[i] else 0.0
+        
+        flagged = []
+        for order in range(min_order, min(max_order, len(names)) + 1):
+            for combination in itertools.combinations(names, order):
+                correct, total = self.accuracy_table(list(combination))
+                gap = overall - correct / np.maximum(total, 1)
+                for position in np.argwhere((total >= min_samples) & (gap > threshold)):
+                    position = tuple(int(p) for p in position)
+                    categories = {d: self.dimensions[d][p] for d, p in zip(combination, position)}
+                    flagged.append(IntersectionalCell(
+                        categories=categories,
+                        samples=int(total[position]),
+                        accuracy=float(correct[position] / total[position]),
+                        gap=float(gap[position]),
+                        marginal_gap=float(max(marginal[item] for item in categories.items())),
+                    ))
+        
+        flagged.sort(key=lambda cell: cell.gap, reverse=True)
+        flagged = flagged[:limit]
+        for cell in flagged:
+            cell.top_confusion = self._top_confusion(cell.categories)
+        return flagged
@@ -0,0 +1,129 @@
+"""
+Autonomous Emotion Recognition Testing Pipeline - Confidence Intervals
+======================================================================
+Interval estimates for accuracies and bias gaps.
+
+Single accuracies (per emotion, per category, overall) get Wilson score
+intervals, which stay inside [0, 1] and behave at small counts. Bias gaps
+(best minus worst category accuracy) have no closed form and are
+bootstrapped. Every statistic here depends only on per-category correct and
+total counts, so resampling n results with replacement is the same as
+drawing multinomial counts over the (category, correct) cells. All
+replicates are drawn in one array, at a cost independent of the number of
+results.
+"""
+
+from statistics import NormalDist
+from typing import Optional, Tuple
+
+import numpy as np
+
+from pipeline_config import CI_LEVEL, BOOTSTRAP_REPLICATES, BOOTSTRAP_SEED
+
+
+def _z(level: float) -> float:
+    """Two-sided standard normal quantile for a confidence level."""
+    return NormalDist().inv_cdf(0.5 + level / 2)
+
+
+def wilson_interval(correct, total, level: float = CI_LEVEL) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Wilson score interval of binomial proportions.
+    
+    Args:
+        correct: Successes (scalar or array)
+        total: Trials (scalar or array, same shape)
+        level: Confidence level
+    
+    Returns:
+        (low, high) arrays; (0, 1) where total is 0
+    """
+    correct = np.asarray(correct, dtype=np.float64)
+    total = np.asarray(total, dtype=np.float64)
+    z2 = _z(level) ** 2
+    
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = correct / total
+        denominator = 1 + z2 / total
+        center = (p + z2 / (2 * total)) / denominator
+        half_width = np.sqrt(p * (1 - p) / total + z2 / (4 * total ** 2)) * np.sqrt(z2) / denominator
+    
+    # Exact bounds at the edges (rounding leaves ~1e-17 otherwise)
+    empty = total <= 0
+    low = np.where(empty | (correct <= 0), 0.0, np.clip(center - half_width, 0.0, 1.0))
+    high = np.where(empty | (correct >= total), 1.0, np.clip(center + half_width, 0.0, 1.0))
+    return low, high
+
+
+def bootstrap_group_accuracy(correct: np.ndarray, total: np.ndarray,
+                             replicates: int = BOOTSTRAP_REPLICATES,
+                             rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """
+    Bootstrap replicates of per-group accuracy.
+    
+    Args:
+        correct: Correct count per group
+        total: Sample count per group
+        replicates: Number of bootstrap replicates
+        rng: Random generator (default: seeded with BOOTSTRAP_SEED)
+    
+    Returns:
+        (replicates, groups) accuracies, NaN where a replicate drew no
+        samples of a group
+    """
+    rng = rng if rng is not None else np.random.default_rng(BOOTSTRAP_SEED)
+    correct = np.asarray(correct, dtype=np.int64)
+    total = np.asarray(total, dtype=np.int64)
+    n = int(total.sum())
+    if n == 0:
+        return np.full((replicates, len(total)), np.nan)
+    
+    # Cells: (group, correct) then (group, incorrect)
+    cells = np.concatenate([correct, total - correct]) / n
+    draws = rng.multinomial(n, cells, size=replicates)
+    drawn_correct = draws[:, :len(total)]
+    drawn_total = drawn_correct + draws[:, len(total):]
+    
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(drawn_total > 0, drawn_correct / drawn_total, np.nan)
+
+
+def bootstrap_gap_interval(correct: np.ndarray, total: np.ndarray, level: float = CI_LEVEL,
+                           replicates: int = BOOTSTRAP_REPLICATES,
+                           rng: Optional[np.random.Generator] = None) -> Tuple[float, float]:
+    """
+    Bootstrap interval of the gap between the best and worst group.
+    
+    Noise inflates a max-minus-min statistic, so replicate gaps run high;
+    the basic (pivotal) interval reflects that inflation back around the
+    observed gap instead of reporting the inflated percentiles. Groups
+    without samples are left out; a replicate in which fewer than two groups
+    were drawn has a gap of 0.
+    
+    Args:
+        correct: Correct count per group
+        total: Sample count per group
+        level: Confidence level
+        replicates: Number of bootstrap replicates
+        rng: Random generator (default: seeded with BOOTSTRAP_SEED)
+    
+    Returns:
+        (low, high) of the gap
+    """
+    observed = np.asarray(total) > 0
+    if observed.sum() < 2:
+        return 0.0, 0.0
+    
+    correct = np.asarray(correct)[observed]
+    total = np.asarray(total)[observed]
+    gap = float((correct / total).max() - (correct / total).min())
+    
+    accuracy = bootstrap_group_accuracy(correct, total, replicates, rng)
+    drawn = ~np.isnan(accuracy)
+    gaps = np.where(
+        drawn.sum(axis=1) >= 2,
+        np.nanmax(accuracy, axis=1) - np.nanmin(accuracy, axis=1),
+        0.0,
+    )
+    quantile_low, quantile_high = np.quantile(gaps, [0.5 - level / 2, 0.5 + level / 2])
+    return float(np.clip(2 * gap - quantile_high, 0.0, 1.0)), float(np.clip(2 * gap - quantile_low, 0.0, 1.0))
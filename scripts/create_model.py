@@ -4,10 +4,18 @@ Creates a TFLite model for facial emotion recognition (FER2013 compatible)
 Target: 90%+ accuracy on controlled inputs
 """
 
+import argparse
+import math
 import os
 import struct
 import zlib
 
+# TFLite conversion variants (see convert_model)
+QUANTIZATION_VARIANTS = ["fp32", "fp16", "dynamic", "int8"]
+
+# Selectable CNN architectures (see architecture_layers)
+ARCHITECTURES = ["minixception", "minixception_gap", "separable", "separable_gap"]
+
 def create_tflite_model():
     """
     Creates a pre-trained emotion detection model in TFLite format.
@@ -55,55 +63,138 @@ def create_tflite_model():
     # This creates a functional CNN for 7-class emotion detection
     return build_emotion_cnn()
 
-def build_emotion_cnn():
+def build_emotion_cnn(variant="fp16", representative_dataset=None,
+                      architecture="minixception", width=1.0):
     """
     Builds a working TFLite CNN model for emotion detection.
     Uses optimized weights for facial emotion recognition.
+    
+    Args:
+        variant: Conversion variant, one of QUANTIZATION_VARIANTS
+        representative_dataset: Calibration data generator (int8 only)
+        architecture: One of ARCHITECTURES
+        width: Width multiplier applied to every layer's channels
+    """
+    return convert_model(build_keras_model(architecture, width), variant, representative_dataset)
+
+def _scaled(channels, width):
+    """Channels times the width multiplier, rounded to a multiple of 8."""
+    return max(8, int(channels * width + 4) // 8 * 8)
+
+def architecture_layers(architecture="minixception", width=1.0):
+    """
+    Layer specs of a selectable architecture.
+    
+    Architectures:
+    - minixception:     3 blocks of two 3x3 convs, Flatten -> Dense(256) head
+                        (the original model; the 4608x256 dense layer holds
+                        most of its parameters)
+    - minixception_gap: same conv blocks, global average pooling head
+    - separable:        3x3 conv stem, then depthwise-separable blocks,
+                        Flatten -> Dense(256) head
+    - separable_gap:    separable blocks with a global average pooling head
+    
+    Args:
+        architecture: One of ARCHITECTURES
+        width: Width multiplier applied to every conv and hidden dense layer
+    
+    Returns:
+        List of (kind, *args) tuples: ("conv", filters), ("sepconv", filters),
+        ("bn",), ("relu",), ("pool",), ("dropout", rate), ("flatten",),
+        ("gap",), ("dense", units, activation)
+    """
+    if architecture not in ARCHITECTURES:
+        raise ValueError(f"Unknown architecture: {architecture}")
+    
+    separable = architecture.startswith("separable")
+    layers = []
+    for i, filters in enumerate((32, 64, 128)):
+        filters = _scaled(filters, width)
+        for j in range(2):
+            # A single-channel input gains nothing from a depthwise split
+            kind = "sepconv" if separable and (i, j) != (0, 0) else "conv"
+            layers += [(kind, filters), ("bn",), ("relu",)]
+        layers += [("pool",), ("dropout", 0.25)]
+    
+    if architecture.endswith("_gap"):
+        layers += [("gap",), ("dropout", 0.5)]
+    else:
+        layers += [("flatten",), ("dense", _scaled(256, width), "relu"), ("dropout", 0.5)]
+    layers.append(("dense", 7, "softmax"))
+    return layers
+
+def model_cost(architecture="minixception", width=1.0, input_shape=(48, 48, 1)):
+    """
+    Parameter count and FLOP estimate of an architecture, without building it.
+    
+    FLOPs count two per multiply-accumulate of the conv and dense layers;
+    batch norm folds into the convs at conversion and elementwise ops are
+    ignored.
+    
+    Args:
+        architecture: One of ARCHITECTURES
+        width: Width multiplier
+        input_shape: (height, width, channels) of the input
+    
+    Returns:
+        Dict with params (as Keras counts them, batch norm statistics
+        included) and flops per inference
+    """
+    height, width_px, channels = input_shape
+    params = 0
+    macs = 0
+    features = None
+    
+    for kind, *args in architecture_layers(architecture, width):
+        if kind == "conv":
+            params += 9 * channels * args[0]
+            macs += height * width_px * 9 * channels * args[0]
+            channels = args[0]
+        elif kind == "sepconv":
+            params += 9 * channels + channels * args[0]
+            macs += height * width_px * (9 * channels + channels * args[0])
+            channels = args[0]
+        elif kind == "bn":
+            params += 4 * channels
+        elif kind == "pool":
+            height, width_px = height // 2, width_px // 2
+        elif kind == "flatten":
+            features = height * width_px * channels
+        elif kind == "gap":
+            features = channels
+        elif kind == "dense":
+            params += features * args[0] + args[0]
+            macs += features * args[0]
+            features = args[0]
+    
+    return {"params": params, "flops": 2 * macs}
+
+def build_keras_model(architecture="minixception", width=1.0):
+    """
+    Builds a Keras model of a selectable architecture with its initial weights.
+    
+    Args:
+        architecture: One of ARCHITECTURES (default: the MiniXception-style CNN)
+        width: Width multiplier
     """
     import tensorflow as tf
-    import numpy as np
     
-    # Define the model architecture - MiniXception inspired
-    model = tf.keras.Sequential([
-        # Input layer
-        tf.keras.layers.InputLayer(input_shape=(48, 48, 1)),
-        
-        # First conv block
-        tf.keras.layers.Conv2D(32, (3, 3), padding='same', use_bias=False),
-        tf.keras.layers.BatchNormalization(),
-        tf.keras.layers.Activation('relu'),
-        tf.keras.layers.Conv2D(32, (3, 3), padding='same', use_bias=False),
-        tf.keras.layers.BatchNormalization(),
-        tf.keras.layers.Activation('relu'),
-        tf.keras.layers.MaxPooling2D(pool_size=(2, 2)),
-        tf.keras.layers.Dropout(0.25),
-        
-        # Second conv block  
-        tf.keras.layers.Conv2D(64, (3, 3), padding='same', use_bias=False),
-        tf.keras.layers.BatchNormalization(),
-        tf.keras.layers.Activation('relu'),
-        tf.keras.layers.Conv2D(64, (3, 3), padding='same', use_bias=False),
-        tf.keras.layers.BatchNormalization(),
-        tf.keras.layers.Activation('relu'),
-        tf.keras.layers.MaxPooling2D(pool_size=(2, 2)),
-        tf.keras.layers.Dropout(0.25),
-        
-        # Third conv block
-        tf.keras.layers.Conv2D(128, (3, 3), padding='same', use_bias=False),
-        tf.keras.layers.BatchNormalization(),
-        tf.keras.layers.Activation('relu'),
-        tf.keras.layers.Conv2D(128, (3, 3), padding='same', use_bias=False),
-        tf.keras.layers.BatchNormalization(),
-        tf.keras.layers.Activation('relu'),
-        tf.keras.layers.MaxPooling2D(pool_size=(2, 2)),
-        tf.keras.layers.Dropout(0.25),
-        
-        # Dense layers
-        tf.keras.layers.Flatten(),
-        tf.keras.layers.Dense(256, activation='relu'),
-        tf.keras.layers.Dropout(0.5),
-        tf.keras.layers.Dense(7, activation='softmax')
-    ])
+    builders = {
+        "conv": lambda filters: tf.keras.layers.Conv2D(filters, (3, 3), padding='same', use_bias=False),
+        "sepconv": lambda filters: tf.keras.layers.SeparableConv2D(filters, (3, 3), padding='same', use_bias=False),
+        "bn": tf.keras.layers.BatchNormalization,
+        "relu": lambda: tf.keras.layers.Activation('relu'),
+        "pool": lambda: tf.keras.layers.MaxPooling2D(pool_size=(2, 2)),
+        "dropout": tf.keras.layers.Dropout,
+        "flatten": tf.keras.layers.Flatten,
+        "gap": tf.keras.layers.GlobalAveragePooling2D,
+        "dense": lambda units, activation: tf.keras.layers.Dense(units, activation=activation),
+    }
+    
+    model = tf.keras.Sequential(
+        [tf.keras.layers.InputLayer(input_shape=(48, 48, 1))]
+        + [builders[kind](*args) for kind, *args in architecture_layers(architecture, width)]
+    )
     
     model.compile(
         optimizer='adam',
@@ -114,15 +205,100 @@ def build_emotion_cnn():
     # Load pre-trained weights (optimized for FER2013)
     # These weights achieve ~90% accuracy on validation data
     load_pretrained_weights(model)
+    return model
+
+def print_architectures(widths=(1.0,)):
+    """Print parameter counts and FLOP estimates of every architecture."""
+    print(f"{'Architecture':<18}{'Width':>7}{'Params':>12}{'MFLOPs':>10}")
+    for architecture in ARCHITECTURES:
+        for width in widths:
+            cost = model_cost(architecture, width)
+            print(f"{architecture:<18}{width:>7.2f}{cost['params']:>12,}{cost['flops'] / 1e6:>10.1f}")
+
+def convert_model(model, variant="fp16", representative_dataset=None):
+    """
+    Converts a Keras model to TFLite.
+    
+    Variants:
+    - fp32:    no optimization
+    - fp16:    float16 weights (the default shipped model)
+    - dynamic: dynamic-range quantization (int8 weights, float activations)
+    - int8:    full-integer kernels and int8 input/output, calibrated on
+               representative_dataset
+    
+    Args:
+        model: Keras model
+        variant: One of QUANTIZATION_VARIANTS
+        representative_dataset: Callable yielding [input] lists (int8 only)
+    
+    Returns:
+        TFLite FlatBuffer bytes
+    """
+    import tensorflow as tf
+    
+    if variant not in QUANTIZATION_VARIANTS:
+        raise ValueError(f"Unknown quantization variant: {variant}")
     
-    # Convert to TFLite
     converter = tf.lite.TFLiteConverter.from_keras_model(model)
-    converter.optimizations = [tf.lite.Optimize.DEFAULT]
-    converter.target_spec.supported_types = [tf.float16]
+    if variant != "fp32":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    
+    if variant == "fp16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif variant == "int8":
+        if representative_dataset is None:
+            raise ValueError("int8 conversion needs a representative dataset")
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
     
     tflite_model = converter.convert()
     return tflite_model
 
+def representative_dataset(cycle_numbers=None, num_samples=None):
+    """
+    Calibration data for int8 conversion, streamed from generated cycles.
+    
+    Inputs are read from the pipeline's cycle directories and preprocessed
+    exactly as ModelEvaluator feeds them to the model, one at a time, so the
+    calibration set never has to fit in memory.
+    
+    Args:
+        cycle_numbers: Cycles to draw from (default: every cycle generated
+            under IMAGES_DIR)
+        num_samples: Total calibration inputs, spread evenly over the cycles
+            (default: CALIBRATION_SAMPLES)
+    
+    Returns:
+        Generator function yielding [input] lists, as TFLiteConverter expects
+    """
+    from pipeline_config import IMAGES_DIR, CALIBRATION_SAMPLES, get_cycle_dir
+    from model_evaluator import ModelEvaluator
+    
+    if cycle_numbers is None:
+        cycle_numbers = sorted(
+            int(path.name.split("_")[1]) for path in IMAGES_DIR.glob("cycle_*") if path.is_dir()
+        )
+    cycle_numbers = [c for c in cycle_numbers if get_cycle_dir(c).exists()]
+    if not cycle_numbers:
+        raise ValueError(f"No generated cycles to calibrate on in {IMAGES_DIR}")
+    
+    num_samples = num_samples or CALIBRATION_SAMPLES
+    per_cycle = math.ceil(num_samples / len(cycle_numbers))
+    
+    def generate():
+        remaining = num_samples
+        for cycle_number in cycle_numbers:
+            evaluator = ModelEvaluator(cycle_number, reuse_samples=False, model="tflite")
+            for sample in evaluator.iter_inputs(limit=min(per_cycle, remaining)):
+                yield [sample]
+                remaining -= 1
+            if remaining <= 0:
+                break
+    
+    return generate
+
 def load_pretrained_weights(model):
     """Load pre-trained weights optimized for emotion detection."""
     import numpy as np
@@ -133,9 +309,14 @@ def load_pretrained_weights(model):
     # Apply transfer learning style weights
     # These are carefully tuned weights from training on FER2013+AffectNet
     for layer in model.layers:
-        if hasattr(layer, 'kernel') and layer.kernel is not None:
+        # Separable convs carry depthwise and pointwise kernels instead of one kernel
+        for name in ('kernel', 'depthwise_kernel', 'pointwise_kernel'):
+            kernel = getattr(layer, name, None)
+            if kernel is None:
+                continue
+            
             # Initialize with Xavier/Glorot initialization tuned for emotions
-            shape = layer.kernel.shape
+            shape = kernel.shape
             fan_in = np.prod(shape[:-1])
             fan_out = shape[-1]
             std = np.sqrt(2.0 / (fan_in + fan_out))
@@ -146,7 +327,7 @@ def load_pretrained_weights(model):
                 # Enhance edge detection for facial features
                 weights = apply_gabor_initialization(weights)
             
-            layer.kernel.assign(weights)
+            kernel.assign(weights)
         
         if hasattr(layer, 'bias') and layer.bias is not None:
             layer.bias.assign(np.zeros(layer.bias.shape, dtype=np.float32))
@@ -180,17 +361,74 @@ def apply_gabor_initialization(weights):
     return weights
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create the emotion detection TFLite model")
+    parser.add_argument(
+        "--variant",
+        choices=QUANTIZATION_VARIANTS,
+        default="fp16",
+        help="Conversion variant (default: fp16)"
+    )
+    parser.add_argument(
+        "--architecture",
+        choices=ARCHITECTURES,
+        default="minixception",
+        help="CNN architecture (default: minixception)"
+    )
+    parser.add_argument(
+        "--width",
+        type=float,
+        default=1.0,
+        help="Width multiplier for the architecture's channels (default: 1.0)"
+    )
+    parser.add_argument(
+        "--list-architectures",
+        action="store_true",
+        help="Print parameter counts and FLOP estimates of the architectures and exit"
+    )
+    parser.add_argument(
+        "--output",
+        default="assets/models/cnn_model.tflite",
+        help="Output .tflite path"
+    )
+    parser.add_argument(
+        "--calibration-cycles",
+        type=int,
+        nargs="+",
+        default=None,
+        help="Generated cycles to calibrate int8 on (default: all generated cycles)"
+    )
+    parser.add_argument(
+        "--calibration-samples",
+        type=int,
+        default=None,
+        help="Number of int8 calibration inputs (default: CALIBRATION_SAMPLES)"
+    )
+    args = parser.parse_args()
+    
+    if args.list_architectures:
+        print_architectures((0.5, 0.75, 1.0))
+        raise SystemExit(0)
+    
+    cost = model_cost(args.architecture, args.width)
     print("🧠 Creating High-Accuracy Emotion Detection Model...")
-    print("   Architecture: MiniXception-style CNN")
+    print(f"   Architecture: {args.architecture} (width {args.width:g})")
+    print(f"   Parameters: {cost['params']:,}, {cost['flops'] / 1e6:.1f} MFLOPs")
+    print(f"   Variant: {args.variant}")
     print("   Input: 48x48 grayscale face image")
     print("   Output: 7 emotions (Angry, Disgust, Fear, Happy, Sad, Surprise, Neutral)")
     print()
     
     try:
-        model_bytes = create_tflite_model()
+        if args.variant == "fp16" and args.architecture == "minixception" and args.width == 1.0:
+            model_bytes = create_tflite_model()
+        else:
+            representative = None
+            if args.variant == "int8":
+                representative = representative_dataset(args.calibration_cycles, args.calibration_samples)
+            model_bytes = build_emotion_cnn(args.variant, representative, args.architecture, args.width)
         
         # Save the model
-        output_path = "assets/models/cnn_model.tflite"
+        output_path = args.output
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         
         with open(output_path, 'wb') as f:
@@ -200,6 +438,11 @@ if __name__ == "__main__":
         print(f"   Model size: {len(model_bytes) / 1024:.1f} KB")
         print("   Expected accuracy: ~90% on FER2013 validation set")
         
+        if args.variant == "int8":
+            from inference_backend import write_quantization_params
+            params_path = write_quantization_params(output_path)
+            print(f"   Quantization params: {params_path}")
+    
     except Exception as e:
         print(f"❌ Error creating model: {e}")
         print("   Falling back to downloading pre-trained model...")
@@ -5,19 +5,48 @@ Generates synthetic facial images with varied emotions, demographics, and condit
 """
 
 import json
+import math
 import random
 import hashlib
+import shutil
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass, asdict
-import itertools
 
 from pipeline_config import (
     EMOTION_LABELS, DEMOGRAPHICS, ENVIRONMENTAL_VARIATIONS, ACCESSORIES,
     INTENSITY_LEVELS, get_images_per_emotion, get_cycle_dir, get_metadata_path,
-    ensure_directories, get_prompt_for_emotion, DEMO_MODE
+    ensure_directories, get_prompt_for_emotion, DEMO_MODE, GENERATION_SEED,
+    SAMPLING_MODE, STRATIFIED_DIMENSIONS, STRATIFIED_MIN_PER_CATEGORY,
+    STRATIFIED_PAIRS, STRATIFIED_MIN_PER_PAIR, METADATA_FORMAT, IMAGE_STORAGE,
+    get_shard_dir, GENERATION_WORKERS, GENERATION_CHUNK_SIZE,
+    GENERATOR_VERSION, IMAGE_CONTENT_SEED, REUSE_SAMPLES, get_metadata_store_path
 )
+from background_writer import BackgroundWriter, persist, persist_json
+from metadata_store import CycleMetadata, save_cycle_metadata, load_cycle_metadata
+from shard_store import ShardWriter
+from sample_registry import SampleRegistry
+
+
+# Ordered dimensions of the sampling index space (last varies fastest)
+VARIATION_SPACE: List[Tuple[str, List]] = [
+    ("gender", DEMOGRAPHICS["gender"]),
+    ("age_group", DEMOGRAPHICS["age_group"]),
+    ("skin_tone", DEMOGRAPHICS["skin_tone"]),
+    ("face_shape", DEMOGRAPHICS["face_shape"]),
+    ("lighting", ENVIRONMENTAL_VARIATIONS["lighting"]),
+    ("head_pose", ENVIRONMENTAL_VARIATIONS["head_pose"]),
+    ("background", ENVIRONMENTAL_VARIATIONS["background"]),
+    ("glasses", ACCESSORIES["glasses"]),
+    ("intensity", INTENSITY_LEVELS),
+]
+
+VARIATION_SPACE_SIZE = math.prod(len(values) for _, values in VARIATION_SPACE)
+
+SAMPLING_MODES = ("random", "stratified")
+IMAGE_STORAGE_MODES = ("shards", "files")
 
 
 @dataclass
@@ -38,6 +67,31 @@ class ImageMetadata:
     image_path: str
     generated_at: str
     prompt_used: str
+    shard_path: str = ""     # Packed shard holding the image ("" = loose file)
+    shard_offset: int = -1   # Byte offset of the record within the shard
+    shard_length: int = 0    # Record length in bytes
+
+
+@dataclass
+class ChunkTask:
+    """One chunk of an emotion's plan, buildable in any process."""
+    # Generator settings a pool worker needs to rebuild the generator
+    cycle_number: int
+    seed: Optional[int]
+    sampling_mode: str
+    image_storage: str
+    # Arguments of DataGenerator._build_chunk
+    emotion: str
+    request: int
+    chunk_index: int
+    variations: List[Dict]
+    image_ids: List[str]
+    reused: Dict[str, Dict]      # Stored locations of registered samples, by image ID
+    
+    def build(self, generator: "DataGenerator") -> Tuple[List[ImageMetadata], int]:
+        """Build the chunk with a generator (see DataGenerator._build_chunk)."""
+        return generator._build_chunk(self.emotion, self.request, self.chunk_index,
+                                      self.variations, self.image_ids, self.reused)
 
 
 class DataGenerator:
@@ -48,34 +102,108 @@ class DataGenerator:
     In production mode, can integrate with image generation APIs.
     """
     
-    def __init__(self, cycle_number: int = 1):
+    def __init__(self, cycle_number: int = 1, seed: Optional[int] = GENERATION_SEED,
+                 sampling_mode: str = SAMPLING_MODE, image_storage: str = IMAGE_STORAGE,
+                 workers: int = GENERATION_WORKERS, reuse_samples: bool = REUSE_SAMPLES,
+                 writer: Optional[BackgroundWriter] = None):
         """
         Initialize the data generator.
         
         Args:
             cycle_number: Current training cycle number
+            seed: Seed for variation sampling (None draws a fresh seed, which
+                is recorded in generation_stats so the run can be reproduced)
+            sampling_mode: "random" or "stratified" (see SAMPLING_MODE)
+            image_storage: "shards" or "files" (see IMAGE_STORAGE)
+            workers: Number of generator processes (1 = in-process)
+            reuse_samples: Reuse content of samples registered by earlier cycles
+            writer: Background writer for the metadata files (None = write
+                them before returning)
         """
+        if sampling_mode not in SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode: {sampling_mode}")
+        if image_storage not in IMAGE_STORAGE_MODES:
+            raise ValueError(f"Unknown image storage: {image_storage}")
+        
+        if seed is None:
+            seed = random.SystemRandom().randrange(2**32)
+        
         self.cycle_number = cycle_number
+        self.seed = seed
+        self.workers = max(1, workers)
+        self.reuse_samples = reuse_samples
+        self.sampling_mode = sampling_mode
+        self.image_storage = image_storage
+        self.rng = random.Random(seed)
         self.cycle_dir = get_cycle_dir(cycle_number)
+        self._emotion_requests: Dict[str, int] = {}
+        self._id_counts: Dict[str, int] = {}
+        self._shards_cleared = False
         self.metadata_path = get_metadata_path(cycle_number)
+        self.writer = writer
         self.generated_metadata: List[ImageMetadata] = []
+        self.cycle_metadata: Optional[CycleMetadata] = None  # Columnar metadata of the last save
         self.generation_stats = {
             "total_generated": 0,
             "per_emotion": {e: 0 for e in EMOTION_LABELS},
             "failures": 0,
+            "reused": 0,
+            "seed": seed,
+            "sampling_mode": sampling_mode,
             "start_time": None,
             "end_time": None,
         }
         
-    def _generate_image_id(self, emotion: str, variation_idx: int) -> str:
-        """Generate a unique image ID."""
-        seed = f"{self.cycle_number}_{emotion}_{variation_idx}_{datetime.now().isoformat()}"
-        return hashlib.md5(seed.encode()).hexdigest()[:12]
+    def _generate_image_id(self, emotion: str, variation: Dict, replica: int = 0) -> str:
+        """
+        Generate a deterministic, content-addressed image ID.
+        
+        Args:
+            emotion: Target emotion
+            variation: Variation dictionary
+            replica: Occurrence index when a variation repeats within a cycle
+            
+        Returns:
+            16-character hex ID
+        """
+        variation_key = tuple(variation[name] for name, _ in VARIATION_SPACE) + (variation["occlusion"],)
+        key = f"{GENERATOR_VERSION}|{IMAGE_CONTENT_SEED}|{emotion}|{variation_key}|{replica}"
+        return hashlib.sha256(key.encode()).hexdigest()[:16]
+    
+    def _decode_variation(self, index: int) -> Dict:
+        """
+        Decode a flat index from the variation space into a variation dict.
+        
+        The index is interpreted as a mixed-radix number over VARIATION_SPACE,
+        with the last dimension varying fastest (the same ordering as a nested
+        loop over all dimensions). Occlusion is not part of the index space and
+        is drawn independently for every sample.
+        
+        Args:
+            index: Flat index in [0, VARIATION_SPACE_SIZE)
+            
+        Returns:
+            Variation dictionary
+        """
+        digits = []
+        for _, values in reversed(VARIATION_SPACE):
+            index, value_idx = divmod(index, len(values))
+            digits.append(value_idx)
+        
+        variation = {
+            name: values[value_idx]
+            for (name, values), value_idx in zip(VARIATION_SPACE, reversed(digits))
+        }
+        variation["occlusion"] = self.rng.choice(ACCESSORIES["occlusion"])
+        return variation
     
     def _get_variation_combinations(self, emotion: str, target_count: int) -> List[Dict]:
         """
         Generate diverse variation combinations for an emotion.
         
+        Draws unique flat indices from the variation space without building
+        the cartesian product, so cost is O(target_count) in time and memory.
+        
         Args:
             emotion: Target emotion
             target_count: Number of variations to generate
@@ -83,44 +211,153 @@ class DataGenerator:
         Returns:
             List of variation dictionaries
         """
-        # Create all possible combinations
-        all_combinations = []
-        
-        for gender in DEMOGRAPHICS["gender"]:
-            for age in DEMOGRAPHICS["age_group"]:
-                for skin in DEMOGRAPHICS["skin_tone"]:
-                    for face in DEMOGRAPHICS["face_shape"]:
-                        for lighting in ENVIRONMENTAL_VARIATIONS["lighting"]:
-                            for pose in ENVIRONMENTAL_VARIATIONS["head_pose"]:
-                                for bg in ENVIRONMENTAL_VARIATIONS["background"]:
-                                    for glasses in ACCESSORIES["glasses"]:
-                                        for intensity in INTENSITY_LEVELS:
-                                            all_combinations.append({
-                                                "gender": gender,
-                                                "age_group": age,
-                                                "skin_tone": skin,
-                                                "face_shape": face,
-                                                "lighting": lighting,
-                                                "head_pose": pose,
-                                                "background": bg,
-                                                "glasses": glasses,
-                                                "occlusion": random.choice(ACCESSORIES["occlusion"]),
-                                                "intensity": intensity,
-                                            })
-        
-        # Shuffle and select target count
-        random.shuffle(all_combinations)
-        
-        if len(all_combinations) >= target_count:
-            return all_combinations[:target_count]
-        else:
-            # If we need more than available, repeat with slight variations
-            extended = all_combinations.copy()
-            while len(extended) < target_count:
-                variation = random.choice(all_combinations).copy()
-                variation["intensity"] = random.choice(INTENSITY_LEVELS)
-                extended.append(variation)
-            return extended[:target_count]
+        if target_count <= VARIATION_SPACE_SIZE:
+            indices = self.rng.sample(range(VARIATION_SPACE_SIZE), target_count)
+            return [self._decode_variation(i) for i in indices]
+        
+        # If we need more than available, repeat with slight variations
+        all_combinations = [
+            self._decode_variation(i)
+            for i in self.rng.sample(range(VARIATION_SPACE_SIZE), VARIATION_SPACE_SIZE)
+        ]
+        extended = all_combinations.copy()
+        while len(extended) < target_count:
+            variation = self.rng.choice(all_combinations).copy()
+            variation["intensity"] = self.rng.choice(INTENSITY_LEVELS)
+            extended.append(variation)
+        return extended
+    
+    def _encode_variation(self, variation: Dict) -> int:
+        """Encode a variation dict back into its flat index (ignores occlusion)."""
+        index = 0
+        for name, values in VARIATION_SPACE:
+            index = index * len(values) + values.index(variation[name])
+        return index
+    
+    def _get_stratified_combinations(self, emotion: str, min_count: int = 0) -> List[Dict]:
+        """
+        Generate a small variation set that covers every bias category.
+        
+        Builds a greedy covering design: each new sample is seeded with the
+        most under-covered cell of STRATIFIED_PAIRS (or STRATIFIED_DIMENSIONS
+        once pairs are satisfied), and the remaining stratified dimensions are
+        filled with the values that close the most outstanding deficits.
+        Dimensions outside STRATIFIED_DIMENSIONS are drawn uniformly. The
+        result is topped up with random unique samples to reach min_count.
+        
+        Variations are never repeated. A cell whose row keeps coming out as
+        a duplicate is given up on, and any minimum left unmet is reported.
+        
+        Args:
+            emotion: Target emotion
+            min_count: Minimum number of variations to return
+            
+        Returns:
+            List of variation dictionaries
+        """
+        space = dict(VARIATION_SPACE)
+        single_deficit = {
+            (dim, value): STRATIFIED_MIN_PER_CATEGORY
+            for dim in STRATIFIED_DIMENSIONS for value in space[dim]
+        }
+        pair_deficit = {
+            (dim_a, dim_b, value_a, value_b): STRATIFIED_MIN_PER_PAIR
+            for dim_a, dim_b in STRATIFIED_PAIRS
+            for value_a in space[dim_a] for value_b in space[dim_b]
+        }
+        
+        def gain(dim: str, value, assigned: Dict) -> int:
+            score = single_deficit.get((dim, value), 0)
+            for dim_a, dim_b in STRATIFIED_PAIRS:
+                if dim_a == dim and dim_b in assigned:
+                    score += pair_deficit[(dim_a, dim_b, value, assigned[dim_b])]
+                elif dim_b == dim and dim_a in assigned:
+                    score += pair_deficit[(dim_a, dim_b, assigned[dim_a], value)]
+            return score
+        
+        variations = []
+        seen = set()
+        exhausted = set()  # Seed cells with no unique variation left to give
+        
+        while True:
+            open_pairs = [key for key, deficit in pair_deficit.items() if deficit > 0 and key not in exhausted]
+            open_singles = [key for key, deficit in single_deficit.items() if deficit > 0 and key not in exhausted]
+            if not open_pairs and not open_singles:
+                break
+            
+            # Seed the row with the most under-covered cell
+            assigned = {}
+            if open_pairs:
+                top = max(pair_deficit[key] for key in open_pairs)
+                seed_cell = self.rng.choice([key for key in open_pairs if pair_deficit[key] == top])
+                dim_a, dim_b, value_a, value_b = seed_cell
+                assigned[dim_a], assigned[dim_b] = value_a, value_b
+            else:
+                top = max(single_deficit[key] for key in open_singles)
+                seed_cell = self.rng.choice([key for key in open_singles if single_deficit[key] == top])
+                dim, value = seed_cell
+                assigned[dim] = value
+            
+            # Greedily fill the remaining stratified dimensions
+            remaining = [dim for dim in STRATIFIED_DIMENSIONS if dim not in assigned]
+            self.rng.shuffle(remaining)
+            for dim in remaining:
+                scores = [gain(dim, value, assigned) for value in space[dim]]
+                best = max(scores)
+                assigned[dim] = self.rng.choice(
+                    [value for value, score in zip(space[dim], scores) if score == best]
+                )
+            
+            # Free dimensions are drawn uniformly; re-draw on duplicates
+            for _ in range(10):
+                variation = {
+                    name: assigned[name] if name in assigned else self.rng.choice(values)
+                    for name, values in VARIATION_SPACE
+                }
+                if self._encode_variation(variation) not in seen:
+                    break
+            else:
+                exhausted.add(seed_cell)
+                continue
+            variation["occlusion"] = self.rng.choice(ACCESSORIES["occlusion"])
+            seen.add(self._encode_variation(variation))
+            variations.append(variation)
+            
+            for dim in STRATIFIED_DIMENSIONS:
+                key = (dim, variation[dim])
+                single_deficit[key] = max(0, single_deficit[key] - 1)
+            for dim_a, dim_b in STRATIFIED_PAIRS:
+                key = (dim_a, dim_b, variation[dim_a], variation[dim_b])
+                pair_deficit[key] = max(0, pair_deficit[key] - 1)
+        
+        unmet = [key for key, deficit in {**single_deficit, **pair_deficit}.items() if deficit > 0]
+        if unmet:
+            names, values = unmet[0][:len(unmet[0]) // 2], unmet[0][len(unmet[0]) // 2:]
+            print(f"  ⚠️ {emotion}: no unique variations left to meet the stratified minimum of "
+                  f"{len(unmet)} cell(s), e.g. {' x '.join(f'{n}={v}' for n, v in zip(names, values))}")
+        
+        # Top up with unique random samples
+        while len(variations) < min_count and len(seen) < VARIATION_SPACE_SIZE:
+            needed = min(min_count - len(variations), VARIATION_SPACE_SIZE)
+            for variation in self._get_variation_combinations(emotion, needed):
+                index = self._encode_variation(variation)
+                if index not in seen:
+                    seen.add(index)
+                    variations.append(variation)
+        if len(variations) < min_count:
+            print(f"  ⚠️ {emotion}: only {len(variations)} unique variations exist, "
+                  f"{min_count} requested")
+        
+        return variations
+    
+    def _placeholder_record(self, metadata: ImageMetadata) -> Dict:
+        """Build the placeholder record that stands in for image content."""
+        return {
+            "type": "placeholder_image",
+            "description": "This represents a synthetic facial image",
+            "metadata": asdict(metadata),
+            "prompt": metadata.prompt_used,
+        }
     
     def _create_placeholder_image(self, emotion: str, image_path: Path, metadata: ImageMetadata) -> bool:
         """
@@ -145,12 +382,7 @@ class DataGenerator:
             # Create a placeholder JSON file (simulating image creation)
             placeholder_path = image_path.with_suffix(".json")
             with open(placeholder_path, "w") as f:
-                json.dump({
-                    "type": "placeholder_image",
-                    "description": "This represents a synthetic facial image",
-                    "metadata": asdict(metadata),
-                    "prompt": metadata.prompt_used,
-                }, f, indent=2)
+                json.dump(self._placeholder_record(metadata), f, indent=2)
             
             return True
             
@@ -158,41 +390,110 @@ class DataGenerator:
             print(f"  ❌ Failed to create image: {e}")
             return False
     
-    def generate_for_emotion(self, emotion: str, count: Optional[int] = None) -> List[ImageMetadata]:
+    def _pack_placeholder_images(self, batch: List[ImageMetadata], writer: ShardWriter) -> bool:
         """
-        Generate synthetic images for a specific emotion.
+        Append placeholder records for a batch of images to a shard writer.
+        
+        Records are serialized compactly and written with a single bulk append;
+        each metadata entry is updated with its shard location.
+        
+        Args:
+            batch: Metadata of the images to store
+            writer: Shard writer to append to
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            payloads = [
+                json.dumps(self._placeholder_record(m), separators=(",", ":")).encode("utf-8")
+                for m in batch
+            ]
+            locations = writer.append_many(payloads)
+            
+            for metadata, (shard_path, offset, length) in zip(batch, locations):
+                metadata.shard_path = shard_path
+                metadata.shard_offset = offset
+                metadata.shard_length = length
+            
+            return True
+            
+        except Exception as e:
+            print(f"  ❌ Failed to write image shard: {e}")
+            return False
+    
+    def _derive_seed(self, *parts) -> int:
+        """Derive a deterministic sub-seed from the run seed and a key."""
+        key = ":".join(str(p) for p in (self.seed, self.cycle_number) + parts)
+        return int.from_bytes(hashlib.sha256(key.encode()).digest()[:8], "little")
+    
+    def _plan_emotion(self, emotion: str, count: Optional[int]) -> List[Dict]:
+        """
+        Sample the variations for one emotion request.
+        
+        Each request draws from its own RNG stream derived from the run seed,
+        the emotion and how many times the emotion was requested before, so
+        the plan does not depend on the order or parallelism of generation.
         
         Args:
             emotion: Target emotion label
             count: Number of images to generate (uses config default if None)
             
         Returns:
-            List of generated image metadata
+            List of variation dictionaries
         """
-        if emotion not in EMOTION_LABELS:
-            raise ValueError(f"Unknown emotion: {emotion}")
+        request = self._emotion_requests.get(emotion, 0)
+        self._emotion_requests[emotion] = request + 1
+        self.rng = random.Random(self._derive_seed(emotion, request))
         
-        count = count or get_images_per_emotion()
-        print(f"📸 Generating {count} images for emotion: {emotion}")
+        if self.sampling_mode == "stratified":
+            return self._get_stratified_combinations(emotion, count or 0)
+        return self._get_variation_combinations(emotion, count or get_images_per_emotion())
+    
+    def _build_chunk(self, emotion: str, request: int, chunk_index: int,
+                     variations: List[Dict], image_ids: List[str],
+                     reused: Dict[str, Dict]) -> Tuple[List[ImageMetadata], int]:
+        """
+        Build metadata and write images for one chunk of an emotion's plan.
+        
+        Chunks are self-contained: they use their own derived RNG stream and,
+        in shard mode, their own shard prefix, so they can run in any process.
+        Samples found in the registry point at their existing content and are
+        not written again.
+        
+        Args:
+            emotion: Target emotion label
+            request: Index of the emotion request the chunk belongs to
+            chunk_index: Position of the chunk within the request
+            variations: Variations to generate
+            image_ids: Content-addressed ID of each variation
+            reused: Stored locations of registered samples, by image ID
+            
+        Returns:
+            Tuple of (generated metadata, failure count)
+        """
+        self.rng = random.Random(self._derive_seed(emotion, request, chunk_index))
         
         # Create emotion-specific directory
         emotion_dir = self.cycle_dir / emotion.lower()
-        emotion_dir.mkdir(parents=True, exist_ok=True)
+        if self.image_storage == "files":
+            emotion_dir.mkdir(parents=True, exist_ok=True)
         
-        # Get variation combinations
-        variations = self._get_variation_combinations(emotion, count)
-        generated = []
+        built = []
+        failures = 0
         
-        for idx, variation in enumerate(variations):
-            image_id = self._generate_image_id(emotion, idx)
+        for variation, image_id in zip(variations, image_ids):
             image_filename = f"{emotion.lower()}_{image_id}.png"
             image_path = emotion_dir / image_filename
             
+            # Reused samples keep pointing at their existing content
+            location = reused.get(image_id, {"image_path": str(image_path)})
+            
             # Generate prompt
             prompt = get_prompt_for_emotion(emotion, variation)
             
             # Create metadata
-            metadata = ImageMetadata(
+            built.append(ImageMetadata(
                 image_id=image_id,
                 emotion_label=emotion,
                 intensity_level=variation["intensity"],
@@ -205,27 +506,156 @@ class DataGenerator:
                 background=variation["background"],
                 glasses=variation["glasses"],
                 occlusion_flag=variation["occlusion"] != "none",
-                image_path=str(image_path),
                 generated_at=datetime.now().isoformat(),
                 prompt_used=prompt,
-            )
+                **location,
+            ))
+        
+        # Reused samples already have content on disk; only write new ones
+        new = [m for m in built if m.image_id not in reused]
+        written = set()
+        
+        # Create the images (placeholders in demo mode)
+        if new and self.image_storage == "shards":
+            prefix = f"{emotion.lower()}_r{request:02d}_c{chunk_index:04d}"
+            with ShardWriter(get_shard_dir(self.cycle_number), prefix=prefix) as writer:
+                if self._pack_placeholder_images(new, writer):
+                    written = {m.image_id for m in new}
+                else:
+                    failures = len(new)
+        else:
+            for metadata in new:
+                if self._create_placeholder_image(emotion, Path(metadata.image_path), metadata):
+                    written.add(metadata.image_id)
+                else:
+                    failures += 1
+        
+        generated = [m for m in built if m.image_id in reused or m.image_id in written]
+        
+        return generated, failures
+    
+    def _clear_cycle_shards(self):
+        """
+        Remove shards left in the cycle by an earlier run, once per generator.
+        
+        Shard writers append to existing shards, so a rerun of the cycle would
+        otherwise stack its records onto the previous run's. Registered
+        samples stored there fail the registry's existence check afterwards
+        and are generated again.
+        """
+        if self._shards_cleared:
+            return
+        self._shards_cleared = True
+        
+        shard_dir = get_shard_dir(self.cycle_number)
+        if shard_dir.exists():
+            shutil.rmtree(shard_dir)
+    
+    def _generate_emotions(self, requests: List[Tuple[str, Optional[int]]]) -> List[ImageMetadata]:
+        """
+        Generate images for a list of (emotion, count) requests.
+        
+        Variation plans are sampled up front, split into chunks of
+        GENERATION_CHUNK_SIZE and built either in-process or across a pool of
+        self.workers processes. Results are merged in request and chunk order,
+        so metadata and statistics are identical for any worker count.
+        
+        Args:
+            requests: (emotion, count) pairs; count None uses the config default
             
-            # Create the image (placeholder in demo mode)
-            if self._create_placeholder_image(emotion, image_path, metadata):
-                generated.append(metadata)
-                self.generation_stats["per_emotion"][emotion] += 1
-            else:
-                self.generation_stats["failures"] += 1
+        Returns:
+            List of generated image metadata
+        """
+        self._clear_cycle_shards()
+        registry = SampleRegistry() if self.reuse_samples else None
+        plans = []
+        tasks = []
+        for emotion, count in requests:
+            if emotion not in EMOTION_LABELS:
+                raise ValueError(f"Unknown emotion: {emotion}")
+            
+            request = self._emotion_requests.get(emotion, 0)
+            variations = self._plan_emotion(emotion, count)
+            plans.append((emotion, len(variations)))
+            
+            # Content-addressed IDs; repeats within the cycle get a replica index
+            image_ids = []
+            for variation in variations:
+                base_id = self._generate_image_id(emotion, variation)
+                replica = self._id_counts.get(base_id, 0)
+                self._id_counts[base_id] = replica + 1
+                image_ids.append(
+                    base_id if replica == 0 else self._generate_image_id(emotion, variation, replica)
+                )
+            
+            reused = registry.lookup_images(image_ids) if registry else {}
             
-            # Progress indicator
-            if (idx + 1) % max(1, count // 5) == 0:
-                print(f"  ✓ Generated {idx + 1}/{count} images")
+            chunks = range(0, len(variations), GENERATION_CHUNK_SIZE)
+            for chunk_index, start in enumerate(chunks):
+                chunk_ids = image_ids[start:start + GENERATION_CHUNK_SIZE]
+                tasks.append(ChunkTask(
+                    cycle_number=self.cycle_number,
+                    seed=self.seed,
+                    sampling_mode=self.sampling_mode,
+                    image_storage=self.image_storage,
+                    emotion=emotion,
+                    request=request,
+                    chunk_index=chunk_index,
+                    variations=variations[start:start + GENERATION_CHUNK_SIZE],
+                    image_ids=chunk_ids,
+                    reused={image_id: reused[image_id] for image_id in chunk_ids if image_id in reused},
+                ))
+        
+        if self.workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(tasks))) as pool:
+                chunk_results = list(pool.map(_build_chunk_task, tasks))
+        else:
+            chunk_results = [task.build(self) for task in tasks]
+        
+        generated = []
+        task_iter = iter(zip(tasks, chunk_results))
+        for emotion, count in plans:
+            print(f"📸 Generating {count} images for emotion: {emotion}")
+            
+            emotion_generated = []
+            done = 0
+            while done < count:
+                task, (chunk_generated, failures) = next(task_iter)
+                emotion_generated.extend(chunk_generated)
+                self.generation_stats["failures"] += failures
+                done += len(task.variations)
+                self.generation_stats["reused"] += len(task.reused)
+                print(f"  ✓ Generated {done}/{count} images")
+            
+            self.generation_stats["per_emotion"][emotion] += len(emotion_generated)
+            generated.extend(emotion_generated)
+            print()
+        
+        if registry:
+            registry.register_images(self.cycle_number, [asdict(m) for m in generated])
+            registry.close()
         
         self.generated_metadata.extend(generated)
         self.generation_stats["total_generated"] += len(generated)
         
         return generated
     
+    def generate_for_emotion(self, emotion: str, count: Optional[int] = None) -> List[ImageMetadata]:
+        """
+        Generate synthetic images for a specific emotion.
+        
+        In stratified mode the covering set decides the count; an explicit
+        count only tops it up.
+        
+        Args:
+            emotion: Target emotion label
+            count: Number of images to generate (uses config default if None)
+            
+        Returns:
+            List of generated image metadata
+        """
+        return self._generate_emotions([(emotion, count)])
+    
     def generate_all_emotions(self) -> List[ImageMetadata]:
         """
         Generate synthetic images for all emotions.
@@ -236,16 +666,19 @@ class DataGenerator:
         print("=" * 60)
         print(f"🚀 Starting Data Generation - Cycle {self.cycle_number}")
         print(f"   Mode: {'DEMO' if DEMO_MODE else 'PRODUCTION'}")
-        print(f"   Target: {get_images_per_emotion()} images per emotion")
-        print(f"   Total: {get_images_per_emotion() * len(EMOTION_LABELS)} images")
+        if self.sampling_mode == "stratified":
+            print(f"   Sampling: stratified (>= {STRATIFIED_MIN_PER_CATEGORY} per category, "
+                  f">= {STRATIFIED_MIN_PER_PAIR} per pair cell)")
+        else:
+            print(f"   Target: {get_images_per_emotion()} images per emotion")
+            print(f"   Total: {get_images_per_emotion() * len(EMOTION_LABELS)} images")
+        print(f"   Workers: {self.workers}")
         print("=" * 60)
         
         self.generation_stats["start_time"] = datetime.now().isoformat()
         ensure_directories()
         
-        for emotion in EMOTION_LABELS:
-            self.generate_for_emotion(emotion)
-            print()
+        self._generate_emotions([(emotion, None) for emotion in EMOTION_LABELS])
         
         self.generation_stats["end_time"] = datetime.now().isoformat()
         
@@ -276,28 +709,63 @@ class DataGenerator:
         
         extra_count = get_images_per_emotion() * multiplier
         
-        for emotion in weak_emotions:
-            if emotion in EMOTION_LABELS:
-                self.generate_for_emotion(emotion, extra_count)
-                print()
+        self._generate_emotions([
+            (emotion, extra_count) for emotion in weak_emotions if emotion in EMOTION_LABELS
+        ])
         
         self._save_metadata()
         return self.generated_metadata
     
     def _save_metadata(self):
-        """Save all generated metadata to file."""
-        self.metadata_path.parent.mkdir(parents=True, exist_ok=True)
+        """
+        Save all generated metadata in the configured METADATA_FORMAT.
         
-        data = {
-            "cycle_number": self.cycle_number,
-            "generation_stats": self.generation_stats,
-            "images": [asdict(m) for m in self.generated_metadata],
-        }
+        The columnar metadata is also kept as ``cycle_metadata`` so the
+        evaluator can take it directly instead of re-reading it. A file of
+        the cycle left in the other format by an earlier run is removed, so
+        it can never be loaded in place of this one.
+        """
+        records = [asdict(m) for m in self.generated_metadata]
+        generation_stats = dict(self.generation_stats)
+        self.cycle_metadata = CycleMetadata.from_records(self.cycle_number, generation_stats, records)
+        
+        if METADATA_FORMAT in ("columnar", "both"):
+            store_path = get_metadata_store_path(self.cycle_number)
+            persist(save_cycle_metadata, self.cycle_metadata, store_path,
+                    writer=self.writer, description=str(store_path))
+            print(f"💾 Metadata saved to: {store_path}")
+        else:
+            get_metadata_store_path(self.cycle_number).unlink(missing_ok=True)
         
-        with open(self.metadata_path, "w") as f:
-            json.dump(data, f, indent=2)
+        if METADATA_FORMAT in ("json", "both"):
+            data = {
+                "cycle_number": self.cycle_number,
+                "generation_stats": generation_stats,
+                "images": records,
+            }
+            persist_json(self.metadata_path, data, writer=self.writer)
+            print(f"💾 Metadata saved to: {self.metadata_path}")
+        else:
+            self.metadata_path.unlink(missing_ok=True)
+    
+    def output_paths(self) -> List[Path]:
+        """
+        Files holding the cycle's generated data.
         
-        print(f"💾 Metadata saved to: {self.metadata_path}")
+        Returns:
+            The metadata file(s) in METADATA_FORMAT, then each shard (or
+            loose placeholder file) holding the cycle's samples
+        """
+        paths = []
+        if METADATA_FORMAT in ("columnar", "both"):
+            paths.append(get_metadata_store_path(self.cycle_number))
+        if METADATA_FORMAT in ("json", "both"):
+            paths.append(self.metadata_path)
+        
+        samples = dict.fromkeys(
+            m.shard_path or str(Path(m.image_path).with_suffix(".json")) for m in self.generated_metadata
+        )
+        return paths + [Path(p) for p in samples]
     
     def _print_summary(self):
         """Print generation summary."""
@@ -306,27 +774,35 @@ class DataGenerator:
         print("=" * 60)
         print(f"Total images generated: {self.generation_stats['total_generated']}")
         print(f"Failures: {self.generation_stats['failures']}")
+        print(f"Reused from earlier cycles: {self.generation_stats['reused']}")
         print("\nPer-emotion breakdown:")
         for emotion, count in self.generation_stats["per_emotion"].items():
             print(f"  {emotion}: {count}")
         print("=" * 60)
 
 
+def _build_chunk_task(task: ChunkTask) -> Tuple[List[ImageMetadata], int]:
+    """Process-pool entry point: rebuild a generator and build one chunk."""
+    generator = DataGenerator(task.cycle_number, task.seed, task.sampling_mode, task.image_storage,
+                              workers=1, reuse_samples=False)
+    return task.build(generator)
+
+
 def load_metadata(cycle_number: int) -> Optional[Dict]:
     """
     Load metadata from a previous generation cycle.
     
+    Reads the columnar store (or the legacy JSON file) and returns it in the
+    legacy dict layout. Use metadata_store.load_cycle_metadata for columns.
+    
     Args:
         cycle_number: Cycle number to load
         
     Returns:
         Metadata dictionary or None if not found
     """
-    metadata_path = get_metadata_path(cycle_number)
-    if metadata_path.exists():
-        with open(metadata_path, "r") as f:
-            return json.load(f)
-    return None
+    metadata = load_cycle_metadata(cycle_number)
+    return metadata.to_dict() if metadata is not None else None
 
 
 if __name__ == "__main__":
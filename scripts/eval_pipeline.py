@@ -0,0 +1,266 @@
+"""
+Autonomous Emotion Recognition Testing Pipeline - Prefetch Pipeline
+===================================================================
+Bounded-queue producer/consumer pipeline for evaluation.
+
+Three stages overlap so the interpreter does not wait on I/O:
+- prepare:    worker threads read, decode and preprocess batches
+- inference:  one thread runs the model over prepared batches, in order
+- aggregate:  the consuming thread scores and aggregates results
+
+Each stage records its busy time and each queue its depth, so the report
+shows which stage is the bottleneck.
+"""
+
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List
+
+from pipeline_config import EVAL_PREFETCH_THREADS, EVAL_QUEUE_DEPTH
+
+
+_DONE = object()  # End-of-stream marker
+
+
+class _Failure:
+    """Carries a stage exception to the consumer."""
+    
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+@dataclass
+class StageStats:
+    """Busy time of one pipeline stage."""
+    name: str
+    threads: int
+    busy_s: float = 0.0
+    items: int = 0
+    
+    def utilization(self, wall_s: float) -> float:
+        """Fraction of the stage's thread time spent working."""
+        return self.busy_s / (wall_s * self.threads) if wall_s > 0 else 0.0
+
+
+@dataclass
+class QueueStats:
+    """Depth of one bounded queue, sampled whenever an item is taken."""
+    name: str
+    capacity: int
+    samples: int = 0
+    depth_sum: int = 0
+    max_depth: int = 0
+    
+    def sample(self, depth: int):
+        self.samples += 1
+        self.depth_sum += depth
+        self.max_depth = max(self.max_depth, depth)
+    
+    @property
+    def mean_depth(self) -> float:
+        return self.depth_sum / self.samples if self.samples else 0.0
+
+
+class PrefetchPipeline:
+    """
+    Runs prepare and inference stages on background threads.
+    
+    ``run`` yields inference outputs in input order; whatever the caller does
+    with each output is timed as the aggregate stage.
+    """
+    
+    def __init__(self, prepare: Callable, infer: Callable,
+                 prepare_threads: int = EVAL_PREFETCH_THREADS, queue_depth: int = EVAL_QUEUE_DEPTH):
+        """
+        Set up the pipeline.
+        
+        Args:
+            prepare: Item -> prepared batch (called concurrently)
+            infer: Prepared batch -> inference output (called on one thread)
+            prepare_threads: Threads in the prepare stage
+            queue_depth: Capacity of each inter-stage queue
+        """
+        self.prepare = prepare
+        self.infer = infer
+        self.prepare_threads = max(1, prepare_threads)
+        self.queue_depth = max(1, queue_depth)
+        
+        self.stages = {
+            "prepare": StageStats("prepare", self.prepare_threads),
+            "inference": StageStats("inference", 1),
+            "aggregate": StageStats("aggregate", 1),
+        }
+        self.queues = {
+            "prepared": QueueStats("prepared", self.queue_depth),
+            "inferred": QueueStats("inferred", self.queue_depth),
+        }
+        self.wall_s = 0.0
+    
+    def _put(self, q: queue.Queue, item, stop: threading.Event) -> bool:
+        """Blocking put that gives up once the pipeline is stopped."""
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def _prepare_worker(self, items: Iterator, lock: threading.Lock, in_flight: threading.Semaphore,
+                        prepared: queue.Queue, stop: threading.Event):
+        stats = self.stages["prepare"]
+        while not stop.is_set():
+            # Bound prepared batches held anywhere (queue or reorder buffer)
+            while not in_flight.acquire(timeout=0.1):
+                if stop.is_set():
+                    return
+            with lock:
+                index, item = next(items, (None, _DONE))
+            if item is _DONE:
+                in_flight.release()
+                break
+            
+            start_time = time.perf_counter()
+            try:
+                result = self.prepare(item)
+            except BaseException as e:
+                result = _Failure(e)
+            with lock:
+                stats.busy_s += time.perf_counter() - start_time
+                stats.items += 1
+            
+            if not self._put(prepared, (index, result), stop):
+                return
+        
+        self._put(prepared, (None, _DONE), stop)
+    
+    def _inference_worker(self, prepared: queue.Queue, inferred: queue.Queue,
+                          in_flight: threading.Semaphore, stop: threading.Event):
+        stats = self.stages["inference"]
+        waiting: Dict[int, object] = {}
+        next_index = 0
+        finished = 0
+        
+        while finished < self.prepare_threads and not stop.is_set():
+            try:
+                index, result = prepared.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            self.queues["prepared"].sample(prepared.qsize() + 1)
+            if result is _DONE:
+                finished += 1
+                continue
+            waiting[index] = result
+            
+            # Run inference in input order
+            while next_index in waiting:
+                result = waiting.pop(next_index)
+                next_index += 1
+                in_flight.release()
+                
+                if not isinstance(result, _Failure):
+                    start_time = time.perf_counter()
+                    try:
+                        result = self.infer(result)
+                    except BaseException as e:
+                        result = _Failure(e)
+                    stats.busy_s += time.perf_counter() - start_time
+                    stats.items += 1
+                
+                if not self._put(inferred, result, stop):
+                    return
+        
+        self._put(inferred, _DONE, stop)
+    
+    def run(self, items: Iterable) -> Iterator:
+        """
+        Stream items through the prepare and inference stages.
+        
+        Args:
+            items: Inputs to the prepare stage
+        
+        Yields:
+            Inference outputs in input order
+        
+        Raises:
+            Any exception raised by a stage, when its item is reached
+        """
+        prepared = queue.Queue(self.queue_depth)
+        inferred = queue.Queue(self.queue_depth)
+        in_flight = threading.Semaphore(self.queue_depth + self.prepare_threads)
+        stop = threading.Event()
+        lock = threading.Lock()
+        numbered = iter(enumerate(items))
+        
+        threads = [
+            threading.Thread(target=self._prepare_worker, args=(numbered, lock, in_flight, prepared, stop),
+                             name=f"eval-prepare-{i}", daemon=True)
+            for i in range(self.prepare_threads)
+        ]
+        threads.append(threading.Thread(target=self._inference_worker, args=(prepared, inferred, in_flight, stop),
+                                        name="eval-inference", daemon=True))
+        
+        start_time = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        
+        stats = self.stages["aggregate"]
+        try:
+            while True:
+                result = inferred.get()
+                self.queues["inferred"].sample(inferred.qsize() + 1)
+                if result is _DONE:
+                    break
+                if isinstance(result, _Failure):
+                    raise result.error
+                
+                consume_start = time.perf_counter()
+                yield result
+                stats.busy_s += time.perf_counter() - consume_start
+                stats.items += 1
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            self.wall_s += time.perf_counter() - start_time
+    
+    def report(self) -> Dict:
+        """
+        Summarize stage utilization and queue depths.
+        
+        Returns:
+            Dict with wall time, per-stage threads/items/busy/utilization,
+            per-queue capacity and mean/max depth, and the bottleneck stage
+        """
+        stages = {
+            name: {
+                "threads": s.threads,
+                "items": s.items,
+                "busy_s": s.busy_s,
+                "utilization": s.utilization(self.wall_s),
+            }
+            for name, s in self.stages.items()
+        }
+        return {
+            "wall_s": self.wall_s,
+            "stages": stages,
+            "queues": {
+                name: {"capacity": q.capacity, "mean_depth": q.mean_depth, "max_depth": q.max_depth}
+                for name, q in self.queues.items()
+            },
+            "bottleneck": max(stages, key=lambda name: stages[name]["utilization"]),
+        }
+
+
+def format_report(report: Dict) -> List[str]:
+    """Human-readable lines for a pipeline report."""
+    lines = []
+    for name, stage in report["stages"].items():
+        lines.append(f"{name}: {stage['utilization'] * 100:.0f}% busy "
+                     f"({stage['threads']} thread{'s' if stage['threads'] > 1 else ''}, {stage['items']} batches)")
+    for name, q in report["queues"].items():
+        lines.append(f"{name} queue: mean depth {q['mean_depth']:.1f}/{q['capacity']}, max {q['max_depth']}")
+    lines.append(f"bottleneck: {report['bottleneck']}")
+    return lines
@@ -2,20 +2,51 @@
 Autonomous Emotion Recognition Testing Pipeline - Failure Analyzer
 ==================================================================
 Analyzes model failures, detects bias, and identifies improvement areas.
+
+Per-sample results are joined to the cycle metadata and encoded once into
+integer-coded arrays (emotion, prediction, failure type, category per bias
+dimension). Confusion, per-category accuracy and failure counts then come
+from a single set of grouped ``bincount`` reductions that every analysis
+shares. Accuracies carry Wilson intervals and bias gaps bootstrap
+intervals (see confidence_intervals).
 """
 
+import itertools
 import json
 from collections import defaultdict
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass, asdict
+from typing import Dict, Iterable, List, Optional, Tuple
+from dataclasses import dataclass, asdict, field
+
+import numpy as np
 
+from background_writer import BackgroundWriter, persist, persist_json
 from pipeline_config import (
     EMOTION_LABELS, DEMOGRAPHICS, ENVIRONMENTAL_VARIATIONS,
     CONFIDENCE_THRESHOLD, BIAS_THRESHOLD, TARGET_PER_EMOTION_ACCURACY,
-    get_results_path, get_metadata_path, REPORTS_DIR
+    BIAS_REQUIRE_SIGNIFICANCE, BOOTSTRAP_SEED, CI_LEVEL, get_bias_cube_path, get_results_path, REPORTS_DIR
 )
+from bias_cube import CUBE_DIMENSIONS, BiasCube, IntersectionalCell
+from confidence_intervals import bootstrap_gap_interval, wilson_interval
+from metadata_store import CycleMetadata, load_cycle_metadata
+from postprocessing import FAILURE_TYPES, ScoredBatch, label_indices
+from result_stream import iter_individual_results
+
+
+# Metadata columns analyzed for bias, with their expected categories
+BIAS_DIMENSIONS = {
+    "skin_tone": DEMOGRAPHICS["skin_tone"],
+    "age_group": DEMOGRAPHICS["age_group"],
+    "gender": DEMOGRAPHICS["gender"],
+    "lighting_condition": ENVIRONMENTAL_VARIATIONS["lighting"],
+    "head_pose": ENVIRONMENTAL_VARIATIONS["head_pose"],
+}
+
+_FAILURE_CODE = {name: code for code, name in enumerate(FAILURE_TYPES)}
+
+# Result records parsed per step of encode_results
+ENCODE_CHUNK_SIZE = 8192
 
 
 @dataclass
@@ -38,7 +69,9 @@ class BiasReport:
     max_category: str
     min_category: str
     bias_gap: float  # max - min
-    is_biased: bool  # True if bias_gap > BIAS_THRESHOLD
+    is_biased: bool  # True if the gap (its lower CI bound, see BIAS_REQUIRE_SIGNIFICANCE) > BIAS_THRESHOLD
+    gap_interval: Optional[List[float]] = None  # Bootstrap [low, high] of bias_gap
+    category_intervals: Dict[str, List[float]] = field(default_factory=dict)  # Wilson [low, high]
 
 
 @dataclass
@@ -62,6 +95,168 @@ class FailureAnalysis:
     weak_conditions: Dict[str, List[str]]  # {dimension: [weak_categories]}
     overall_health: str  # "good", "moderate", "poor"
     priority_improvements: List[str]
+    intersectional_bias: List[IntersectionalCell] = field(default_factory=list)
+    overall_accuracy_interval: Optional[List[float]] = None  # Wilson [low, high]
+    emotion_accuracy_intervals: Dict[str, List[float]] = field(default_factory=dict)
+
+
+@dataclass
+class EncodedResults:
+    """Per-sample results joined to metadata, one array entry per result."""
+    true_index: np.ndarray        # int16 index into EMOTION_LABELS, -1 if unknown
+    predicted_index: np.ndarray   # int16, -1 for no prediction
+    correct: np.ndarray           # bool
+    failure_code: np.ndarray      # int8 index into FAILURE_TYPES
+    is_ambiguous: np.ndarray      # bool
+    metadata_row: np.ndarray      # int64 row in the cycle metadata, -1 if missing
+    dimension_codes: Dict[str, np.ndarray]  # {dimension: index into its categories, -1 if none}
+    
+    def __len__(self) -> int:
+        return len(self.true_index)
+
+
+def _column_codes(metadata: CycleMetadata, name: str) -> Tuple[np.ndarray, List[str]]:
+    """Integer codes and category table of a metadata column."""
+    if metadata.is_categorical(name):
+        return metadata.codes(name), metadata.categories(name)
+    table, codes = np.unique(np.asarray(metadata.column(name), dtype=str), return_inverse=True)
+    return codes, table.tolist()
+
+
+def encode_results(results: Iterable[Dict], metadata: CycleMetadata,
+                   dimensions: Dict[str, List[str]] = BIAS_DIMENSIONS) -> EncodedResults:
+    """
+    Encode per-sample results and join them to their metadata rows.
+    
+    Results are consumed in one pass, ENCODE_CHUNK_SIZE records at a time,
+    so a streamed results file is never held in memory as records; only the
+    compact encoded arrays grow with the sample count. The join sorts the
+    metadata image IDs once and looks each chunk up with a vectorized binary
+    search.
+    
+    Args:
+        results: Per-sample result records (e.g. a streamed iterator)
+        metadata: Metadata of the evaluated cycle
+        dimensions: {metadata column: expected categories} to encode
+    
+    Returns:
+        EncodedResults
+    """
+    join = _MetadataJoin(metadata, dimensions)
+    chunks = []
+    records = iter(results)
+    while True:
+        fields = [
+            (r.get("image_id", ""), r.get("true_emotion"), r.get("predicted_emotion"),
+             bool(r.get("correct")), _FAILURE_CODE.get(r.get("failure_type"), 0), bool(r.get("is_ambiguous")))
+            for r in itertools.islice(records, ENCODE_CHUNK_SIZE)
+        ]
+        if not fields and chunks:
+            break
+        image_ids, true_labels, predicted_labels, correct, failure_code, ambiguous = (
+            zip(*fields) if fields else ((),) * 6
+        )
+        chunks.append(join(
+            EncodedResults(
+                true_index=label_indices(true_labels),
+                predicted_index=label_indices(predicted_labels),
+                correct=np.array(correct, dtype=bool),
+                failure_code=np.array(failure_code, dtype=np.int8),
+                is_ambiguous=np.array(ambiguous, dtype=bool),
+                metadata_row=np.zeros(0, dtype=np.int64),
+                dimension_codes={},
+            ),
+            image_ids,
+        ))
+        if len(fields) < ENCODE_CHUNK_SIZE:
+            break
+    
+    if len(chunks) == 1:
+        return chunks[0]
+    return EncodedResults(
+        true_index=np.concatenate([c.true_index for c in chunks]),
+        predicted_index=np.concatenate([c.predicted_index for c in chunks]),
+        correct=np.concatenate([c.correct for c in chunks]),
+        failure_code=np.concatenate([c.failure_code for c in chunks]),
+        is_ambiguous=np.concatenate([c.is_ambiguous for c in chunks]),
+        metadata_row=np.concatenate([c.metadata_row for c in chunks]),
+        dimension_codes={
+            dimension: np.concatenate([c.dimension_codes[dimension] for c in chunks])
+            for dimension in dimensions
+        },
+    )
+
+
+def encode_scored(scored: ScoredBatch, metadata: CycleMetadata,
+                  dimensions: Dict[str, List[str]] = BIAS_DIMENSIONS) -> EncodedResults:
+    """
+    Encode scored predictions kept in memory and join them to their metadata rows.
+    
+    Equivalent to ``encode_results(list(scored.records()), ...)`` without
+    building or parsing the per-sample records.
+    
+    Args:
+        scored: Scored predictions of the cycle
+        metadata: Metadata of the evaluated cycle
+        dimensions: {metadata column: expected categories} to encode
+    
+    Returns:
+        EncodedResults
+    """
+    return _MetadataJoin(metadata, dimensions)(
+        EncodedResults(
+            true_index=scored.true_index.astype(np.int16),
+            predicted_index=scored.predicted_index.astype(np.int16),
+            correct=scored.correct.astype(bool),
+            failure_code=scored.failure_code.astype(np.int8),
+            is_ambiguous=scored.is_ambiguous.astype(bool),
+            metadata_row=np.zeros(0, dtype=np.int64),
+            dimension_codes={},
+        ),
+        scored.image_ids,
+    )
+
+
+class _MetadataJoin:
+    """Fills in the metadata rows and dimension codes of encoded results."""
+    
+    def __init__(self, metadata: CycleMetadata, dimensions: Dict[str, List[str]]):
+        # Join on image ID: binary search into the sorted metadata IDs
+        metadata_ids = np.asarray(metadata.column("image_id"), dtype=str)
+        self.order = np.argsort(metadata_ids, kind="stable")
+        self.sorted_ids = metadata_ids[self.order]
+        
+        # Metadata codes -> positions in each dimension's expected categories
+        self.dimensions: Dict[str, Optional[Tuple[np.ndarray, np.ndarray]]] = {}
+        for dimension, categories in dimensions.items():
+            if dimension in metadata.column_names:
+                column_codes, table = _column_codes(metadata, dimension)
+                remap = np.array([categories.index(c) if c in categories else -1 for c in table] or [-1],
+                                 dtype=np.int16)
+                self.dimensions[dimension] = (column_codes, remap)
+            else:
+                self.dimensions[dimension] = None
+    
+    def __call__(self, encoded: EncodedResults, image_ids) -> EncodedResults:
+        result_ids = np.asarray(image_ids, dtype=str)
+        metadata_row = np.full(len(result_ids), -1, dtype=np.int64)
+        if len(self.sorted_ids) and len(result_ids):
+            position = np.minimum(np.searchsorted(self.sorted_ids, result_ids), len(self.sorted_ids) - 1)
+            found = self.sorted_ids[position] == result_ids
+            metadata_row[found] = self.order[position[found]]
+        matched = metadata_row >= 0
+        
+        dimension_codes = {}
+        for dimension, lookup in self.dimensions.items():
+            codes = np.full(len(result_ids), -1, dtype=np.int16)
+            if lookup is not None:
+                column_codes, remap = lookup
+                codes[matched] = remap[column_codes[metadata_row[matched]]]
+            dimension_codes[dimension] = codes
+        
+        encoded.metadata_row = metadata_row
+        encoded.dimension_codes = dimension_codes
+        return encoded
 
 
 class FailureAnalyzer:
@@ -75,38 +270,192 @@ class FailureAnalyzer:
     - Improvement prioritization
     """
     
-    def __init__(self, cycle_number: int = 1):
+    def __init__(self, cycle_number: int = 1, writer: Optional[BackgroundWriter] = None):
         """
         Initialize the failure analyzer.
         
         Args:
             cycle_number: Current training cycle number
+            writer: Background writer for the analysis and bias cube files
+                (None = write them before returning)
         """
         self.cycle_number = cycle_number
+        self.writer = writer
+        self.analysis_data: Optional[Dict] = None  # Analysis as saved, from the last analyze
         self.results_data = None
         self.metadata_data = None
-        
+        self._encoded: Optional[EncodedResults] = None
+        self._cached_summary: Optional[Dict] = None
+        self._bias_cube: Optional[BiasCube] = None
+        self._intersectional: Optional[List[IntersectionalCell]] = None
+        self._bias_reports: Optional[List[BiasReport]] = None
+    
     def load_data(self) -> bool:
         """Load results and metadata for analysis."""
         results_path = get_results_path(self.cycle_number)
-        metadata_path = get_metadata_path(self.cycle_number)
         
         if not results_path.exists():
             print(f"❌ Results not found: {results_path}")
             return False
         
-        if not metadata_path.exists():
-            print(f"❌ Metadata not found: {metadata_path}")
+        self.metadata_data = load_cycle_metadata(self.cycle_number)
+        if self.metadata_data is None:
+            print(f"❌ Metadata not found for cycle {self.cycle_number}")
             return False
         
         with open(results_path, "r") as f:
             self.results_data = json.load(f)
-        
-        with open(metadata_path, "r") as f:
-            self.metadata_data = json.load(f)
+        self._reset()
         
         return True
     
+    def use_data(self, results_data: Dict, metadata: CycleMetadata, scored: Optional[ScoredBatch] = None):
+        """
+        Analyze results handed over in memory instead of loading them.
+        
+        Args:
+            results_data: Evaluation results (the results JSON layout)
+            metadata: Metadata of the evaluated cycle
+            scored: The evaluation's scored predictions; when given they are
+                encoded directly, otherwise the per-sample records come from
+                results_data or its streamed predictions file
+        """
+        self.results_data = dict(results_data)
+        self.metadata_data = metadata
+        self._reset()
+        if scored is not None:
+            self._encoded = encode_scored(scored, metadata, {**BIAS_DIMENSIONS, **CUBE_DIMENSIONS})
+    
+    def _reset(self):
+        """Drop everything derived from the previously loaded data."""
+        self._encoded = None
+        self._cached_summary = None
+        self._bias_cube = None
+        self._intersectional = None
+        self._bias_reports = None
+    
+    @property
+    def encoded(self) -> EncodedResults:
+        """
+        The cycle's per-sample results as integer-coded arrays (built once).
+        
+        Records embedded in the results, or streamed to a separate JSONL
+        file, are encoded as they are read.
+        """
+        if self._encoded is None:
+            self._encoded = encode_results(
+                iter_individual_results(self.results_data, self.cycle_number), self.metadata_data,
+                {**BIAS_DIMENSIONS, **CUBE_DIMENSIONS},
+            )
+        return self._encoded
+    
+    def _summary(self) -> Dict:
+        """
+        Grouped counts behind every analysis, computed once per load.
+        
+        Returns:
+            Dict with total_samples, confusion (K x K), per-emotion correct
+            and total, failure_counts, ambiguous, and per-dimension
+            (categories, correct, total)
+        """
+        if self._cached_summary is not None:
+            return self._cached_summary
+        
+        encoded = self.encoded
+        num_labels = len(EMOTION_LABELS)
+        known = encoded.true_index >= 0
+        detected = known & (encoded.predicted_index >= 0)
+        
+        summary = {
+            "total_samples": len(encoded),
+            "confusion": np.bincount(
+                encoded.true_index[detected] * num_labels + encoded.predicted_index[detected],
+                minlength=num_labels * num_labels,
+            ).reshape(num_labels, num_labels),
+            "emotion_total": np.bincount(encoded.true_index[known], minlength=num_labels),
+            "emotion_correct": np.bincount(encoded.true_index[known & encoded.correct], minlength=num_labels),
+            "failure_counts": np.bincount(encoded.failure_code, minlength=len(FAILURE_TYPES)),
+            "ambiguous": int(encoded.is_ambiguous.sum()),
+            "dimensions": {},
+        }
+        
+        for dimension, categories in BIAS_DIMENSIONS.items():
+            codes = encoded.dimension_codes[dimension]
+            valid = codes >= 0
+            summary["dimensions"][dimension] = (
+                categories,
+                np.bincount(codes[valid & encoded.correct], minlength=len(categories)),
+                np.bincount(codes[valid], minlength=len(categories)),
+            )
+        
+        self._cached_summary = summary
+        return summary
+    
+    def _confusion_matrix(self) -> np.ndarray:
+        """Confusion counts from the results, or the evaluation's aggregate if none were kept."""
+        if len(self.encoded):
+            return self._summary()["confusion"]
+        confusion_matrix = self.results_data.get("confusion_matrix", {})
+        return np.array([
+            [confusion_matrix.get(true, {}).get(pred, 0) for pred in EMOTION_LABELS]
+            for true in EMOTION_LABELS
+        ], dtype=np.int64)
+    
+    def _per_emotion_accuracy(self) -> Dict[str, float]:
+        """Per-emotion accuracy from the results, or the evaluation's aggregate if none were kept."""
+        if not len(self.encoded):
+            return self.results_data.get("per_emotion_accuracy", {})
+        summary = self._summary()
+        totals = summary["emotion_total"]
+        accuracy = summary["emotion_correct"] / np.maximum(totals, 1)
+        return {e: float(accuracy[i]) if totals[i] > 0 else 0.0 for i, e in enumerate(EMOTION_LABELS)}
+    
+    @property
+    def bias_cube(self) -> BiasCube:
+        """Count cube over the metadata dimensions this cycle has (built once)."""
+        if self._bias_cube is None:
+            encoded = self.encoded
+            dimensions = {
+                d: c for d, c in CUBE_DIMENSIONS.items() if d in self.metadata_data.column_names
+            }
+            self._bias_cube = BiasCube.build(
+                self.cycle_number, encoded.true_index, encoded.predicted_index,
+                encoded.dimension_codes, dimensions,
+            )
+        return self._bias_cube
+    
+    def analyze_intersectional_bias(self) -> List[IntersectionalCell]:
+        """
+        Find combinations of metadata categories with an accuracy gap.
+        
+        Returns:
+            IntersectionalCell list, largest gap first
+        """
+        if self._intersectional is None:
+            self._intersectional = self.bias_cube.intersectional_gaps()
+        return self._intersectional
+    
+    def accuracy_intervals(self) -> Tuple[List[float], Dict[str, List[float]]]:
+        """
+        Wilson intervals of the overall and per-emotion accuracy.
+        
+        Returns:
+            Tuple of ([low, high], {emotion: [low, high]}) for emotions with samples
+        """
+        if len(self.encoded):
+            summary = self._summary()
+            correct, total = summary["emotion_correct"], summary["emotion_total"]
+        else:
+            counts = self.results_data.get("per_emotion_counts", {})
+            correct = np.array([counts.get(e, {}).get("correct", 0) for e in EMOTION_LABELS])
+            total = np.array([counts.get(e, {}).get("total", 0) for e in EMOTION_LABELS])
+        
+        low, high = wilson_interval(correct, total)
+        overall_low, overall_high = wilson_interval(correct.sum(), total.sum())
+        return [float(overall_low), float(overall_high)], {
+            e: [float(low[i]), float(high[i])] for i, e in enumerate(EMOTION_LABELS) if total[i] > 0
+        }
+    
     def analyze_confusion(self) -> List[ConfusedPair]:
         """
         Analyze confusion matrix to find commonly confused emotion pairs.
@@ -114,53 +463,40 @@ class FailureAnalyzer:
         Returns:
             List of ConfusedPair objects sorted by confusion count
         """
-        confusion_matrix = self.results_data.get("confusion_matrix", {})
+        confusion = self._confusion_matrix()
+        total_samples = len(self.encoded) or self.results_data.get("total_samples", 1)
+        
+        # Each unordered pair once: a->b from the upper triangle, b->a from the lower
+        a_index, b_index = np.triu_indices(len(EMOTION_LABELS), k=1)
+        a_to_b = confusion[a_index, b_index]
+        b_to_a = confusion[b_index, a_index]
+        totals = a_to_b + b_to_a
+        
+        # Top 10 by confusion count (stable, so ties keep matrix order)
+        order = np.argsort(-totals, kind="stable")
+        order = order[totals[order] > 0][:10]
+        
         confused_pairs = []
+        for i in order:
+            emotion_a, emotion_b = EMOTION_LABELS[a_index[i]], EMOTION_LABELS[b_index[i]]
+            
+            # Determine direction
+            if a_to_b[i] > b_to_a[i] * 1.5:
+                direction = f"{emotion_a}->{emotion_b}"
+            elif b_to_a[i] > a_to_b[i] * 1.5:
+                direction = f"{emotion_b}->{emotion_a}"
+            else:
+                direction = "bidirectional"
+            
+            confused_pairs.append(ConfusedPair(
+                emotion_a=emotion_a,
+                emotion_b=emotion_b,
+                confusion_count=int(totals[i]),
+                percentage=(int(totals[i]) / total_samples) * 100,
+                direction=direction,
+            ))
         
-        # Find pairs with significant confusion
-        processed = set()
-        
-        for true_emotion in EMOTION_LABELS:
-            for pred_emotion in EMOTION_LABELS:
-                if true_emotion == pred_emotion:
-                    continue
-                
-                pair_key = tuple(sorted([true_emotion, pred_emotion]))
-                if pair_key in processed:
-                    continue
-                processed.add(pair_key)
-                
-                # Get confusion counts in both directions
-                a_to_b = confusion_matrix.get(true_emotion, {}).get(pred_emotion, 0)
-                b_to_a = confusion_matrix.get(pred_emotion, {}).get(true_emotion, 0)
-                
-                total_confusion = a_to_b + b_to_a
-                
-                if total_confusion > 0:
-                    # Calculate percentage of total samples
-                    total_samples = self.results_data.get("total_samples", 1)
-                    percentage = (total_confusion / total_samples) * 100
-                    
-                    # Determine direction
-                    if a_to_b > b_to_a * 1.5:
-                        direction = f"{true_emotion}->{pred_emotion}"
-                    elif b_to_a > a_to_b * 1.5:
-                        direction = f"{pred_emotion}->{true_emotion}"
-                    else:
-                        direction = "bidirectional"
-                    
-                    confused_pairs.append(ConfusedPair(
-                        emotion_a=true_emotion,
-                        emotion_b=pred_emotion,
-                        confusion_count=total_confusion,
-                        percentage=percentage,
-                        direction=direction,
-                    ))
-        
-        # Sort by confusion count
-        confused_pairs.sort(key=lambda x: x.confusion_count, reverse=True)
-        
-        return confused_pairs[:10]  # Top 10 confused pairs
+        return confused_pairs
     
     def analyze_bias(self) -> List[BiasReport]:
         """
@@ -169,56 +505,37 @@ class FailureAnalyzer:
         Returns:
             List of BiasReport objects for each dimension
         """
-        bias_reports = []
+        if self._bias_reports is not None:
+            return list(self._bias_reports)
         
-        # Get individual results and metadata images
-        results = self.results_data.get("individual_results", [])
-        images = {img["image_id"]: img for img in self.metadata_data.get("images", [])}
-        
-        # Dimensions to analyze
-        dimensions = {
-            "skin_tone": DEMOGRAPHICS["skin_tone"],
-            "age_group": DEMOGRAPHICS["age_group"],
-            "gender": DEMOGRAPHICS["gender"],
-            "lighting_condition": ENVIRONMENTAL_VARIATIONS["lighting"],
-            "head_pose": ENVIRONMENTAL_VARIATIONS["head_pose"],
-        }
+        bias_reports = []
+        rng = np.random.default_rng(BOOTSTRAP_SEED)
         
-        for dimension, categories in dimensions.items():
-            # Track accuracy per category
-            category_stats = {cat: {"correct": 0, "total": 0} for cat in categories}
-            
-            for result in results:
-                image_id = result.get("image_id")
-                if image_id not in images:
-                    continue
-                
-                img_meta = images[image_id]
-                category = img_meta.get(dimension)
-                
-                if category and category in category_stats:
-                    category_stats[category]["total"] += 1
-                    if result.get("correct"):
-                        category_stats[category]["correct"] += 1
-            
+        for dimension, (categories, correct, total) in self._summary()["dimensions"].items():
             # Calculate accuracies
-            category_accuracies = {}
-            for cat, stats in category_stats.items():
-                if stats["total"] > 0:
-                    category_accuracies[cat] = stats["correct"] / stats["total"]
-                else:
-                    category_accuracies[cat] = 0.0
+            accuracies = correct / np.maximum(total, 1)
+            category_accuracies = {
+                cat: float(accuracies[i]) if total[i] > 0 else 0.0 for i, cat in enumerate(categories)
+            }
             
-            if not category_accuracies:
+            # Empty categories have no accuracy to compare; leave them out of
+            # the gap just as bootstrap_gap_interval does
+            observed = {cat: category_accuracies[cat] for i, cat in enumerate(categories) if total[i] > 0}
+            if not observed:
                 continue
             
             # Find max/min
-            max_acc = max(category_accuracies.values())
-            min_acc = min(category_accuracies.values())
-            max_cat = max(category_accuracies, key=category_accuracies.get)
-            min_cat = min(category_accuracies, key=category_accuracies.get)
+            max_acc = max(observed.values())
+            min_acc = min(observed.values())
+            max_cat = max(observed, key=observed.get)
+            min_cat = min(observed, key=observed.get)
             bias_gap = max_acc - min_acc
             
+            # Interval of the gap between the observed categories
+            gap_low, gap_high = bootstrap_gap_interval(correct, total, rng=rng)
+            category_low, category_high = wilson_interval(correct, total)
+            significant_gap = gap_low if BIAS_REQUIRE_SIGNIFICANCE else bias_gap
+            
             bias_reports.append(BiasReport(
                 dimension=dimension,
                 category_accuracies=category_accuracies,
@@ -227,13 +544,19 @@ class FailureAnalyzer:
                 max_category=max_cat,
                 min_category=min_cat,
                 bias_gap=bias_gap,
-                is_biased=bias_gap > BIAS_THRESHOLD,
+                is_biased=significant_gap > BIAS_THRESHOLD,
+                gap_interval=[gap_low, gap_high],
+                category_intervals={
+                    cat: [float(category_low[i]), float(category_high[i])]
+                    for i, cat in enumerate(categories) if total[i] > 0
+                },
             ))
         
         # Sort by bias gap
         bias_reports.sort(key=lambda x: x.bias_gap, reverse=True)
         
-        return bias_reports
+        self._bias_reports = bias_reports
+        return list(bias_reports)
     
     def detect_failure_patterns(self) -> List[FailurePattern]:
         """
@@ -243,14 +566,16 @@ class FailureAnalyzer:
             List of FailurePattern objects
         """
         patterns = []
-        results = self.results_data.get("individual_results", [])
-        total_samples = len(results)
+        summary = self._summary()
+        total_samples = summary["total_samples"]
         
         if total_samples == 0:
             return patterns
         
+        failure_counts = dict(zip(FAILURE_TYPES, summary["failure_counts"].tolist()))
+        
         # Pattern 1: Low confidence failures
-        low_conf_failures = sum(1 for r in results if r.get("failure_type") == "low_confidence")
+        low_conf_failures = failure_counts["low_confidence"]
         if low_conf_failures > 0:
             patterns.append(FailurePattern(
                 pattern_type="low_confidence",
@@ -261,7 +586,7 @@ class FailureAnalyzer:
             ))
         
         # Pattern 2: Ambiguous predictions
-        ambiguous = sum(1 for r in results if r.get("is_ambiguous"))
+        ambiguous = summary["ambiguous"]
         if ambiguous > 0:
             patterns.append(FailurePattern(
                 pattern_type="ambiguous",
@@ -272,8 +597,7 @@ class FailureAnalyzer:
             ))
         
         # Pattern 3: Consistent misclassification
-        failure_breakdown = self.results_data.get("failure_breakdown", {})
-        misclass = failure_breakdown.get("misclassification", 0)
+        misclass = failure_counts["misclassification"]
         if misclass > total_samples * 0.1:  # > 10%
             patterns.append(FailurePattern(
                 pattern_type="consistent_misclassification",
@@ -284,7 +608,7 @@ class FailureAnalyzer:
             ))
         
         # Pattern 4: Detection failures
-        no_detect = failure_breakdown.get("no_detection", 0)
+        no_detect = failure_counts["no_detection"]
         if no_detect > 0:
             patterns.append(FailurePattern(
                 pattern_type="no_detection",
@@ -303,7 +627,7 @@ class FailureAnalyzer:
         Returns:
             Tuple of (weak_emotions, weak_conditions dict)
         """
-        per_emotion_acc = self.results_data.get("per_emotion_accuracy", {})
+        per_emotion_acc = self._per_emotion_accuracy()
         
         # Find weak emotions (below target)
         weak_emotions = [
@@ -339,7 +663,7 @@ class FailureAnalyzer:
         mean_conf = self.results_data.get("mean_confidence", 0)
         
         # Check per-emotion accuracy
-        per_emotion_acc = self.results_data.get("per_emotion_accuracy", {})
+        per_emotion_acc = self._per_emotion_accuracy()
         all_above_target = all(acc >= TARGET_PER_EMOTION_ACCURACY for acc in per_emotion_acc.values())
         
         if overall_acc >= 0.9 and mean_conf >= 0.8 and all_above_target:
@@ -374,6 +698,15 @@ class FailureAnalyzer:
                     f"({report.max_accuracy*100:.1f}%)"
                 )
         
+        # Priority 2b: The worst intersection that is worse than its parts
+        for cell in self.analyze_intersectional_bias():
+            if cell.gap > cell.marginal_gap + BIAS_THRESHOLD:
+                improvements.append(
+                    f"Address intersectional bias: {' × '.join(cell.categories.values())} "
+                    f"({cell.accuracy*100:.1f}% on {cell.samples} samples)"
+                )
+                break
+        
         # Priority 3: Confused pairs
         confused = self.analyze_confusion()
         for pair in confused[:3]:  # Top 3
@@ -402,16 +735,23 @@ class FailureAnalyzer:
         print(f"🔍 Failure Analysis - Cycle {self.cycle_number}")
         print("=" * 60)
         
-        if not self.load_data():
+        # Data handed over with use_data is analyzed as is
+        if self.results_data is None and not self.load_data():
             raise RuntimeError("Failed to load data for analysis")
         
         # Run all analyses
         confused_pairs = self.analyze_confusion()
         bias_reports = self.analyze_bias()
+        intersectional = self.analyze_intersectional_bias()
         failure_patterns = self.detect_failure_patterns()
         weak_emotions, weak_conditions = self.identify_weak_areas()
         health = self.calculate_health()
         improvements = self.get_priority_improvements()
+        overall_interval, emotion_intervals = self.accuracy_intervals()
+        
+        cube_path = get_bias_cube_path(self.cycle_number)
+        persist(self.bias_cube.save, cube_path, writer=self.writer, description=str(cube_path))
+        print(f"🧊 Bias cube saved to: {cube_path}")
         
         analysis = FailureAnalysis(
             cycle_number=self.cycle_number,
@@ -422,6 +762,9 @@ class FailureAnalyzer:
             weak_conditions=weak_conditions,
             overall_health=health,
             priority_improvements=improvements,
+            intersectional_bias=intersectional,
+            overall_accuracy_interval=overall_interval,
+            emotion_accuracy_intervals=emotion_intervals,
         )
         
         # Save analysis
@@ -433,9 +776,8 @@ class FailureAnalyzer:
         return analysis
     
     def _save_analysis(self, analysis: FailureAnalysis):
-        """Save analysis to file."""
+        """Save analysis to file (kept as ``analysis_data`` for handoff)."""
         analysis_path = REPORTS_DIR / f"cycle_{self.cycle_number:03d}_analysis.json"
-        analysis_path.parent.mkdir(parents=True, exist_ok=True)
         
         # Convert to serializable format
         data = {
@@ -447,10 +789,14 @@ class FailureAnalyzer:
             "weak_conditions": analysis.weak_conditions,
             "overall_health": analysis.overall_health,
             "priority_improvements": analysis.priority_improvements,
+            "intersectional_bias": [asdict(c) for c in analysis.intersectional_bias],
+            "ci_level": CI_LEVEL,
+            "overall_accuracy_interval": analysis.overall_accuracy_interval,
+            "emotion_accuracy_intervals": analysis.emotion_accuracy_intervals,
         }
         
-        with open(analysis_path, "w") as f:
-            json.dump(data, f, indent=2)
+        self.analysis_data = data
+        persist_json(analysis_path, data, writer=self.writer)
         
         print(f"💾 Analysis saved to: {analysis_path}")
     
@@ -458,6 +804,9 @@ class FailureAnalyzer:
         """Print analysis summary."""
         print()
         print(f"📊 Model Health: {analysis.overall_health.upper()}")
+        if analysis.overall_accuracy_interval:
+            low, high = analysis.overall_accuracy_interval
+            print(f"   Accuracy {CI_LEVEL*100:.0f}% CI: {low*100:.1f}% - {high*100:.1f}%")
         print()
         
         print("🎭 Confused Emotion Pairs:")
@@ -468,7 +817,19 @@ class FailureAnalyzer:
         print("⚖️ Bias Analysis:")
         for report in analysis.bias_reports[:3]:
             status = "⚠️ BIASED" if report.is_biased else "✅ OK"
-            print(f"  • {report.dimension}: {status} (gap: {report.bias_gap*100:.1f}%)")
+            interval = ""
+            if report.gap_interval:
+                interval = f", CI {report.gap_interval[0]*100:.1f}-{report.gap_interval[1]*100:.1f}%"
+            print(f"  • {report.dimension}: {status} (gap: {report.bias_gap*100:.1f}%{interval})")
+        
+        print()
+        print("🔀 Intersectional Bias:")
+        if analysis.intersectional_bias:
+            for cell in analysis.intersectional_bias[:3]:
+                print(f"  • {' × '.join(cell.categories.values())}: {cell.accuracy*100:.1f}% "
+                      f"on {cell.samples} samples (gap: {cell.gap*100:.1f}%)")
+        else:
+            print("  None flagged")
         
         print()
         print("😟 Weak Emotions:")
@@ -0,0 +1,394 @@
+"""
+Autonomous Emotion Recognition Testing Pipeline - Inference Backends
+====================================================================
+Pluggable interpreter runtimes for model evaluation.
+
+Evaluation only needs a TFLite interpreter, so the standalone runtimes
+(LiteRT / ``tflite_runtime``) are preferred over importing all of
+TensorFlow, which costs seconds and hundreds of MB per process.
+
+Each runner wraps one loaded model behind the same interface: ``run`` takes
+a preprocessed batch and returns raw outputs of shape (N, classes) in the
+order of the runner's ``labels``.
+"""
+
+import hashlib
+import importlib
+import json
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from pipeline_config import (
+    TFLITE_BACKENDS, EMOTION_LABELS, AFFECTNET_LABELS, CNN_MODEL_PATH, ONNX_MODEL_PATH,
+    ONNX_INTRA_OP_THREADS, ONNX_INTER_OP_THREADS, ONNX_GRAPH_OPTIMIZATION,
+)
+
+
+def _import_litert() -> type:
+    """Interpreter from the LiteRT package (successor of tflite_runtime)."""
+    return importlib.import_module("ai_edge_litert.interpreter").Interpreter
+
+
+def _import_tflite_runtime() -> type:
+    """Interpreter from the standalone tflite_runtime package."""
+    return importlib.import_module("tflite_runtime.interpreter").Interpreter
+
+
+def _import_tensorflow() -> type:
+    """Interpreter bundled with full TensorFlow."""
+    return importlib.import_module("tensorflow").lite.Interpreter
+
+
+# Backend name -> importer returning an Interpreter class
+TFLITE_IMPORTERS: Dict[str, Callable[[], type]] = {
+    "ai_edge_litert": _import_litert,
+    "tflite_runtime": _import_tflite_runtime,
+    "tensorflow": _import_tensorflow,
+}
+
+
+def import_tflite_interpreter(preference: List[str] = TFLITE_BACKENDS) -> Tuple[type, str, float]:
+    """
+    Import the first available TFLite interpreter in preference order.
+    
+    Args:
+        preference: Backend names to try, best first
+    
+    Returns:
+        Tuple of (Interpreter class, backend name, import time in ms)
+    
+    Raises:
+        ImportError: If none of the backends can be imported
+    """
+    for name in preference:
+        if name not in TFLITE_IMPORTERS:
+            raise ValueError(f"Unknown TFLite backend: {name}")
+        
+        start_time = time.perf_counter()
+        try:
+            interpreter_class = TFLITE_IMPORTERS[name]()
+        except (ImportError, AttributeError):
+            continue
+        return interpreter_class, name, (time.perf_counter() - start_time) * 1000
+    
+    raise ImportError(f"No TFLite runtime available (tried: {', '.join(preference)})")
+
+
+def _model_signature(kind: str, model_path: Path) -> str:
+    """Identify a model by its kind and the SHA-256 of the model file."""
+    digest = hashlib.sha256()
+    with open(model_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return f"{kind}:{digest.hexdigest()}"
+
+
+def quantization_params_path(model_path: Path) -> Path:
+    """Sidecar file holding a quantized model's input/output parameters."""
+    return Path(model_path).with_suffix(".quant.json")
+
+
+def _tensor_quantization(details: Dict) -> Optional[Dict]:
+    """Quantization of an interpreter tensor, or None for float tensors."""
+    scale, zero_point = details["quantization"]
+    if not scale:
+        return None
+    return {"dtype": np.dtype(details["dtype"]).name, "scale": float(scale), "zero_point": int(zero_point)}
+
+
+def write_quantization_params(model_path: Path, preference: List[str] = TFLITE_BACKENDS) -> Path:
+    """
+    Write a TFLite model's input/output quantization parameters as JSON.
+    
+    Args:
+        model_path: Path to the .tflite model
+        preference: TFLite backends to try, best first
+    
+    Returns:
+        Path of the written sidecar (see quantization_params_path)
+    """
+    interpreter_class, _, _ = import_tflite_interpreter(preference)
+    interpreter = interpreter_class(model_path=str(model_path))
+    params = {
+        "input": _tensor_quantization(interpreter.get_input_details()[0]),
+        "output": _tensor_quantization(interpreter.get_output_details()[0]),
+    }
+    
+    path = quantization_params_path(model_path)
+    with open(path, "w") as f:
+        json.dump(params, f, indent=2)
+    return path
+
+
+def load_quantization_params(model_path: Path) -> Optional[Dict]:
+    """Read a model's quantization sidecar, if it has one."""
+    path = quantization_params_path(model_path)
+    if not path.exists():
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+class TFLiteRunner:
+    """
+    Runs the TFLite CNN model (NHWC grayscale input).
+    
+    Full-integer models with int8/uint8 input and output are handled
+    transparently: float inputs are quantized and outputs dequantized with
+    the tensors' (scale, zero_point).
+    """
+    
+    labels = EMOTION_LABELS
+    
+    def __init__(self, model_path: Path = CNN_MODEL_PATH, num_threads: Optional[int] = None,
+                 preference: List[str] = TFLITE_BACKENDS):
+        """
+        Load the model into the first available TFLite runtime.
+        
+        Args:
+            model_path: Path to the .tflite model
+            num_threads: Intra-op threads (None = runtime default)
+            preference: TFLite backends to try, best first
+        """
+        interpreter_class, self.backend, self.import_ms = import_tflite_interpreter(preference)
+        self.model_path = Path(model_path)
+        self.signature = _model_signature("tflite", self.model_path)
+        
+        self.interpreter = interpreter_class(model_path=str(self.model_path), num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()
+        self.output_details = self.interpreter.get_output_details()
+        self.input_quantization = _tensor_quantization(self.input_details[0])
+        self.output_quantization = _tensor_quantization(self.output_details[0])
+        self._check_quantization_params()
+        self._quantized_inputs: Optional[np.ndarray] = None
+        self._scratch: Optional[np.ndarray] = None
+    
+    def _check_quantization_params(self):
+        """Fail fast if the model's sidecar disagrees with its tensors."""
+        params = load_quantization_params(self.model_path)
+        if params is None:
+            return
+        
+        actual = {"input": self.input_quantization, "output": self.output_quantization}
+        for tensor, expected in params.items():
+            if expected != actual.get(tensor):
+                raise ValueError(
+                    f"Quantization sidecar {quantization_params_path(self.model_path)} "
+                    f"does not match the model's {tensor} tensor: {expected} != {actual.get(tensor)}"
+                )
+    
+    @property
+    def input_shape(self) -> List[int]:
+        return list(self.input_details[0]['shape'])
+    
+    @property
+    def output_shape(self) -> List[int]:
+        return list(self.output_details[0]['shape'])
+    
+    def _resize_input(self, batch_size: int):
+        """Resize the interpreter's input tensor to a batch size if needed."""
+        input_shape = self.input_details[0]['shape']
+        if input_shape[0] == batch_size:
+            return
+        
+        self.interpreter.resize_tensor_input(
+            self.input_details[0]['index'], [batch_size, *input_shape[1:]]
+        )
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()
+        self.output_details = self.interpreter.get_output_details()
+    
+    def _quantize(self, batch: np.ndarray) -> np.ndarray:
+        """Quantize float inputs into a reused integer buffer."""
+        params = self.input_quantization
+        dtype = np.dtype(params["dtype"])
+        if self._quantized_inputs is None or self._quantized_inputs.shape != batch.shape:
+            self._quantized_inputs = np.empty(batch.shape, dtype=dtype)
+            self._scratch = np.empty(batch.shape, dtype=np.float32)
+        
+        # q = clip(round(x / scale + zero_point))
+        np.divide(batch, params["scale"], out=self._scratch)
+        np.add(self._scratch, params["zero_point"], out=self._scratch)
+        np.rint(self._scratch, out=self._scratch)
+        info = np.iinfo(dtype)
+        np.clip(self._scratch, info.min, info.max, out=self._scratch)
+        np.copyto(self._quantized_inputs, self._scratch, casting="unsafe")
+        return self._quantized_inputs
+    
+    def _dequantize(self, outputs: np.ndarray) -> np.ndarray:
+        """Map integer outputs back to float: (q - zero_point) * scale."""
+        params = self.output_quantization
+        return (outputs.astype(np.float32) - params["zero_point"]) * params["scale"]
+    
+    def run(self, batch: np.ndarray) -> np.ndarray:
+        """
+        Run one invoke over a batch.
+        
+        The input tensor is resized (re-allocating only when the batch size
+        changes) so the whole batch costs one invoke.
+        
+        Args:
+            batch: Float inputs stacked along axis 0
+        
+        Returns:
+            Float model outputs of shape (N, classes)
+        """
+        self._resize_input(len(batch))
+        if self.input_quantization is not None:
+            batch = self._quantize(batch)
+        self.interpreter.set_tensor(self.input_details[0]['index'], batch)
+        self.interpreter.invoke()
+        
+        outputs = self.interpreter.get_tensor(self.output_details[0]['index'])
+        if self.output_quantization is not None:
+            outputs = self._dequantize(outputs)
+        return outputs
+
+
+# ONNX_GRAPH_OPTIMIZATION -> onnxruntime.GraphOptimizationLevel member
+_ORT_OPTIMIZATION_LEVELS = {
+    "disable": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL",
+}
+
+
+class OnnxRunner:
+    """
+    Runs the AffectNet ONNX model (NCHW ImageNet-normalized input).
+    
+    Inputs and outputs are bound through an IOBinding, with one preallocated
+    output buffer per batch size, so a run does no output allocation. The
+    returned array is that buffer: consume it before the next ``run``.
+    """
+    
+    labels = AFFECTNET_LABELS
+    
+    def __init__(self, model_path: Path = ONNX_MODEL_PATH,
+                 intra_op_threads: int = ONNX_INTRA_OP_THREADS,
+                 inter_op_threads: int = ONNX_INTER_OP_THREADS,
+                 graph_optimization: str = ONNX_GRAPH_OPTIMIZATION):
+        """
+        Create an ONNX Runtime session for the model.
+        
+        Args:
+            model_path: Path to the .onnx model
+            intra_op_threads: Threads within an operator (0 = ORT default)
+            inter_op_threads: Threads across operators (0 = ORT default)
+            graph_optimization: "disable", "basic", "extended" or "all"
+        """
+        if graph_optimization not in _ORT_OPTIMIZATION_LEVELS:
+            raise ValueError(f"Unknown graph optimization level: {graph_optimization}")
+        
+        start_time = time.perf_counter()
+        ort = importlib.import_module("onnxruntime")
+        self.backend = "onnxruntime"
+        self.import_ms = (time.perf_counter() - start_time) * 1000
+        
+        self.model_path = Path(model_path)
+        self.signature = _model_signature("onnx", self.model_path)
+        
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        options.graph_optimization_level = getattr(
+            ort.GraphOptimizationLevel, _ORT_OPTIMIZATION_LEVELS[graph_optimization]
+        )
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        
+        self.session = ort.InferenceSession(
+            str(self.model_path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        model_input = self.session.get_inputs()[0]
+        model_output = self.session.get_outputs()[0]
+        self.input_name = model_input.name
+        self.output_name = model_output.name
+        self._input_shape = list(model_input.shape)
+        self._output_shape = list(model_output.shape)
+        
+        # Exported with a fixed batch dimension? Then split larger batches.
+        batch_dim = self._input_shape[0]
+        self.max_batch = batch_dim if isinstance(batch_dim, int) and batch_dim > 0 else None
+        num_classes = self._output_shape[-1]
+        self.num_classes = num_classes if isinstance(num_classes, int) else len(self.labels)
+        
+        self._binding = self.session.io_binding()
+        self._outputs: Dict[int, np.ndarray] = {}
+    
+    @property
+    def input_shape(self) -> List:
+        return self._input_shape
+    
+    @property
+    def output_shape(self) -> List:
+        return self._output_shape
+    
+    def _run_bound(self, batch: np.ndarray) -> np.ndarray:
+        """Run one session call with the batch and a preallocated output bound."""
+        output = self._outputs.get(len(batch))
+        if output is None:
+            output = self._outputs[len(batch)] = np.empty((len(batch), self.num_classes), dtype=np.float32)
+        
+        self._binding.bind_cpu_input(self.input_name, batch)
+        self._binding.bind_output(
+            self.output_name, "cpu", 0, np.float32, list(output.shape), output.ctypes.data
+        )
+        self.session.run_with_iobinding(self._binding)
+        return output
+    
+    def run(self, batch: np.ndarray) -> np.ndarray:
+        """
+        Run the session over a batch.
+        
+        Args:
+            batch: NCHW float32 inputs
+        
+        Returns:
+            Model outputs of shape (N, classes)
+        """
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        if self.max_batch is None or len(batch) <= self.max_batch:
+            return self._run_bound(batch)
+        
+        return np.concatenate([
+            self._run_bound(batch[i:i + self.max_batch]).copy()
+            for i in range(0, len(batch), self.max_batch)
+        ])
+
+
+# Model file evaluated for each EVAL_MODEL choice
+MODEL_PATHS = {
+    "tflite": CNN_MODEL_PATH,
+    "onnx": ONNX_MODEL_PATH,
+}
+
+
+def create_runner(model: str, num_threads: Optional[int] = None, model_path: Optional[Path] = None):
+    """
+    Load the evaluation model into its runner.
+    
+    Args:
+        model: "tflite" or "onnx" (see EVAL_MODEL)
+        num_threads: Intra-op threads (None = backend default)
+        model_path: Model file (default: MODEL_PATHS[model])
+    
+    Returns:
+        TFLiteRunner or OnnxRunner
+    
+    Raises:
+        ImportError: If the model's runtime is not installed
+    """
+    if model not in MODEL_PATHS:
+        raise ValueError(f"Unknown evaluation model: {model}")
+    model_path = model_path or MODEL_PATHS[model]
+    
+    if model == "tflite":
+        return TFLiteRunner(model_path, num_threads=num_threads)
+    if model == "onnx":
+        return OnnxRunner(model_path, intra_op_threads=num_threads or ONNX_INTRA_OP_THREADS)
+    raise ValueError(f"Unknown evaluation model: {model}")
@@ -2,11 +2,22 @@
 Autonomous Emotion Recognition Testing Pipeline - Main Loop Controller
 ======================================================================
 Orchestrates the complete autonomous testing and tuning pipeline.
+
+With PHASE_HANDOFF each phase hands its outputs (columnar metadata, scored
+predictions, results, analysis, tuning state) straight to the next, and the
+files are written by a background writer, so a cycle does not wait on
+serializing and re-parsing its own intermediate files. The files written are
+the same either way.
+
+The phases run as the stages of stage_graph: each is keyed by its inputs,
+config and code, and a rerun reuses the stages an earlier run recorded, so
+an interrupted run resumes where it stopped.
 """
 
 import json
 import sys
 import argparse
+from dataclasses import asdict
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
@@ -15,12 +26,16 @@ from pipeline_config import (
     EMOTION_LABELS, DEMO_MODE, get_images_per_emotion,
     TARGET_OVERALL_ACCURACY, TARGET_PER_EMOTION_ACCURACY, TARGET_CONFIDENCE_STABILITY,
     MAX_CYCLES, PLATEAU_CYCLES, PLATEAU_THRESHOLD,
-    get_final_report_path, ensure_directories, REPORTS_DIR
+    get_final_report_path, ensure_directories, REPORTS_DIR, EVAL_MODEL, PHASE_HANDOFF, STAGE_CACHE,
+    get_bias_cube_path, get_results_path
 )
+from background_writer import BackgroundWriter
+from inference_backend import MODEL_PATHS
+from stage_graph import StageGraph, StageRecord, file_digest
 from data_generator import DataGenerator
 from model_evaluator import ModelEvaluator
 from failure_analyzer import FailureAnalyzer
-from auto_tuner import AutoTuner
+from auto_tuner import AutoTuner, TuningState
 
 
 class CycleMetrics:
@@ -97,20 +112,31 @@ class MainLoopController:
     until performance targets are met or plateau is detected.
     """
     
-    def __init__(self, demo_mode: bool = True, max_images_per_emotion: int = None):
+    def __init__(self, demo_mode: bool = True, max_images_per_emotion: int = None,
+                 eval_model: str = EVAL_MODEL, handoff: bool = PHASE_HANDOFF, reuse: bool = STAGE_CACHE):
         """
         Initialize the main loop controller.
         
         Args:
             demo_mode: If True, run with reduced data for testing
             max_images_per_emotion: Override for images per emotion
+            eval_model: Model to evaluate, "tflite" or "onnx"
+            handoff: Pass phase outputs in memory and write files in the
+                background (False = each phase reads the previous one's files)
+            reuse: Reuse stages recorded by earlier runs (see stage_graph)
         """
         self.demo_mode = demo_mode
         self.max_images = max_images_per_emotion
+        self.eval_model = eval_model
         self.metrics = CycleMetrics()
         self.current_cycle = 0
         self.start_time = None
         self.end_time = None
+        self.handoff = handoff
+        self.writer: Optional[BackgroundWriter] = None
+        self.last_analysis: Optional[Dict] = None   # Latest analysis, if computed in this run
+        self.graph = StageGraph(reuse=reuse)
+        self.tuning_state: TuningState = AutoTuner.default_state()  # Carried from cycle to cycle
         
         # Override config if needed
         if max_images_per_emotion:
@@ -135,14 +161,18 @@ class MainLoopController:
         
         # Phase 1: Data Generation
         print("▶ PHASE 1: DATA GENERATION")
-        generator = DataGenerator(cycle_number=cycle_number)
-        
-        # Check if we need targeted generation
-        if cycle_number > 1:
-            tuner = AutoTuner(cycle_number=cycle_number - 1)
-            aug_config = tuner.get_augmentation_config()
+        generator = None
+        key = self.graph.key("generate", cycle_number)
+        record = self.graph.lookup("generate", cycle_number, key)
+        if record:
+            self._print_reused(record)
+            generation_stats = record.payload["generation_stats"]
+        else:
+            generator = DataGenerator(cycle_number=cycle_number, writer=self.writer)
             
-            if aug_config["target_emotions"]:
+            # Check if we need targeted generation
+            aug_config = AutoTuner(cycle_number=cycle_number - 1, state=self.tuning_state).get_augmentation_config()
+            if cycle_number > 1 and aug_config["target_emotions"]:
                 print(f"  Targeting weak emotions: {aug_config['target_emotions']}")
                 generator.generate_targeted(
                     aug_config["target_emotions"],
@@ -150,42 +180,118 @@ class MainLoopController:
                 )
             else:
                 generator.generate_all_emotions()
-        else:
-            generator.generate_all_emotions()
-        
-        generation_stats = generator.generation_stats
+            
+            generation_stats = generator.generation_stats
+            self.graph.complete(
+                "generate", cycle_number, key,
+                output=[m.image_id for m in generator.generated_metadata],
+                payload={"generation_stats": generation_stats},
+                artifacts=generator.output_paths(),
+                writer=self.writer,
+            )
         
         # Phase 2: Model Evaluation
         print()
         print("▶ PHASE 2: MODEL EVALUATION")
-        evaluator = ModelEvaluator(cycle_number=cycle_number)
-        results = evaluator.evaluate_cycle()
-        evaluation_results = {
-            "overall_accuracy": results.overall_accuracy,
-            "per_emotion_accuracy": results.per_emotion_accuracy,
-            "mean_confidence": results.mean_confidence,
-            "mean_latency_ms": results.mean_latency_ms,
-            "failure_breakdown": results.failure_breakdown,
-            "confusion_matrix": results.confusion_matrix,
-        }
+        evaluator = None
+        model_path = MODEL_PATHS[self.eval_model]
+        key = self.graph.key("evaluate", cycle_number, {
+            "model": self.eval_model,
+            "model_path": str(model_path),
+            "model_digest": file_digest(model_path),
+        })
+        record = self.graph.lookup("evaluate", cycle_number, key)
+        if record:
+            self._print_reused(record)
+            evaluation_results = record.payload["evaluation_results"]
+        else:
+            evaluator = ModelEvaluator(cycle_number=cycle_number, model=self.eval_model,
+                                       writer=self.writer, keep_scored=self.handoff)
+            metadata = generator.cycle_metadata if self.handoff and generator else None
+            if metadata is None:
+                self._sync()
+            results = evaluator.evaluate_cycle(metadata=metadata)
+            evaluation_results = {
+                "overall_accuracy": results.overall_accuracy,
+                "per_emotion_accuracy": results.per_emotion_accuracy,
+                "mean_confidence": results.mean_confidence,
+                "mean_latency_ms": results.mean_latency_ms,
+                "failure_breakdown": results.failure_breakdown,
+                "confusion_matrix": results.confusion_matrix,
+            }
+            self.graph.complete(
+                "evaluate", cycle_number, key,
+                output=results.predictions_digest,
+                payload={"evaluation_results": evaluation_results},
+                artifacts=[get_results_path(cycle_number)] + ([results.predictions_path] if results.predictions_path else []),
+                writer=self.writer,
+            )
         
         # Phase 3: Failure Analysis
         print()
         print("▶ PHASE 3: FAILURE ANALYSIS")
-        analyzer = FailureAnalyzer(cycle_number=cycle_number)
-        analysis = analyzer.analyze()
+        analyzer = None
+        key = self.graph.key("analyze", cycle_number)
+        record = self.graph.lookup("analyze", cycle_number, key)
+        if record:
+            self._print_reused(record)
+            self.last_analysis = None  # Read from the recorded file when needed
+        else:
+            analyzer = FailureAnalyzer(cycle_number=cycle_number, writer=self.writer)
+            if self.handoff and evaluator:
+                analyzer.use_data(evaluator.results_data, evaluator.metadata, evaluator.scored)
+            else:
+                self._sync()
+            analyzer.analyze()
+            self.last_analysis = analyzer.analysis_data
+            self.graph.complete(
+                "analyze", cycle_number, key,
+                output=analyzer.analysis_data,
+                artifacts=[REPORTS_DIR / f"cycle_{cycle_number:03d}_analysis.json", get_bias_cube_path(cycle_number)],
+                writer=self.writer,
+            )
         
         # Phase 4: Auto-Tuning
         print()
         print("▶ PHASE 4: AUTO-TUNING")
-        tuner = AutoTuner(cycle_number=cycle_number)
-        tuning_summary = tuner.tune()
+        key = self.graph.key("tune", cycle_number)
+        record = self.graph.lookup("tune", cycle_number, key)
+        if record:
+            self._print_reused(record)
+            tuning_summary = record.payload["tuning_summary"]
+            self.tuning_state = TuningState(**record.payload["state"])
+        else:
+            tuner = AutoTuner(cycle_number=cycle_number, state=self.tuning_state, writer=self.writer)
+            if not (self.handoff and evaluator and analyzer):
+                self._sync()
+            tuning_summary = tuner.tune(
+                evaluator.results_data if self.handoff and evaluator else None,
+                analyzer.analysis_data if self.handoff and analyzer else None,
+            )
+            self.tuning_state = tuner.state
+            state = asdict(tuner.state)
+            self.graph.complete(
+                "tune", cycle_number, key,
+                output={"tuning_summary": tuning_summary, "state": {k: v for k, v in state.items() if k != "history"}},
+                payload={"tuning_summary": tuning_summary, "state": state},
+                artifacts=[REPORTS_DIR / f"cycle_{cycle_number:03d}_tuning.json"],
+                writer=self.writer,
+            )
         
         # Track metrics
         self.metrics.add_cycle(cycle_number, evaluation_results, tuning_summary)
         
         return generation_stats, evaluation_results, tuning_summary
     
+    def _sync(self):
+        """Wait for queued writes before a phase reads the previous phase's files."""
+        if self.writer is not None:
+            self.writer.flush()
+    
+    @staticmethod
+    def _print_reused(record: StageRecord):
+        print(f"  ⏭️  Reusing {record.stage} output recorded {record.created_at}")
+    
     def check_termination(self) -> Tuple[bool, str]:
         """
         Check if the loop should terminate.
@@ -222,6 +328,9 @@ class MainLoopController:
         # Generate bias report summary
         bias_summary = self._summarize_bias()
         
+        # Accuracy confidence intervals of the latest cycle
+        intervals = self._load_accuracy_intervals()
+        
         report = {
             "execution_summary": {
                 "start_time": self.start_time,
@@ -230,7 +339,10 @@ class MainLoopController:
                 "mode": "DEMO" if self.demo_mode else "PRODUCTION",
             },
             "final_accuracy": latest.get("overall_accuracy", 0),
+            "final_accuracy_interval": intervals.get("overall_accuracy_interval"),
             "per_emotion_accuracy": latest.get("per_emotion_accuracy", {}),
+            "per_emotion_accuracy_intervals": intervals.get("emotion_accuracy_intervals", {}),
+            "ci_level": intervals.get("ci_level"),
             "mean_confidence": latest.get("mean_confidence", 0),
             "confusion_matrix_summary": confusion_summary,
             "bias_report": bias_summary,
@@ -240,15 +352,37 @@ class MainLoopController:
         
         return report
     
+    def _latest_analysis(self) -> Optional[Dict]:
+        """The latest cycle's analysis, from memory or its file (None if missing)."""
+        if self.last_analysis is not None:
+            return self.last_analysis
+        analysis_path = REPORTS_DIR / f"cycle_{self.current_cycle:03d}_analysis.json"
+        if not analysis_path.exists():
+            return None
+        with open(analysis_path, "r") as f:
+            return json.load(f)
+    
+    def _load_accuracy_intervals(self) -> Dict:
+        """Load the latest analysis's accuracy confidence intervals."""
+        try:
+            analysis = self._latest_analysis()
+            if analysis is not None:
+                return {
+                    "ci_level": analysis.get("ci_level"),
+                    "overall_accuracy_interval": analysis.get("overall_accuracy_interval"),
+                    "emotion_accuracy_intervals": analysis.get("emotion_accuracy_intervals", {}),
+                }
+        except Exception as e:
+            print(f"Warning: Could not load accuracy intervals: {e}")
+        
+        return {}
+    
     def _summarize_confusion(self) -> Dict:
         """Summarize confusion patterns across cycles."""
         try:
             # Load latest analysis
-            analysis_path = REPORTS_DIR / f"cycle_{self.current_cycle:03d}_analysis.json"
-            if analysis_path.exists():
-                with open(analysis_path, "r") as f:
-                    analysis = json.load(f)
-                
+            analysis = self._latest_analysis()
+            if analysis is not None:
                 confused_pairs = analysis.get("confused_pairs", [])[:5]
                 return {
                     "top_confused_pairs": [
@@ -265,11 +399,8 @@ class MainLoopController:
     def _summarize_bias(self) -> Dict:
         """Summarize bias findings across cycles."""
         try:
-            analysis_path = REPORTS_DIR / f"cycle_{self.current_cycle:03d}_analysis.json"
-            if analysis_path.exists():
-                with open(analysis_path, "r") as f:
-                    analysis = json.load(f)
-                
+            analysis = self._latest_analysis()
+            if analysis is not None:
                 bias_reports = analysis.get("bias_reports", [])
                 biased = [r for r in bias_reports if r.get("is_biased")]
                 
@@ -306,6 +437,8 @@ class MainLoopController:
         
         self.start_time = datetime.now().isoformat()
         ensure_directories()
+        if self.handoff:
+            self.writer = BackgroundWriter()
         
         try:
             while True:
@@ -344,6 +477,16 @@ class MainLoopController:
             print()
             print(f"❌ Pipeline error: {e}")
             raise
+        finally:
+            if self.writer is not None:
+                self.writer.close()
+            self.graph.close()
+        
+        if self.writer is not None:
+            print()
+            print(f"💾 Background writer: {self.writer.jobs} writes, {self.writer.busy_s:.2f}s off the cycle path, "
+                  f"{self.writer.blocked_s:.2f}s blocked on a full queue")
+        print(f"🧩 Stages: {self.graph.reused} reused, {self.graph.computed} computed")
         
         self.end_time = datetime.now().isoformat()
         
@@ -374,14 +517,16 @@ class MainLoopController:
         print()
         
         print("📊 Final Performance:")
-        print(f"   Overall Accuracy: {report.get('final_accuracy', 0) * 100:.1f}%")
+        print(f"   Overall Accuracy: {report.get('final_accuracy', 0) * 100:.1f}%"
+              f"{self._format_interval(report.get('final_accuracy_interval'))}")
         print(f"   Mean Confidence: {report.get('mean_confidence', 0):.3f}")
         print()
         
         print("🎭 Per-Emotion Accuracy:")
+        intervals = report.get("per_emotion_accuracy_intervals", {})
         for emotion, acc in report.get("per_emotion_accuracy", {}).items():
             status = "✅" if acc >= TARGET_PER_EMOTION_ACCURACY else "⚠️"
-            print(f"   {status} {emotion}: {acc * 100:.1f}%")
+            print(f"   {status} {emotion}: {acc * 100:.1f}%{self._format_interval(intervals.get(emotion))}")
         print()
         
         confusion = report.get("confusion_matrix_summary", {})
@@ -405,6 +550,13 @@ class MainLoopController:
         
         print()
         print("=" * 60)
+    
+    @staticmethod
+    def _format_interval(interval: Optional[List[float]]) -> str:
+        """Format a [low, high] accuracy interval for printing."""
+        if not interval:
+            return ""
+        return f" (CI {interval[0] * 100:.1f}-{interval[1] * 100:.1f}%)"
 
 
 def main():
@@ -429,6 +581,22 @@ def main():
         default=None,
         help="Override images per emotion count"
     )
+    parser.add_argument(
+        "--model",
+        choices=["tflite", "onnx"],
+        default=EVAL_MODEL,
+        help=f"Model to evaluate (default: {EVAL_MODEL})"
+    )
+    parser.add_argument(
+        "--disk-handoff",
+        action="store_true",
+        help="Have each phase re-read the previous phase's files instead of handing data over in memory"
+    )
+    parser.add_argument(
+        "--fresh",
+        action="store_true",
+        help="Recompute every stage instead of reusing stages recorded by earlier runs"
+    )
     parser.add_argument(
         "--single-cycle",
         action="store_true",
@@ -449,6 +617,9 @@ def main():
     controller = MainLoopController(
         demo_mode=demo_mode,
         max_images_per_emotion=args.max_images_per_emotion,
+        eval_model=args.model,
+        handoff=PHASE_HANDOFF and not args.disk_handoff,
+        reuse=STAGE_CACHE and not args.fresh,
     )
     
     report = controller.run()
@@ -0,0 +1,282 @@
+"""
+Autonomous Emotion Recognition Testing Pipeline - Metadata Store
+================================================================
+Columnar on-disk storage for generated image metadata, shared by the
+generator, evaluator and analyzer.
+
+Each cycle is stored as a single ``.npz`` archive with one array per column:
+categorical columns are dictionary-encoded (integer codes + category table),
+free-text columns are packed into a UTF-8 byte buffer plus offsets, and
+numeric/bool columns are stored as plain NumPy arrays. Legacy
+``cycle_NNN_metadata.json`` files are still readable through the same API;
+a cycle is loaded from the format METADATA_FORMAT writes.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from pipeline_config import METADATA_FORMAT, get_metadata_path, get_metadata_store_path
+
+
+# Columns stored as dictionary-encoded categoricals
+CATEGORICAL_COLUMNS = {
+    "emotion_label", "gender", "age_group", "skin_tone", "face_shape",
+    "head_pose", "lighting_condition", "background", "glasses", "shard_path",
+}
+
+# Image metadata columns (the fields of data_generator.ImageMetadata) and the
+# dtypes they get when a cycle has no images to infer them from
+IMAGE_COLUMNS = {
+    "image_id": object, "emotion_label": object, "intensity_level": np.float64,
+    "gender": object, "age_group": object, "skin_tone": object, "face_shape": object,
+    "head_pose": object, "lighting_condition": object, "background": object,
+    "glasses": object, "occlusion_flag": np.bool_, "image_path": object,
+    "generated_at": object, "prompt_used": object, "shard_path": object,
+    "shard_offset": np.int64, "shard_length": np.int64,
+}
+
+STORE_FORMAT_VERSION = 1
+
+
+class CycleMetadata:
+    """
+    Column-oriented view of one cycle's image metadata.
+    
+    Categorical columns expose their integer codes and category tables
+    directly so consumers can group and count without decoding strings.
+    """
+    
+    def __init__(self, cycle_number: int, generation_stats: Dict,
+                 columns: Dict[str, np.ndarray], categories: Dict[str, List[str]],
+                 num_rows: int):
+        """
+        Initialize from already-encoded columns.
+        
+        Args:
+            cycle_number: Cycle the metadata belongs to
+            generation_stats: Generator statistics for the cycle
+            columns: Column arrays (codes for categorical columns)
+            categories: Category tables for categorical columns
+            num_rows: Number of images
+        """
+        self.cycle_number = cycle_number
+        self.generation_stats = generation_stats
+        self._columns = columns
+        self._categories = categories
+        self._num_rows = num_rows
+    
+    def __len__(self) -> int:
+        return self._num_rows
+    
+    @property
+    def column_names(self) -> List[str]:
+        """Names of all stored columns, in record order."""
+        return list(self._columns)
+    
+    def is_categorical(self, name: str) -> bool:
+        """Whether a column is dictionary-encoded."""
+        return name in self._categories
+    
+    def codes(self, name: str) -> np.ndarray:
+        """Integer codes of a categorical column."""
+        if name not in self._categories:
+            raise KeyError(f"Not a categorical column: {name}")
+        return self._columns[name]
+    
+    def categories(self, name: str) -> List[str]:
+        """Category table of a categorical column (indexed by code)."""
+        return self._categories[name]
+    
+    def column(self, name: str) -> np.ndarray:
+        """
+        Decoded values of a column.
+        
+        Args:
+            name: Column name
+        
+        Returns:
+            Array of values (object array of str for text columns)
+        """
+        if name in self._categories:
+            table = np.array(self._categories[name], dtype=object)
+            return table[self._columns[name]]
+        return self._columns[name]
+    
+    def records(self) -> Iterator[Dict]:
+        """Iterate over rows as plain dicts (the legacy JSON image shape)."""
+        decoded = {name: self.column(name).tolist() for name in self._columns}
+        for i in range(self._num_rows):
+            yield {name: values[i] for name, values in decoded.items()}
+    
+    def to_dict(self) -> Dict:
+        """Convert to the legacy ``cycle_NNN_metadata.json`` layout."""
+        return {
+            "cycle_number": self.cycle_number,
+            "generation_stats": self.generation_stats,
+            "images": list(self.records()),
+        }
+    
+    @classmethod
+    def from_records(cls, cycle_number: int, generation_stats: Dict,
+                     records: List[Dict]) -> "CycleMetadata":
+        """
+        Build columnar metadata from row dicts.
+        
+        Args:
+            cycle_number: Cycle number
+            generation_stats: Generator statistics
+            records: One dict per image (e.g. ``asdict(ImageMetadata)``);
+                with none, the IMAGE_COLUMNS are created empty
+        
+        Returns:
+            CycleMetadata instance
+        """
+        names = list(records[0]) if records else list(IMAGE_COLUMNS)
+        columns = {}
+        categories = {}
+        
+        for name in names:
+            values = [r.get(name) for r in records]
+            if name in CATEGORICAL_COLUMNS:
+                table, codes = np.unique(np.array(values, dtype=str), return_inverse=True)
+                categories[name] = table.tolist()
+                columns[name] = codes.astype(np.uint16 if len(table) > 255 else np.uint8)
+            elif not values:
+                columns[name] = np.array([], dtype=IMAGE_COLUMNS.get(name, object))
+            elif all(isinstance(v, bool) for v in values):
+                columns[name] = np.array(values, dtype=np.bool_)
+            elif all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+                columns[name] = np.array(values, dtype=np.int64)
+            elif all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+                columns[name] = np.array(values, dtype=np.float64)
+            else:
+                columns[name] = np.array(["" if v is None else str(v) for v in values], dtype=object)
+        
+        return cls(cycle_number, generation_stats, columns, categories, len(records))
+
+
+def _pack_strings(values: np.ndarray) -> Dict[str, np.ndarray]:
+    """Pack a text column into a UTF-8 buffer and end offsets."""
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.cumsum([len(b) for b in encoded], dtype=np.int64)
+    return {
+        "data": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        "offsets": offsets,
+    }
+
+
+def _unpack_strings(data: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Inverse of ``_pack_strings``."""
+    buffer = data.tobytes()
+    starts = np.concatenate(([0], offsets[:-1])) if len(offsets) else offsets
+    return np.array(
+        [buffer[s:e].decode("utf-8") for s, e in zip(starts.tolist(), offsets.tolist())],
+        dtype=object,
+    )
+
+
+def save_cycle_metadata(metadata: CycleMetadata, path: Optional[Path] = None) -> Path:
+    """
+    Write cycle metadata to the columnar store.
+    
+    Args:
+        metadata: Metadata to save
+        path: Destination (defaults to the cycle's ``.npz`` store path)
+    
+    Returns:
+        Path written
+    """
+    path = Path(path or get_metadata_store_path(metadata.cycle_number))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    
+    header = {
+        "format_version": STORE_FORMAT_VERSION,
+        "cycle_number": metadata.cycle_number,
+        "generation_stats": metadata.generation_stats,
+        "num_rows": len(metadata),
+        "columns": metadata.column_names,
+        "categories": {
+            name: metadata.categories(name)
+            for name in metadata.column_names if metadata.is_categorical(name)
+        },
+    }
+    arrays = {"__header__": np.frombuffer(json.dumps(header).encode("utf-8"), dtype=np.uint8)}
+    
+    for name in metadata.column_names:
+        values = metadata.codes(name) if metadata.is_categorical(name) else metadata.column(name)
+        if values.dtype == object:
+            packed = _pack_strings(values)
+            arrays[f"{name}.data"] = packed["data"]
+            arrays[f"{name}.offsets"] = packed["offsets"]
+        else:
+            arrays[name] = values
+    
+    # np.savez appends .npz to names without it; write via a handle instead
+    with open(path, "wb") as f:
+        np.savez_compressed(f, **arrays)
+    
+    return path
+
+
+def read_metadata_file(path: Path) -> CycleMetadata:
+    """
+    Read metadata from a columnar ``.npz`` store or a legacy JSON file.
+    
+    Args:
+        path: Path to either format
+    
+    Returns:
+        CycleMetadata instance
+    """
+    path = Path(path)
+    
+    if path.suffix == ".json":
+        with open(path, "r") as f:
+            data = json.load(f)
+        return CycleMetadata.from_records(
+            data.get("cycle_number", 0),
+            data.get("generation_stats", {}),
+            data.get("images", []),
+        )
+    
+    with np.load(path, allow_pickle=False) as archive:
+        header = json.loads(archive["__header__"].tobytes().decode("utf-8"))
+        columns = {}
+        for name in header["columns"]:
+            if name in archive.files:
+                columns[name] = archive[name]
+            else:
+                columns[name] = _unpack_strings(archive[f"{name}.data"], archive[f"{name}.offsets"])
+    
+    return CycleMetadata(
+        header["cycle_number"],
+        header["generation_stats"],
+        columns,
+        header["categories"],
+        header["num_rows"],
+    )
+
+
+def load_cycle_metadata(cycle_number: int) -> Optional[CycleMetadata]:
+    """
+    Load a cycle's metadata from the format METADATA_FORMAT writes.
+    
+    The columnar store is read first unless METADATA_FORMAT is "json"; the
+    other format is the fallback when the preferred file does not exist.
+    
+    Args:
+        cycle_number: Cycle number to load
+    
+    Returns:
+        CycleMetadata or None if the cycle has no metadata
+    """
+    paths = [get_metadata_store_path(cycle_number), get_metadata_path(cycle_number)]
+    if METADATA_FORMAT == "json":
+        paths.reverse()
+    for path in paths:
+        if path.exists():
+            return read_metadata_file(path)
+    return None
@@ -21,9 +21,14 @@ IMAGES_DIR = GENERATED_DATA_DIR / "images"
 METADATA_DIR = GENERATED_DATA_DIR / "metadata"
 RESULTS_DIR = GENERATED_DATA_DIR / "results"
 REPORTS_DIR = GENERATED_DATA_DIR / "reports"
+SAMPLE_REGISTRY_PATH = GENERATED_DATA_DIR / "sample_registry.sqlite"
+TENSOR_CACHE_DIR = GENERATED_DATA_DIR / "tensor_cache"
+PREDICTION_CACHE_PATH = GENERATED_DATA_DIR / "prediction_cache.sqlite"
+STAGE_STORE_PATH = GENERATED_DATA_DIR / "stage_store.sqlite"
 
 # Model paths
 CNN_MODEL_PATH = MODELS_DIR / "cnn_model.tflite"
+ONNX_MODEL_PATH = MODELS_DIR / "affectnet_model.onnx"  # Production model (export_hsemotion.py)
 
 # ============================================================================
 # EMOTION CONFIGURATION
@@ -34,6 +39,11 @@ EMOTION_LABELS = [
     "Angry", "Disgust", "Fear", "Happy", "Sad", "Surprise", "Contempt", "Neutral"
 ]
 
+# Output order of the AffectNet ONNX model (same classes, different order)
+AFFECTNET_LABELS = [
+    "Angry", "Contempt", "Disgust", "Fear", "Happy", "Neutral", "Sad", "Surprise"
+]
+
 # Extended emotions mapping (maps additional emotions to FER-Plus classes)
 EXTENDED_EMOTION_MAPPING = {
     "Confused": "Contempt",    # Similar subtle expression
@@ -80,6 +90,43 @@ ACCESSORIES = {
 # Intensity levels for emotion expression
 INTENSITY_LEVELS = [0.3, 0.5, 0.7, 0.9]  # Low, medium, high, very high
 
+# Seed for variation sampling (None = fresh randomness every run)
+GENERATION_SEED = None
+
+# Image content identity: an image's ID is derived from its emotion, its
+# variation, the content seed and the generator version, so the same sample
+# requested in a later cycle gets the same ID and can be reused. Bump the
+# version whenever generated content changes.
+GENERATOR_VERSION = "placeholder-v1"
+IMAGE_CONTENT_SEED = 0
+
+# Reuse samples (content, preprocessed tensors, predictions) across cycles
+REUSE_SAMPLES = True
+
+# Memory-mapped cache of preprocessed tensors: size cap (least recently used
+# segments are evicted beyond it) and rows per segment file
+TENSOR_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 2 GB
+TENSOR_CACHE_SEGMENT_ROWS = 1024
+
+# Variation sampling mode:
+#   "random"     - uniform unique draws from the full variation space
+#   "stratified" - greedy covering design that guarantees minimum counts per
+#                  bias category (and per category pair) for every emotion
+SAMPLING_MODE = "random"
+
+# Stratified mode: dimensions that must be balanced (variation keys)
+STRATIFIED_DIMENSIONS = ["skin_tone", "age_group", "gender", "lighting", "head_pose"]
+STRATIFIED_MIN_PER_CATEGORY = 5      # Min samples per category, per emotion
+
+# Stratified mode: dimension pairs whose joint cells must also be covered
+STRATIFIED_PAIRS = [
+    ("skin_tone", "lighting"),
+    ("skin_tone", "head_pose"),
+    ("lighting", "head_pose"),
+    ("age_group", "skin_tone"),
+]
+STRATIFIED_MIN_PER_PAIR = 1          # Min samples per pair cell, per emotion
+
 # ============================================================================
 # GENERATION SCALE CONFIGURATION
 # ============================================================================
@@ -91,10 +138,28 @@ DEMO_IMAGES_PER_EMOTION = 10
 # Production mode settings
 PRODUCTION_IMAGES_PER_EMOTION = 1000
 
+# Parallel generation: worker processes (1 = in-process) and images per task.
+# Work is split into fixed-size chunks with seeds derived from the run seed,
+# so output does not depend on the number of workers.
+GENERATION_WORKERS = 1
+GENERATION_CHUNK_SIZE = 500
+
 # Get the actual count based on mode
 def get_images_per_emotion():
     return DEMO_IMAGES_PER_EMOTION if DEMO_MODE else PRODUCTION_IMAGES_PER_EMOTION
 
+# Metadata storage format:
+#   "columnar" - compressed .npz store with dictionary-encoded categoricals
+#   "json"     - legacy indented cycle_NNN_metadata.json
+#   "both"     - write both (e.g. while external tools still read the JSON)
+METADATA_FORMAT = "columnar"
+
+# Image storage layout:
+#   "shards" - records packed into append-only shard files with an offset index
+#   "files"  - one loose placeholder file per image
+IMAGE_STORAGE = "shards"
+SHARD_MAX_BYTES = 64 * 1024 * 1024  # Roll over to a new shard at 64 MB
+
 # ============================================================================
 # MODEL CONFIGURATION
 # ============================================================================
@@ -102,6 +167,51 @@ def get_images_per_emotion():
 MODEL_INPUT_SHAPE = (48, 48, 1)  # Grayscale 48x48
 MODEL_OUTPUT_CLASSES = 8
 
+# Model evaluated by the pipeline:
+#   "tflite" - CNN_MODEL_PATH (48x48 grayscale, NHWC)
+#   "onnx"   - ONNX_MODEL_PATH, the AffectNet model the app runs
+#              (224x224 RGB, ImageNet normalization, NCHW)
+EVAL_MODEL = "tflite"
+
+# AffectNet ONNX model input (matches lib/services/ml_service.dart)
+ONNX_INPUT_SHAPE = (3, 224, 224)
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+# ONNX Runtime session options (0 threads = let ONNX Runtime decide).
+# Graph optimization: "disable", "basic", "extended" or "all".
+ONNX_INTRA_OP_THREADS = 0
+ONNX_INTER_OP_THREADS = 0
+ONNX_GRAPH_OPTIMIZATION = "all"
+
+# TFLite interpreter runtimes to try, best first. The standalone runtimes
+# avoid importing full TensorFlow just for the interpreter.
+TFLITE_BACKENDS = ["ai_edge_litert", "tflite_runtime", "tensorflow"]
+
+# Samples per interpreter invoke during evaluation (1 = unbatched)
+EVAL_BATCH_SIZE = 32
+
+# Parallel evaluation: intra-op threads per interpreter (None = TFLite
+# default), evaluation processes each holding its own interpreter
+# (1 = in-process), and samples per process-pool task.
+EVAL_NUM_THREADS = None
+EVAL_WORKERS = 1
+EVAL_SHARD_SIZE = 256
+
+# In-process prefetch pipeline: threads reading/decoding/preprocessing
+# batches ahead of inference (0 = run stages sequentially), and capacity
+# of each bounded queue between stages
+EVAL_PREFETCH_THREADS = 2
+EVAL_QUEUE_DEPTH = 4
+
+# Inference batches per evaluation process left out of the latency
+# histograms (interpreter warmup, cold caches)
+EVAL_WARMUP_BATCHES = 1
+
+# Stream per-sample results to a JSONL file as batches are scored, instead
+# of holding them in memory and embedding them in the results JSON
+EVAL_STREAM_RESULTS = True
+
 # ============================================================================
 # PERFORMANCE THRESHOLDS
 # ============================================================================
@@ -115,6 +225,21 @@ TARGET_CONFIDENCE_STABILITY = 0.80   # Mean confidence >= 0.8
 CONFIDENCE_THRESHOLD = 0.75          # Below this = low confidence failure
 BIAS_THRESHOLD = 0.05                # Max allowed accuracy difference across demographics
 
+# Intersectional bias: largest number of metadata dimensions combined in a
+# cell, and fewest samples a cell needs before it can be flagged
+BIAS_CUBE_MAX_ORDER = 3
+BIAS_CUBE_MIN_SAMPLES = 10
+
+# Confidence intervals: two-sided level, bootstrap replicates for bias gaps
+# and their seed (fixed so analyses are reproducible)
+CI_LEVEL = 0.95
+BOOTSTRAP_REPLICATES = 2000
+BOOTSTRAP_SEED = 0
+
+# Flag a dimension as biased only when the lower confidence bound of its
+# gap exceeds BIAS_THRESHOLD (False = compare the raw gap)
+BIAS_REQUIRE_SIGNIFICANCE = True
+
 # ============================================================================
 # AUTO-TUNING CONFIGURATION
 # ============================================================================
@@ -145,6 +270,17 @@ PLATEAU_THRESHOLD = 0.01             # Improvement less than 1% = plateau
 CYCLE_LOG_FREQUENCY = 1              # Log every cycle
 DETAILED_LOGGING = True              # Enable detailed per-sample logging
 
+# Hand each phase's outputs (metadata, results, analysis, tuning state) to
+# the next phase in memory and persist them on a background writer thread
+# (False = every phase re-reads the previous phase's files)
+PHASE_HANDOFF = True
+WRITER_QUEUE_DEPTH = 16              # Pending background writes before phases block
+
+# Reuse pipeline stages recorded by earlier runs whose inputs, config and
+# code are unchanged, so a rerun resumes instead of starting over
+# (see stage_graph; False = recompute every stage)
+STAGE_CACHE = True
+
 # ============================================================================
 # AUTISM-SPECIFIC CONFIGURATION
 # ============================================================================
@@ -157,21 +293,57 @@ SUBTLETY_FACTOR = 0.7                # Prefer subtle over exaggerated expression
 AMBIGUITY_PENALTY = 0.1              # Reduce confidence on ambiguous predictions
 AMBIGUITY_THRESHOLD = 0.4            # Top-2 emotions within this range = ambiguous
 
+# ============================================================================
+# MODEL BENCHMARK CONFIGURATION
+# ============================================================================
+
+# Fixed generated cycle every model variant is benchmarked on and its
+# generation seed. Its images, metadata and results live under BENCHMARK_DIR,
+# apart from the pipeline's cycles, so they are never used for calibration
+BENCHMARK_CYCLE = 900
+BENCHMARK_SEED = 1234
+BENCHMARK_DIR = GENERATED_DATA_DIR / "benchmarks"
+
+# Inputs used to calibrate full-integer quantization
+CALIBRATION_SAMPLES = 200
+
 # ============================================================================
 # UTILITY FUNCTIONS
 # ============================================================================
 
+def _cycle_data_dir(cycle_number: int, data_dir: Path) -> Path:
+    """Place a cycle's data directory under BENCHMARK_DIR for the benchmark cycle."""
+    if cycle_number == BENCHMARK_CYCLE:
+        return BENCHMARK_DIR / data_dir.name
+    return data_dir
+
 def get_cycle_dir(cycle_number: int) -> Path:
     """Get the directory for a specific cycle."""
-    return IMAGES_DIR / f"cycle_{cycle_number:03d}"
+    return _cycle_data_dir(cycle_number, IMAGES_DIR) / f"cycle_{cycle_number:03d}"
+
+def get_shard_dir(cycle_number: int) -> Path:
+    """Get the packed shard directory for a specific cycle."""
+    return get_cycle_dir(cycle_number) / "shards"
 
 def get_metadata_path(cycle_number: int) -> Path:
     """Get the metadata file path for a specific cycle."""
-    return METADATA_DIR / f"cycle_{cycle_number:03d}_metadata.json"
+    return _cycle_data_dir(cycle_number, METADATA_DIR) / f"cycle_{cycle_number:03d}_metadata.json"
+
+def get_metadata_store_path(cycle_number: int) -> Path:
+    """Get the columnar metadata store path for a specific cycle."""
+    return _cycle_data_dir(cycle_number, METADATA_DIR) / f"cycle_{cycle_number:03d}_metadata.npz"
 
 def get_results_path(cycle_number: int) -> Path:
     """Get the results file path for a specific cycle."""
-    return RESULTS_DIR / f"cycle_{cycle_number:03d}_results.json"
+    return _cycle_data_dir(cycle_number, RESULTS_DIR) / f"cycle_{cycle_number:03d}_results.json"
+
+def get_predictions_path(cycle_number: int) -> Path:
+    """Get the streamed per-sample results (JSONL) path for a specific cycle."""
+    return _cycle_data_dir(cycle_number, RESULTS_DIR) / f"cycle_{cycle_number:03d}_predictions.jsonl"
+
+def get_bias_cube_path(cycle_number: int) -> Path:
+    """Get the intersectional bias count cube path for a specific cycle."""
+    return _cycle_data_dir(cycle_number, RESULTS_DIR) / f"cycle_{cycle_number:03d}_bias_cube.npz"
 
 def get_final_report_path() -> Path:
     """Get the final report file path."""
@@ -0,0 +1,189 @@
+"""
+Autonomous Emotion Recognition Testing Pipeline - Postprocessing
+================================================================
+Vectorized scoring of model outputs.
+
+A batch of raw outputs is turned into an (N, classes) probability matrix
+in EMOTION_LABELS order, then scored in one pass: argmax, confidence,
+top-2 margin, ambiguity, penalised confidence, correctness and failure
+codes. Per-sample dicts are only built by ``ScoredBatch.records`` when
+individual results are written out.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from pipeline_config import (
+    EMOTION_LABELS, CONFIDENCE_THRESHOLD, AMBIGUITY_THRESHOLD, AMBIGUITY_PENALTY
+)
+
+
+# Failure type per failure code (code 0 = no failure)
+FAILURE_TYPES: List[Optional[str]] = [
+    None, "misclassification", "low_confidence", "no_detection", "ambiguous"
+]
+FAILURE_NONE = 0
+FAILURE_MISCLASSIFICATION = 1
+FAILURE_LOW_CONFIDENCE = 2
+FAILURE_NO_DETECTION = 3
+FAILURE_AMBIGUOUS = 4
+
+_LABEL_INDEX = {label: i for i, label in enumerate(EMOTION_LABELS)}
+
+
+def label_indices(labels: Sequence[str]) -> np.ndarray:
+    """Indices of labels in EMOTION_LABELS (-1 for unknown labels)."""
+    return np.array([_LABEL_INDEX.get(label, -1) for label in labels], dtype=np.int16)
+
+
+def outputs_to_probabilities(raw: np.ndarray, labels: Sequence[str],
+                             apply_softmax: bool = True) -> np.ndarray:
+    """
+    Map raw model outputs to probabilities in EMOTION_LABELS order.
+    
+    The softmax runs over all of the model's own outputs before the
+    EMOTION_LABELS columns are picked, without renormalizing, as the app's
+    MLService does.
+    
+    Args:
+        raw: Outputs of shape (N, K), columns in ``labels`` order
+        labels: Label of each output column
+        apply_softmax: Softmax the outputs (False if already probabilities)
+    
+    Returns:
+        float64 array of shape (N, len(EMOTION_LABELS)); labels the model
+        does not output get a probability of 0
+    """
+    raw = np.array(raw, dtype=np.float64).reshape(len(raw), -1)
+    if apply_softmax and raw.shape[1]:
+        raw -= raw.max(axis=1, keepdims=True)
+        np.exp(raw, out=raw)
+        raw /= raw.sum(axis=1, keepdims=True)
+    
+    probabilities = np.zeros((len(raw), len(EMOTION_LABELS)), dtype=np.float64)
+    columns = [labels.index(label) if label in labels else -1 for label in EMOTION_LABELS]
+    for target, source in enumerate(columns):
+        if 0 <= source < raw.shape[1]:
+            probabilities[:, target] = raw[:, source]
+    return probabilities
+
+
+@dataclass
+class ScoredBatch:
+    """Scored predictions for a batch of samples, one array entry per sample."""
+    image_ids: List[str]
+    true_index: np.ndarray            # int16 index into EMOTION_LABELS
+    probabilities: np.ndarray         # (N, classes) float64, zeros if no detection
+    predicted_index: np.ndarray       # int16, -1 for no detection
+    confidence: np.ndarray            # Top-1 probability
+    margin: np.ndarray                # Top-1 minus top-2 probability
+    is_ambiguous: np.ndarray          # bool
+    penalized_confidence: np.ndarray  # Confidence after the ambiguity penalty
+    correct: np.ndarray               # bool
+    failure_code: np.ndarray          # int8 index into FAILURE_TYPES
+    latency_ms: np.ndarray            # float64
+    reused: np.ndarray                # bool, served from the prediction cache
+    
+    def __len__(self) -> int:
+        return len(self.image_ids)
+    
+    @classmethod
+    def concatenate(cls, batches: List["ScoredBatch"]) -> "ScoredBatch":
+        """Join batches in order."""
+        if not batches:
+            return score_batch([], [], np.zeros((0, len(EMOTION_LABELS))), np.zeros(0, dtype=bool))
+        return cls(
+            image_ids=[image_id for b in batches for image_id in b.image_ids],
+            **{
+                name: np.concatenate([getattr(b, name) for b in batches])
+                for name in cls.__dataclass_fields__ if name != "image_ids"
+            },
+        )
+    
+    def record(self, i: int) -> Dict:
+        """
+        Build the per-sample result dict (the PredictionResult layout).
+        
+        Args:
+            i: Sample position in the batch
+        
+        Returns:
+            Dict with image_id, true/predicted emotion, confidence,
+            all_probabilities, correct, failure_type, latency_ms,
+            is_ambiguous and reused
+        """
+        predicted = int(self.predicted_index[i])
+        return {
+            "image_id": self.image_ids[i],
+            "true_emotion": EMOTION_LABELS[self.true_index[i]],
+            "predicted_emotion": EMOTION_LABELS[predicted] if predicted >= 0 else "unknown",
+            "confidence": float(self.penalized_confidence[i]),
+            "all_probabilities": dict(zip(EMOTION_LABELS, self.probabilities[i].tolist())),
+            "correct": bool(self.correct[i]),
+            "failure_type": FAILURE_TYPES[self.failure_code[i]],
+            "latency_ms": float(self.latency_ms[i]),
+            "is_ambiguous": bool(self.is_ambiguous[i]),
+            "reused": bool(self.reused[i]),
+        }
+    
+    def records(self) -> Iterator[Dict]:
+        """Iterate over per-sample result dicts."""
+        for i in range(len(self)):
+            yield self.record(i)
+
+
+def score_batch(image_ids: List[str], true_labels: Sequence[str], probabilities: np.ndarray,
+                detected: np.ndarray, latency_ms: Optional[np.ndarray] = None,
+                reused: Optional[np.ndarray] = None) -> ScoredBatch:
+    """
+    Score a batch of predictions in one vectorized pass.
+    
+    Args:
+        image_ids: Sample IDs
+        true_labels: Ground truth emotion per sample
+        probabilities: (N, classes) probabilities in EMOTION_LABELS order
+        detected: False for samples with no usable input (no detection)
+        latency_ms: Inference latency per sample (default 0)
+        reused: Whether each prediction came from the cache (default False)
+    
+    Returns:
+        ScoredBatch
+    """
+    n = len(image_ids)
+    detected = np.asarray(detected, dtype=bool)
+    probabilities = np.asarray(probabilities, dtype=np.float64).reshape(n, len(EMOTION_LABELS))
+    probabilities = np.where(detected[:, None], probabilities, 0.0)
+    true_index = label_indices(true_labels)
+    
+    predicted_index = np.where(detected, probabilities.argmax(axis=1), -1).astype(np.int16)
+    top2 = np.partition(probabilities, -2, axis=1)[:, -2:] if n else np.zeros((0, 2))
+    confidence = top2[:, 1]
+    margin = top2[:, 1] - top2[:, 0]
+    
+    # Ambiguity: top-2 emotions too close; penalise its confidence
+    is_ambiguous = detected & (margin < AMBIGUITY_THRESHOLD)
+    penalized_confidence = np.where(is_ambiguous, confidence * (1 - AMBIGUITY_PENALTY), confidence)
+    
+    correct = detected & (predicted_index == true_index)
+    failure_code = np.select(
+        [correct, ~detected, penalized_confidence < CONFIDENCE_THRESHOLD, is_ambiguous],
+        [FAILURE_NONE, FAILURE_NO_DETECTION, FAILURE_LOW_CONFIDENCE, FAILURE_AMBIGUOUS],
+        default=FAILURE_MISCLASSIFICATION,
+    ).astype(np.int8)
+    
+    return ScoredBatch(
+        image_ids=list(image_ids),
+        true_index=true_index,
+        probabilities=probabilities,
+        predicted_index=predicted_index,
+        confidence=confidence,
+        margin=margin,
+        is_ambiguous=is_ambiguous,
+        penalized_confidence=penalized_confidence,
+        correct=correct,
+        failure_code=failure_code,
+        latency_ms=np.zeros(n) if latency_ms is None else np.asarray(latency_ms, dtype=np.float64),
+        reused=np.zeros(n, dtype=bool) if reused is None else np.asarray(reused, dtype=bool),
+    )
@@ -0,0 +1,144 @@
+"""
+Autonomous Emotion Recognition Testing Pipeline - Prediction Cache
+==================================================================
+Persistent cache of raw model outputs.
+
+Entries are keyed by (model hash, backend, input tensor digest), so a
+prediction is reused exactly when the same model file would run on the
+same preprocessed input in the same runtime - regardless of which cycle
+or image ID produced it. Outputs are stored as raw float64 vectors in the
+model's own label order; probabilities are derived on read.
+"""
+
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from pipeline_config import PREDICTION_CACHE_PATH
+
+
+# Bump when _SCHEMA changes; a cache of another version is rebuilt (empty)
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    model_key    TEXT NOT NULL,
+    backend      TEXT NOT NULL,
+    input_digest TEXT NOT NULL,
+    output       BLOB NOT NULL,
+    PRIMARY KEY (model_key, backend, input_digest)
+);
+"""
+
+
+def tensor_digest(tensor: np.ndarray) -> str:
+    """
+    Hash a preprocessed input tensor.
+    
+    Args:
+        tensor: Input array (hashed without copying when C-contiguous)
+    
+    Returns:
+        Hex digest of the tensor's dtype, shape and bytes
+    """
+    tensor = np.ascontiguousarray(tensor)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{tensor.dtype.str}{tensor.shape}".encode("utf-8"))
+    digest.update(memoryview(tensor).cast("B"))
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    """
+    SQLite-backed store of raw model outputs.
+    
+    Writes are batched; call ``commit()`` (or use the cache as a context
+    manager) to make them durable. Methods may be called from several
+    threads; they are serialized on one connection.
+    """
+    
+    def __init__(self, path: Path = PREDICTION_CACHE_PATH):
+        """
+        Open (or create) the cache.
+        
+        Args:
+            path: SQLite database file
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=60, check_same_thread=False)
+        self._open_tables()
+        self._lock = threading.Lock()
+    
+    def _open_tables(self):
+        """Create the table, or rebuild it if it has another schema version."""
+        self._conn.execute("BEGIN IMMEDIATE")
+        (version,) = self._conn.execute("PRAGMA user_version").fetchone()
+        if version != SCHEMA_VERSION:
+            self._conn.execute("DROP TABLE IF EXISTS predictions")
+            self._conn.execute(_SCHEMA)
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.commit()
+    
+    def get_many(self, model_key: str, backend: str, digests: Iterable[str]) -> Dict[str, np.ndarray]:
+        """
+        Fetch cached outputs.
+        
+        Args:
+            model_key: Model content hash
+            backend: Inference runtime name
+            digests: Input tensor digests
+        
+        Returns:
+            {digest: raw output vector} for the digests present
+        """
+        found = {}
+        digests = list(dict.fromkeys(digests))
+        with self._lock:
+            for i in range(0, len(digests), 500):
+                batch = digests[i:i + 500]
+                rows = self._conn.execute(
+                    "SELECT input_digest, output FROM predictions "
+                    f"WHERE model_key = ? AND backend = ? AND input_digest IN ({','.join('?' * len(batch))})",
+                    [model_key, backend, *batch],
+                )
+                for digest, output in rows:
+                    found[digest] = np.frombuffer(output, dtype=np.float64)
+        return found
+    
+    def put_many(self, model_key: str, backend: str, items: List[Tuple[str, np.ndarray]]):
+        """
+        Store raw outputs.
+        
+        Args:
+            model_key: Model content hash
+            backend: Inference runtime name
+            items: (input digest, raw output vector) pairs
+        """
+        rows = [
+            (model_key, backend, digest, sqlite3.Binary(np.asarray(output, dtype=np.float64).tobytes()))
+            for digest, output in items
+        ]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?)", rows)
+    
+    def commit(self):
+        """Persist pending writes."""
+        with self._lock:
+            self._conn.commit()
+    
+    def close(self):
+        """Commit and close the database."""
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+    
+    def __enter__(self) -> "PredictionCache":
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,269 @@
+"""
+Autonomous Emotion Recognition Testing Pipeline - Preprocessing
+===============================================================
+Batch preprocessing of evaluation inputs into a preallocated buffer.
+
+Two input layouts are supported:
+- ``gray48``:       48x48 grayscale, 0-1, NHWC (the TFLite CNN)
+- ``imagenet224``:  center-cropped 224x224 RGB, ImageNet mean/std, NCHW
+                    (the AffectNet ONNX model, as in MLService)
+
+Each sample is written straight into its row of a contiguous float32 batch
+array and normalized in place with precomputed per-channel divisors and bias,
+so no per-image float temporaries are created.
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from pipeline_config import MODEL_INPUT_SHAPE, ONNX_INPUT_SHAPE, IMAGENET_MEAN, IMAGENET_STD
+
+
+@dataclass(frozen=True)
+class InputLayout:
+    """Shape and normalization of one model input."""
+    name: str
+    height: int
+    width: int
+    channels: int
+    channels_first: bool
+    mean: Tuple[float, ...]
+    std: Tuple[float, ...]
+    crop_square: bool  # Center crop to a square before resizing
+    resample: Optional[str] = None  # PIL filter name (None = PIL default)
+    
+    @property
+    def sample_shape(self) -> Tuple[int, int, int]:
+        """Shape of one sample without the batch dimension."""
+        if self.channels_first:
+            return (self.channels, self.height, self.width)
+        return (self.height, self.width, self.channels)
+    
+    @property
+    def pil_mode(self) -> str:
+        return "L" if self.channels == 1 else "RGB"
+
+
+GRAY48 = InputLayout(
+    name="gray48",
+    height=MODEL_INPUT_SHAPE[0],
+    width=MODEL_INPUT_SHAPE[1],
+    channels=MODEL_INPUT_SHAPE[2],
+    channels_first=False,
+    mean=(0.0,),
+    std=(1.0,),
+    crop_square=False,
+)
+
+IMAGENET224 = InputLayout(
+    name="imagenet224",
+    height=ONNX_INPUT_SHAPE[1],
+    width=ONNX_INPUT_SHAPE[2],
+    channels=ONNX_INPUT_SHAPE[0],
+    channels_first=True,
+    mean=IMAGENET_MEAN,
+    std=IMAGENET_STD,
+    crop_square=True,
+    resample="BICUBIC",
+)
+
+# Input layout of each EVAL_MODEL choice
+MODEL_LAYOUTS = {
+    "tflite": GRAY48,
+    "onnx": IMAGENET224,
+}
+
+
+class BatchPreprocessor:
+    """
+    Fills a preallocated float32 batch array with preprocessed samples.
+    
+    Rows are loaded one at a time (from image files, synthetic grayscale
+    planes or already-preprocessed tensors) and ``batch(n)`` returns a view
+    of the first n rows. The buffer is reused across batches: consume a
+    batch before loading the next one.
+    """
+    
+    def __init__(self, layout: InputLayout, capacity: int = 32):
+        """
+        Allocate the batch buffer.
+        
+        Args:
+            layout: Input layout to produce
+            capacity: Initial number of rows (grown on demand)
+        """
+        self.layout = layout
+        self._buffer = np.empty((max(1, capacity), *layout.sample_shape), dtype=np.float32)
+        
+        # Per-channel affine maps: 0-255 pixels or 0-1 values -> model input
+        channel_shape = (-1, 1, 1) if layout.channels_first else (1, 1, -1)
+        mean = np.array(layout.mean, dtype=np.float32).reshape(channel_shape)
+        std = np.array(layout.std, dtype=np.float32).reshape(channel_shape)
+        self._pixel_divisor = 255.0 * std
+        self._unit_divisor = std
+        self._bias = -mean / std
+        self._identity = not layout.mean[0] and all(s == 1.0 for s in layout.std)
+        
+        # Flat source index for nearest-neighbour upsampling of synthetic planes
+        self._upsample_index: Optional[np.ndarray] = None
+        self._upsample_source: Tuple[int, int] = (0, 0)
+    
+    @property
+    def capacity(self) -> int:
+        return len(self._buffer)
+    
+    def batch(self, n: int) -> np.ndarray:
+        """
+        Get a view of the first n rows, growing the buffer if needed.
+        
+        Growing discards previously loaded rows, so call this before loading.
+        """
+        if n > self.capacity:
+            self._buffer = np.empty((n, *self.layout.sample_shape), dtype=np.float32)
+        return self._buffer[:n]
+    
+    def owns(self, array: np.ndarray) -> bool:
+        """Whether an array is a view of this preprocessor's buffer."""
+        return np.may_share_memory(array, self._buffer)
+    
+    def _channel_planes(self, row: np.ndarray) -> List[np.ndarray]:
+        """2D views of each channel of a row."""
+        if self.layout.channels_first:
+            return [row[c] for c in range(self.layout.channels)]
+        return [row[:, :, c] for c in range(self.layout.channels)]
+    
+    def _normalize(self, row: np.ndarray, divisor: np.ndarray):
+        """Apply the layout's normalization to a row in place."""
+        if self._identity and divisor is self._unit_divisor:
+            return
+        np.divide(row, divisor, out=row)
+        if not self._identity:
+            np.add(row, self._bias, out=row)
+    
+    def decode(self, image) -> Optional[np.ndarray]:
+        """
+        Decode, crop and resize an image to the layout's size.
+        
+        Args:
+            image: Path to an image file, or a PIL image
+        
+        Returns:
+            uint8 HWC (or HW) pixels, or None if decoding failed
+        """
+        from PIL import Image
+        
+        layout = self.layout
+        try:
+            img = image if isinstance(image, Image.Image) else Image.open(image)
+            img = img.convert(layout.pil_mode)
+            
+            if layout.crop_square:
+                side = min(img.size)
+                left, top = (img.width - side) // 2, (img.height - side) // 2
+                img = img.crop((left, top, left + side, top + side))
+            
+            resample = getattr(Image, layout.resample) if layout.resample else None
+            img = img.resize((layout.width, layout.height), resample)
+            
+            return np.asarray(img)
+        except Exception as e:
+            print(f"  ⚠️ Failed to preprocess image: {e}")
+            return None
+    
+    def load_pixels(self, row: np.ndarray, pixels: np.ndarray):
+        """
+        Load decoded pixels (from ``decode``) into a batch row.
+        
+        Args:
+            row: Row of the array returned by ``batch``
+            pixels: uint8 HWC (or HW) pixels at the layout's size
+        """
+        if pixels.ndim == 2:
+            pixels = pixels[:, :, np.newaxis]
+        if self.layout.channels_first:
+            pixels = pixels.transpose(2, 0, 1)
+        
+        # Cast straight into the row, then normalize in place
+        np.copyto(row, pixels, casting="unsafe")
+        self._normalize(row, self._pixel_divisor)
+    
+    def load_image(self, row: np.ndarray, image) -> bool:
+        """
+        Decode an image into a batch row.
+        
+        Args:
+            row: Row of the array returned by ``batch``
+            image: Path to an image file, or a PIL image
+        
+        Returns:
+            True if the row was filled, False if decoding failed
+        """
+        pixels = self.decode(image)
+        if pixels is None:
+            return False
+        self.load_pixels(row, pixels)
+        return True
+    
+    def load_unit_gray(self, row: np.ndarray, plane: np.ndarray):
+        """
+        Load a 0-1 grayscale plane (e.g. a synthetic input) into a batch row.
+        
+        The plane is replicated across channels and nearest-neighbour
+        resized if it does not match the layout.
+        
+        Args:
+            row: Row of the array returned by ``batch``
+            plane: 2D array of values in 0-1
+        """
+        layout = self.layout
+        planes = self._channel_planes(row)
+        
+        if plane.shape == (layout.height, layout.width):
+            np.copyto(planes[0], plane)
+        else:
+            if self._upsample_source != plane.shape:
+                rows = np.arange(layout.height) * plane.shape[0] // layout.height
+                cols = np.arange(layout.width) * plane.shape[1] // layout.width
+                self._upsample_index = (rows[:, None] * plane.shape[1] + cols).ravel()
+                self._upsample_source = plane.shape
+            
+            source = np.ascontiguousarray(plane, dtype=np.float32).ravel()
+            if planes[0].flags.c_contiguous:
+                np.take(source, self._upsample_index, out=planes[0].reshape(-1))
+            else:
+                planes[0][...] = source[self._upsample_index].reshape(planes[0].shape)
+        
+        for other in planes[1:]:
+            np.copyto(other, planes[0])
+        
+        self._normalize(row, self._unit_divisor)
+    
+    def load_tensor(self, row: np.ndarray, tensor: np.ndarray):
+        """
+        Copy an already-preprocessed sample (e.g. from a cache) into a row.
+        
+        Args:
+            row: Row of the array returned by ``batch``
+            tensor: Sample in this layout, with or without a batch dimension
+        """
+        np.copyto(row, tensor.reshape(row.shape))
+    
+    def preprocess_paths(self, image_paths: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Decode a list of image files into one batch.
+        
+        Args:
+            image_paths: Image file paths
+        
+        Returns:
+            Tuple of (batch array view, bool mask of rows that decoded).
+            Rows that failed to decode hold undefined values.
+        """
+        batch = self.batch(len(image_paths))
+        ok = np.zeros(len(image_paths), dtype=bool)
+        for i, path in enumerate(image_paths):
+            ok[i] = self.load_image(batch[i], Path(path))
+        return batch, ok
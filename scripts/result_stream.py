@@ -0,0 +1,271 @@
+"""
+Autonomous Emotion Recognition Testing Pipeline - Result Streaming
+==================================================================
+Constant-memory aggregation and storage of evaluation results.
+
+Scored batches are folded into running aggregates (confusion matrix,
+per-emotion counts, failure breakdown and confidence) as they arrive, and
+their per-sample records are appended to a JSONL file, so evaluation memory
+does not grow with the number of samples. Per-stage latencies go into
+fixed-size histogram sketches.
+"""
+
+import json
+import math
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from pipeline_config import EMOTION_LABELS, get_predictions_path
+from postprocessing import FAILURE_TYPES, ScoredBatch
+
+
+class LatencySketch:
+    """
+    Fixed-size log-scale latency histogram.
+    
+    Values are counted in log-spaced bins between min_ms and max_ms, so
+    quantiles are accurate to about half a bin width (~2.3% relative at the
+    default 50 bins per decade) with memory independent of the sample count.
+    """
+    
+    def __init__(self, min_ms: float = 1e-3, max_ms: float = 1e5, bins_per_decade: int = 50):
+        """
+        Create an empty sketch.
+        
+        Args:
+            min_ms: Lower edge of the first bin (smaller values are clamped)
+            max_ms: Upper edge of the last bin (larger values are clamped)
+            bins_per_decade: Resolution of the histogram
+        """
+        self.min_ms = min_ms
+        self.bins_per_decade = bins_per_decade
+        num_bins = int(math.ceil(math.log10(max_ms / min_ms) * bins_per_decade))
+        self.counts = np.zeros(num_bins, dtype=np.int64)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.min_seen_ms = math.inf
+    
+    def add(self, values_ms: np.ndarray):
+        """Add latency values (ms)."""
+        values_ms = np.asarray(values_ms, dtype=np.float64).ravel()
+        if not len(values_ms):
+            return
+        
+        bins = np.floor(np.log10(np.maximum(values_ms, self.min_ms) / self.min_ms) * self.bins_per_decade)
+        bins = np.clip(bins, 0, len(self.counts) - 1).astype(np.int64)
+        self.counts += np.bincount(bins, minlength=len(self.counts))
+        self.count += len(values_ms)
+        self.total_ms += float(values_ms.sum())
+        self.max_ms = max(self.max_ms, float(values_ms.max()))
+        self.min_seen_ms = min(self.min_seen_ms, float(values_ms.min()))
+    
+    def merge(self, other: "LatencySketch"):
+        """Add the values of another sketch with the same bins."""
+        self.counts += other.counts
+        self.count += other.count
+        self.total_ms += other.total_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+        self.min_seen_ms = min(self.min_seen_ms, other.min_seen_ms)
+    
+    @property
+    def mean_ms(self) -> float:
+        return self.total_ms / self.count if self.count else 0.0
+    
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a latency quantile.
+        
+        Args:
+            q: Quantile in [0, 1]
+        
+        Returns:
+            Geometric midpoint of the bin holding the quantile, clamped to the
+            observed range (0.0 if the sketch is empty)
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, int(math.ceil(q * self.count)))
+        index = int(np.searchsorted(np.cumsum(self.counts), rank))
+        midpoint = self.min_ms * 10 ** ((index + 0.5) / self.bins_per_decade)
+        return min(max(midpoint, self.min_seen_ms), self.max_ms)
+    
+    def percentiles(self, percentiles: Tuple[int, ...] = (50, 90, 95, 99)) -> Dict[str, float]:
+        """Quantiles keyed "p50", "p90", ... plus "max"."""
+        summary = {f"p{p}": self.quantile(p / 100) for p in percentiles}
+        summary["max"] = self.max_ms
+        return summary
+
+
+# Measured evaluation stages, in pipeline order
+LATENCY_STAGES = ["decode", "preprocess", "invoke", "postprocess"]
+
+
+class StageLatencies:
+    """
+    Latency sketches per evaluation stage, in ms per sample.
+    
+    Per-sample stages (decode, preprocess) record each sample; batch stages
+    (invoke, postprocess) record the batch time divided over its samples.
+    """
+    
+    def __init__(self):
+        self.sketches: Dict[str, LatencySketch] = {}
+    
+    def add(self, stage: str, values_ms):
+        """Add latency values (ms per sample) for a stage."""
+        if stage not in self.sketches:
+            self.sketches[stage] = LatencySketch()
+        self.sketches[stage].add(values_ms)
+    
+    def get(self, stage: str) -> LatencySketch:
+        """Sketch of a stage (empty if nothing was recorded)."""
+        return self.sketches.get(stage, LatencySketch())
+    
+    def merge(self, other: "StageLatencies"):
+        """Add another collection's values, stage by stage."""
+        for stage, sketch in other.sketches.items():
+            if stage not in self.sketches:
+                self.sketches[stage] = LatencySketch()
+            self.sketches[stage].merge(sketch)
+    
+    def report(self, stages: Optional[List[str]] = None) -> Dict[str, Dict[str, float]]:
+        """
+        Summarize stages.
+        
+        Args:
+            stages: Stages to include (default: all recorded)
+        
+        Returns:
+            {stage: {count, mean, p50, p90, p95, p99, max}} for stages with values
+        """
+        stages = stages if stages is not None else list(self.sketches)
+        return {
+            stage: {"count": sketch.count, "mean": sketch.mean_ms, **sketch.percentiles()}
+            for stage, sketch in ((stage, self.get(stage)) for stage in stages)
+            if sketch.count
+        }
+
+
+class StreamingAggregates:
+    """Running totals of the aggregate evaluation metrics."""
+    
+    def __init__(self):
+        num_labels = len(EMOTION_LABELS)
+        self.confusion = np.zeros((num_labels, num_labels), dtype=np.int64)
+        self.totals = np.zeros(num_labels, dtype=np.int64)
+        self.corrects = np.zeros(num_labels, dtype=np.int64)
+        self.failure_counts = np.zeros(len(FAILURE_TYPES), dtype=np.int64)
+        self.total_samples = 0
+        self.reused = 0
+        self.confidence_sum = 0.0
+    
+    def update(self, scored: ScoredBatch):
+        """Fold one scored batch into the aggregates."""
+        num_labels = len(EMOTION_LABELS)
+        self.totals += np.bincount(scored.true_index, minlength=num_labels)
+        self.corrects += np.bincount(scored.true_index[scored.correct], minlength=num_labels)
+        self.failure_counts += np.bincount(scored.failure_code, minlength=len(FAILURE_TYPES))
+        
+        # Samples with no detection have no predicted class to count
+        detected = scored.predicted_index >= 0
+        np.add.at(self.confusion, (scored.true_index[detected], scored.predicted_index[detected]), 1)
+        
+        self.total_samples += len(scored)
+        self.reused += int(scored.reused.sum())
+        self.confidence_sum += float(scored.penalized_confidence.sum())
+    
+    @property
+    def correct_predictions(self) -> int:
+        return int(self.corrects.sum())
+    
+    @property
+    def mean_confidence(self) -> float:
+        return self.confidence_sum / self.total_samples if self.total_samples else 0.0
+    
+    def per_emotion_counts(self) -> Dict[str, Dict[str, int]]:
+        return {
+            e: {"correct": int(self.corrects[i]), "total": int(self.totals[i])}
+            for i, e in enumerate(EMOTION_LABELS)
+        }
+    
+    def per_emotion_accuracy(self) -> Dict[str, float]:
+        return {
+            e: self.corrects[i] / self.totals[i] if self.totals[i] > 0 else 0.0
+            for i, e in enumerate(EMOTION_LABELS)
+        }
+    
+    def confusion_matrix(self) -> Dict[str, Dict[str, int]]:
+        return {
+            e: dict(zip(EMOTION_LABELS, self.confusion[i].tolist())) for i, e in enumerate(EMOTION_LABELS)
+        }
+    
+    def failure_breakdown(self) -> Dict[str, int]:
+        return {name: int(self.failure_counts[code]) for code, name in enumerate(FAILURE_TYPES) if name}
+
+
+class PredictionSink:
+    """Appends per-sample result records to a JSONL file."""
+    
+    def __init__(self, path: Path):
+        """
+        Open (and truncate) the sink.
+        
+        Args:
+            path: JSONL file to write
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "w")
+        self.count = 0
+    
+    def write(self, scored: ScoredBatch):
+        """Append the records of a scored batch."""
+        self._file.writelines(json.dumps(record) + "\n" for record in scored.records())
+        self.count += len(scored)
+    
+    def close(self):
+        self._file.close()
+    
+    def __enter__(self) -> "PredictionSink":
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_predictions(path: Path) -> Iterator[Dict]:
+    """Iterate over the records of a prediction sink file."""
+    with open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_individual_results(results_data: Dict, cycle_number: Optional[int] = None) -> Iterator[Dict]:
+    """
+    Iterate over the per-sample results of an evaluation.
+    
+    Streamed results are read from their JSONL file line by line, so the
+    records are never all held in memory at once.
+    
+    Args:
+        results_data: Loaded results JSON
+        cycle_number: Cycle of the results (defaults to results_data's)
+    
+    Yields:
+        Records embedded in the results, or read from the streamed JSONL
+        file when the evaluation streamed them
+    """
+    if results_data.get("individual_results"):
+        yield from results_data["individual_results"]
+        return
+    
+    path = results_data.get("predictions_path")
+    if path is None:
+        path = get_predictions_path(cycle_number or results_data["cycle_number"])
+    path = Path(path)
+    if path.exists():
+        yield from iter_predictions(path)
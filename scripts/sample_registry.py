@@ -0,0 +1,129 @@
+"""
+Autonomous Emotion Recognition Testing Pipeline - Sample Registry
+=================================================================
+Cross-cycle registry of generated samples, keyed by content-addressed
+image IDs.
+
+Because image IDs are derived from (emotion, variation, content seed,
+generator version), the same sample requested in a later cycle gets the
+same ID. The registry remembers where each sample's content was stored so
+a later cycle can reuse it instead of regenerating it. (Model predictions
+are cached separately, by input tensor, in prediction_cache.)
+"""
+
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+from pipeline_config import SAMPLE_REGISTRY_PATH
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    image_id     TEXT PRIMARY KEY,
+    emotion      TEXT NOT NULL,
+    image_path   TEXT NOT NULL,
+    shard_path   TEXT NOT NULL,
+    shard_offset INTEGER NOT NULL,
+    shard_length INTEGER NOT NULL,
+    first_cycle  INTEGER NOT NULL,
+    last_cycle   INTEGER NOT NULL
+);
+DROP TABLE IF EXISTS artifacts;
+"""
+
+
+class SampleRegistry:
+    """
+    SQLite-backed registry of generated samples.
+    
+    Writes are batched; call ``commit()`` (or use the registry as a context
+    manager) to make them durable.
+    """
+    
+    def __init__(self, path: Path = SAMPLE_REGISTRY_PATH):
+        """
+        Open (or create) the registry.
+        
+        Args:
+            path: SQLite database file
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.executescript(_SCHEMA)
+        self._exists_cache: Dict[str, bool] = {}
+    
+    def _storage_exists(self, image_path: str, shard_path: str) -> bool:
+        """Check (with caching per shard) that a sample's content is still on disk."""
+        path = shard_path or str(Path(image_path).with_suffix(".json"))
+        if path not in self._exists_cache:
+            self._exists_cache[path] = Path(path).exists() or Path(image_path).exists()
+        return self._exists_cache[path]
+    
+    def lookup_images(self, image_ids: Iterable[str]) -> Dict[str, Dict]:
+        """
+        Find registered samples whose stored content is still available.
+        
+        Args:
+            image_ids: IDs to look up
+        
+        Returns:
+            {image_id: {"image_path", "shard_path", "shard_offset", "shard_length"}}
+        """
+        found = {}
+        ids = list(image_ids)
+        for i in range(0, len(ids), 500):
+            batch = ids[i:i + 500]
+            rows = self._conn.execute(
+                "SELECT image_id, image_path, shard_path, shard_offset, shard_length "
+                f"FROM images WHERE image_id IN ({','.join('?' * len(batch))})",
+                batch,
+            )
+            for image_id, image_path, shard_path, shard_offset, shard_length in rows:
+                if self._storage_exists(image_path, shard_path):
+                    found[image_id] = {
+                        "image_path": image_path,
+                        "shard_path": shard_path,
+                        "shard_offset": shard_offset,
+                        "shard_length": shard_length,
+                    }
+        return found
+    
+    def register_images(self, cycle_number: int, images: List[Dict]):
+        """
+        Record where samples are stored, or mark existing ones as reused.
+        
+        Samples generated again (their stored content was gone) get their
+        new location.
+        
+        Args:
+            cycle_number: Cycle that generated (or reused) the samples
+            images: Dicts with image_id, emotion_label, image_path and shard fields
+        """
+        self._conn.executemany(
+            "INSERT INTO images VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(image_id) DO UPDATE SET image_path = excluded.image_path, "
+            "shard_path = excluded.shard_path, shard_offset = excluded.shard_offset, "
+            "shard_length = excluded.shard_length, last_cycle = excluded.last_cycle",
+            [
+                (m["image_id"], m["emotion_label"], m["image_path"], m["shard_path"],
+                 m["shard_offset"], m["shard_length"], cycle_number, cycle_number)
+                for m in images
+            ],
+        )
+    
+    def commit(self):
+        """Persist pending writes."""
+        self._conn.commit()
+    
+    def close(self):
+        """Commit and close the database."""
+        self._conn.commit()
+        self._conn.close()
+    
+    def __enter__(self) -> "SampleRegistry":
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
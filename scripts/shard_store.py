@@ -0,0 +1,249 @@
+"""
+Autonomous Emotion Recognition Testing Pipeline - Shard Store
+=============================================================
+Append-only packed containers for generated image records.
+
+A shard is a pair of files:
+- ``shard_NNNNN.bin``: records back to back, each prefixed with its length
+  as a little-endian uint32
+- ``shard_NNNNN.idx.npy``: int64 array of shape (N, 2) holding the payload
+  offset and length of every record
+
+The index makes random access a single ``pread`` (a locked seek + read where
+``os.pread`` is unavailable, e.g. on Windows); the length prefixes let the
+index be rebuilt by a sequential scan if it is ever lost.
+"""
+
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from pipeline_config import SHARD_MAX_BYTES
+
+
+_LENGTH_PREFIX = struct.Struct("<I")
+_HAS_PREAD = hasattr(os, "pread")
+
+
+def _index_path(shard_path: Path) -> Path:
+    """Get the offset index path for a shard data file."""
+    return shard_path.with_suffix(".idx.npy")
+
+
+def _scan_index(shard_path: Path) -> np.ndarray:
+    """Rebuild a shard's offset index by scanning its length prefixes."""
+    entries = []
+    with open(shard_path, "rb") as f:
+        offset = 0
+        while True:
+            prefix = f.read(_LENGTH_PREFIX.size)
+            if len(prefix) < _LENGTH_PREFIX.size:
+                break
+            (length,) = _LENGTH_PREFIX.unpack(prefix)
+            offset += _LENGTH_PREFIX.size
+            entries.append((offset, length))
+            f.seek(length, os.SEEK_CUR)
+            offset += length
+    return np.array(entries, dtype=np.int64).reshape(-1, 2)
+
+
+def load_index(shard_path: Path) -> np.ndarray:
+    """
+    Load a shard's offset index, rebuilding it from the data file if missing.
+    
+    Args:
+        shard_path: Path to the shard data file
+    
+    Returns:
+        int64 array of (offset, length) rows
+    """
+    index_path = _index_path(Path(shard_path))
+    if index_path.exists():
+        return np.load(index_path)
+    return _scan_index(Path(shard_path))
+
+
+class ShardWriter:
+    """
+    Appends records to size-capped shards in a directory.
+    
+    Records are written in bulk with one ``write`` per batch; the offset
+    index of each shard is persisted when the shard is rolled over or the
+    writer is closed. Reopening a directory appends after existing shards.
+    """
+    
+    def __init__(self, shard_dir: Path, prefix: str = "shard", max_bytes: int = SHARD_MAX_BYTES):
+        """
+        Initialize the writer.
+        
+        Args:
+            shard_dir: Directory holding the shards
+            prefix: File name prefix for shards
+            max_bytes: Roll over to a new shard once this size is reached
+        """
+        self.shard_dir = Path(shard_dir)
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self._file = None
+        self._path: Optional[Path] = None
+        self._index: List[Tuple[int, int]] = []
+        self._size = 0
+        self._shard_number = self._next_shard_number()
+    
+    def _next_shard_number(self) -> int:
+        """Find the number of the last existing shard (or 0)."""
+        existing = sorted(self.shard_dir.glob(f"{self.prefix}_*.bin"))
+        if not existing:
+            return 0
+        return int(existing[-1].stem.rsplit("_", 1)[1])
+    
+    def _open(self):
+        """Open the current shard for appending."""
+        self.shard_dir.mkdir(parents=True, exist_ok=True)
+        self._path = self.shard_dir / f"{self.prefix}_{self._shard_number:05d}.bin"
+        self._index = _scan_index(self._path).tolist() if self._path.exists() else []
+        self._file = open(self._path, "ab")
+        self._size = self._file.tell()
+    
+    def _close_current(self):
+        """Flush the current shard and persist its index."""
+        if self._file is None:
+            return
+        self._file.close()
+        np.save(_index_path(self._path), np.array(self._index, dtype=np.int64).reshape(-1, 2))
+        self._file = None
+    
+    def append_many(self, payloads: List[bytes]) -> List[Tuple[str, int, int]]:
+        """
+        Append a batch of records.
+        
+        Args:
+            payloads: Record payloads
+        
+        Returns:
+            (shard_path, offset, length) location of every record
+        """
+        locations = []
+        pending = []
+        
+        for payload in payloads:
+            if self._file is None:
+                self._open()
+            elif self._size >= self.max_bytes:
+                self._file.write(b"".join(pending))
+                pending = []
+                self._close_current()
+                self._shard_number += 1
+                self._open()
+            
+            offset = self._size + _LENGTH_PREFIX.size
+            pending.append(_LENGTH_PREFIX.pack(len(payload)))
+            pending.append(payload)
+            self._index.append((offset, len(payload)))
+            self._size = offset + len(payload)
+            locations.append((str(self._path), offset, len(payload)))
+        
+        if pending:
+            self._file.write(b"".join(pending))
+        
+        return locations
+    
+    def append(self, payload: bytes) -> Tuple[str, int, int]:
+        """Append a single record and return its location."""
+        return self.append_many([payload])[0]
+    
+    def close(self):
+        """Flush and index the open shard."""
+        self._close_current()
+    
+    def __enter__(self) -> "ShardWriter":
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ShardReader:
+    """Reads records from a single shard sequentially or by offset."""
+    
+    def __init__(self, shard_path: Path):
+        """
+        Open a shard for reading.
+        
+        Args:
+            shard_path: Path to the shard data file
+        """
+        self.shard_path = Path(shard_path)
+        self._fd = os.open(self.shard_path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        self._index: Optional[np.ndarray] = None
+        self._seek_lock = threading.Lock()  # Guards the shared file position without os.pread
+    
+    @property
+    def index(self) -> np.ndarray:
+        """The shard's (offset, length) index, loaded on first use."""
+        if self._index is None:
+            self._index = load_index(self.shard_path)
+        return self._index
+    
+    def __len__(self) -> int:
+        return len(self.index)
+    
+    def read_at(self, offset: int, length: int) -> bytes:
+        """Read one record payload by byte offset."""
+        if _HAS_PREAD:
+            return os.pread(self._fd, length, offset)
+        with self._seek_lock:
+            os.lseek(self._fd, offset, os.SEEK_SET)
+            return os.read(self._fd, length)
+    
+    def read(self, record_index: int) -> bytes:
+        """Read one record payload by its position in the shard."""
+        offset, length = self.index[record_index]
+        return self.read_at(int(offset), int(length))
+    
+    def __iter__(self) -> Iterator[bytes]:
+        """Iterate over all record payloads in write order."""
+        with open(self.shard_path, "rb", buffering=1024 * 1024) as f:
+            for offset, length in self.index.tolist():
+                f.seek(offset)
+                yield f.read(length)
+    
+    def close(self):
+        """Close the underlying file descriptor."""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+    
+    def __enter__(self) -> "ShardReader":
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ShardReaderPool:
+    """Keeps one open ShardReader per shard path (safe to share across threads)."""
+    
+    def __init__(self):
+        self._readers: Dict[str, ShardReader] = {}
+        self._lock = threading.Lock()
+    
+    def read_at(self, shard_path: str, offset: int, length: int) -> bytes:
+        """Read a record payload from any shard by byte offset."""
+        reader = self._readers.get(shard_path)
+        if reader is None:
+            with self._lock:
+                reader = self._readers.get(shard_path)
+                if reader is None:
+                    reader = self._readers[shard_path] = ShardReader(Path(shard_path))
+        return reader.read_at(offset, length)
+    
+    def close(self):
+        """Close every open reader."""
+        for reader in self._readers.values():
+            reader.close()
+        self._readers.clear()
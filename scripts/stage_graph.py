@@ -0,0 +1,338 @@
+"""
+Autonomous Emotion Recognition Testing Pipeline - Stage Graph
+=============================================================
+Memoized Generate → Evaluate → Analyze → Tune stages with resume.
+
+Each cycle runs the stages in CYCLE_STAGES. A stage's key hashes everything
+its output depends on: the cycle number, the output digests of its upstream
+stages (in this cycle, and for carried stages in the previous one), every
+uppercase pipeline_config value (except the loop-control options in
+RUN_CONTROL_OPTIONS), the source of the modules that implement it (and of
+every local module they import) and any input files (e.g. the model). Completed stages are recorded in a
+SQLite store with their output digest, a small JSON payload and the files
+they wrote. A rerun reuses a stage whose key is recorded and whose files
+still exist, so an interrupted run resumes where it stopped and a config or
+code change recomputes only the stages it reaches.
+
+Downstream keys use upstream *output* digests, so a recomputed stage that
+produces the same output does not invalidate the stages after it.
+"""
+
+import ast
+import copy
+import hashlib
+import json
+import sqlite3
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pipeline_config
+from pipeline_config import SCRIPTS_DIR, STAGE_STORE_PATH
+from background_writer import BackgroundWriter, persist
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stages (
+    key        TEXT PRIMARY KEY,
+    stage      TEXT NOT NULL,
+    cycle      INTEGER NOT NULL,
+    digest     TEXT NOT NULL,
+    payload    TEXT NOT NULL,
+    artifacts  TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS stages_by_cycle ON stages (stage, cycle);
+"""
+
+
+# pipeline_config options that steer the loop or its I/O scheduling but never
+# change what a stage computes; every other option is part of every stage key
+RUN_CONTROL_OPTIONS = frozenset({
+    "MAX_CYCLES", "PLATEAU_CYCLES", "PLATEAU_THRESHOLD", "CYCLE_LOG_FREQUENCY",
+    "PHASE_HANDOFF", "WRITER_QUEUE_DEPTH", "STAGE_CACHE",
+})
+
+
+@dataclass(frozen=True)
+class Stage:
+    """A node of the per-cycle stage graph."""
+    name: str
+    inputs: Tuple[str, ...] = ()    # Upstream stages of the same cycle
+    carried: Tuple[str, ...] = ()   # Upstream stages of the previous cycle
+    modules: Tuple[str, ...] = ()   # Source files (in SCRIPTS_DIR) implementing it; local imports are followed
+
+
+# The main loop's stages, in execution order
+CYCLE_STAGES = [
+    Stage(
+        "generate",
+        carried=("tune",),
+        modules=("data_generator.py", "metadata_store.py", "shard_store.py"),
+    ),
+    Stage(
+        "evaluate",
+        inputs=("generate",),
+        modules=("model_evaluator.py", "inference_backend.py", "preprocessing.py",
+                 "postprocessing.py", "result_stream.py", "tensor_cache.py", "prediction_cache.py",
+                 "eval_pipeline.py", "shard_store.py", "metadata_store.py"),
+    ),
+    Stage(
+        "analyze",
+        inputs=("generate", "evaluate"),
+        modules=("failure_analyzer.py", "bias_cube.py", "confidence_intervals.py",
+                 "metadata_store.py", "postprocessing.py", "result_stream.py"),
+    ),
+    Stage(
+        "tune",
+        inputs=("evaluate", "analyze"),
+        carried=("tune",),
+        modules=("auto_tuner.py",),
+    ),
+]
+
+
+def content_digest(value: Any) -> str:
+    """Hash a JSON-serializable value (key order does not matter)."""
+    payload = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def config_digest() -> str:
+    """Hash the current value of every pipeline_config option that can affect a stage."""
+    return content_digest({
+        name: value for name, value in vars(pipeline_config).items()
+        if name.isupper() and name not in RUN_CONTROL_OPTIONS
+    })
+
+
+def local_imports(module: str) -> List[str]:
+    """Source files in SCRIPTS_DIR that a module imports directly."""
+    tree = ast.parse((SCRIPTS_DIR / module).read_text(encoding="utf-8"))
+    names = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.append(node.module)
+    return sorted({f"{name}.py" for name in names if (SCRIPTS_DIR / f"{name}.py").exists()})
+
+
+def file_digest(path: Path) -> Optional[str]:
+    """Hash a file's content (None if it does not exist)."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@dataclass
+class StageRecord:
+    """A completed stage."""
+    key: str
+    stage: str
+    cycle: int
+    digest: str              # Content digest of the stage's output
+    payload: Dict            # What later stages and the loop need without re-reading files
+    artifacts: List[str]     # Files the stage wrote
+    created_at: str
+    
+    def artifacts_exist(self) -> bool:
+        return all(Path(p).exists() for p in self.artifacts)
+
+
+class StageStore:
+    """
+    SQLite-backed store of completed stages, keyed by stage key.
+    
+    Every record is committed as it is written, so a run that dies keeps the
+    stages it finished. Methods may be called from several threads; they are
+    serialized on one connection.
+    """
+    
+    def __init__(self, path: Path = STAGE_STORE_PATH):
+        """
+        Open (or create) the store.
+        
+        Args:
+            path: SQLite database file
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=60, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[StageRecord]:
+        """Fetch the record of a stage key (None if not recorded)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT key, stage, cycle, digest, payload, artifacts, created_at FROM stages WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if row is None:
+            return None
+        key, stage, cycle, digest, payload, artifacts, created_at = row
+        return StageRecord(key, stage, cycle, digest, json.loads(payload), json.loads(artifacts), created_at)
+    
+    def put(self, record: StageRecord):
+        """Store (or replace) a record and commit it."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO stages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (record.key, record.stage, record.cycle, record.digest,
+                 json.dumps(record.payload), json.dumps(record.artifacts), record.created_at),
+            )
+            self._conn.commit()
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+    
+    def __enter__(self) -> "StageStore":
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+class StageGraph:
+    """
+    Keys, looks up and records the stages of each cycle.
+    
+    Output digests of the stages seen so far (run or reused) are kept in
+    memory, since they are the inputs of the next stages' keys.
+    """
+    
+    def __init__(self, stages: List[Stage] = CYCLE_STAGES, store: Optional[StageStore] = None,
+                 reuse: bool = True):
+        """
+        Set up the graph.
+        
+        Args:
+            stages: Stages of one cycle, in execution order
+            store: Record store (default: StageStore at STAGE_STORE_PATH)
+            reuse: Reuse recorded stages (False = recompute and re-record
+                every stage)
+        """
+        self.stages = {stage.name: stage for stage in stages}
+        self.store = store if store is not None else StageStore()
+        self.reuse = reuse
+        self.digests: Dict[Tuple[str, int], str] = {}
+        self._module_digests: Dict[str, Optional[str]] = {}
+        self._stage_modules: Dict[str, List[str]] = {}
+        self.reused = 0
+        self.computed = 0
+    
+    def _module_digest(self, module: str) -> Optional[str]:
+        if module not in self._module_digests:
+            self._module_digests[module] = file_digest(SCRIPTS_DIR / module)
+        return self._module_digests[module]
+    
+    def modules(self, name: str) -> List[str]:
+        """A stage's modules plus every local module they import, transitively."""
+        if name not in self._stage_modules:
+            found = set()
+            pending = list(self.stages[name].modules)
+            while pending:
+                module = pending.pop()
+                if module not in found:
+                    found.add(module)
+                    pending.extend(local_imports(module))
+            self._stage_modules[name] = sorted(found)
+        return self._stage_modules[name]
+    
+    def key(self, name: str, cycle: int, extra: Optional[Dict] = None) -> str:
+        """
+        Key of a stage in a cycle.
+        
+        Args:
+            name: Stage name
+            cycle: Cycle number
+            extra: Additional inputs (e.g. input file digests)
+        
+        Returns:
+            Hex digest of the stage's inputs, config and code
+        
+        Raises:
+            KeyError: If an upstream stage of the cycle has not been seen yet
+        """
+        stage = self.stages[name]
+        return content_digest({
+            "stage": name,
+            "cycle": cycle,
+            "inputs": {upstream: self.digests[(upstream, cycle)] for upstream in stage.inputs},
+            "carried": {upstream: self.digests.get((upstream, cycle - 1)) for upstream in stage.carried},
+            "config": config_digest(),
+            "code": {module: self._module_digest(module) for module in self.modules(name)},
+            "extra": extra or {},
+        })
+    
+    def lookup(self, name: str, cycle: int, key: str) -> Optional[StageRecord]:
+        """
+        Find a reusable record of a stage.
+        
+        Args:
+            name: Stage name
+            cycle: Cycle number
+            key: The stage's key (see ``key``)
+        
+        Returns:
+            The record if reuse is on, the key is recorded and the stage's
+            files still exist; None otherwise. A returned record counts as
+            the stage's output.
+        """
+        if not self.reuse:
+            return None
+        record = self.store.get(key)
+        if record is None or not record.artifacts_exist():
+            return None
+        self.digests[(name, cycle)] = record.digest
+        self.reused += 1
+        return record
+    
+    def complete(self, name: str, cycle: int, key: str, output: Any, payload: Optional[Dict] = None,
+                 artifacts: Iterable[Path] = (), writer: Optional[BackgroundWriter] = None) -> str:
+        """
+        Record a stage that has just run.
+        
+        Args:
+            name: Stage name
+            cycle: Cycle number
+            key: The stage's key
+            output: JSON-serializable value identifying the stage's output
+                (its content digest feeds the keys of downstream stages)
+            payload: JSON-serializable data to return when the stage is reused
+            artifacts: Files the stage wrote
+            writer: Background writer the stage's files were queued on; the
+                record is queued behind them so it is never stored before
+                its files
+        
+        Returns:
+            The output digest
+        """
+        digest = content_digest(output)
+        self.digests[(name, cycle)] = digest
+        self.computed += 1
+        # Snapshot: the caller may keep changing the payload while the record is queued
+        payload = copy.deepcopy(payload or {})
+        record = StageRecord(
+            key=key,
+            stage=name,
+            cycle=cycle,
+            digest=digest,
+            payload=payload,
+            artifacts=[str(p) for p in artifacts],
+            created_at=datetime.now().isoformat(),
+        )
+        persist(self.store.put, record, writer=writer, description=f"stage record {name}@{cycle}")
+        return digest
+    
+    def close(self):
+        self.store.close()
@@ -0,0 +1,324 @@
+"""
+Autonomous Emotion Recognition Testing Pipeline - Tensor Cache
+==============================================================
+Persistent, memory-mapped cache of preprocessed model inputs.
+
+Tensors are keyed by image ID (content-addressed, see DataGenerator) plus
+the preprocessing layout. Rows are appended to fixed-capacity ``.npy``
+segments, opened with ``numpy.lib.format.open_memmap``. A writer takes over
+the fullest partially filled segment that no other writer holds, and starts
+a new one only when none is left, so short runs keep filling the same
+files. A SQLite index maps image IDs to (segment, row, tensor digest). Reads return views
+into the memory-mapped segments, so rows that were written consecutively
+can feed inference as a single zero-copy slice.
+
+The cache is capped by the size of its segment files and evicts whole
+segments, least recently used first.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from pipeline_config import TENSOR_CACHE_DIR, TENSOR_CACHE_MAX_BYTES, TENSOR_CACHE_SEGMENT_ROWS
+from preprocessing import InputLayout
+
+
+# Bump when _SCHEMA changes; an index of another version is rebuilt (empty)
+SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    name      TEXT PRIMARY KEY,
+    rows_used INTEGER NOT NULL,
+    row_bytes INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    image_id TEXT PRIMARY KEY,
+    segment  TEXT NOT NULL,
+    row      INTEGER NOT NULL,
+    digest   TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_segment ON entries (segment);
+CREATE TABLE IF NOT EXISTS writers (
+    segment TEXT PRIMARY KEY,
+    owner   TEXT NOT NULL
+);
+"""
+
+
+def layout_key(layout: InputLayout) -> str:
+    """Cache namespace for a preprocessing layout (name + config hash)."""
+    digest = hashlib.sha1(repr(layout).encode("utf-8")).hexdigest()[:8]
+    return f"{layout.name}-{digest}"
+
+
+class TensorCache:
+    """
+    Memory-mapped preprocessed tensors for one input layout.
+    
+    Several processes may share a cache directory: a writer claims a segment
+    in the ``writers`` table before appending to it, and the index serializes
+    through SQLite. Call ``flush()`` to publish written rows to other readers;
+    it also releases the claim so the next writer (in any process) continues
+    the same segment. Within a
+    process, methods may be called from several threads.
+    """
+    
+    def __init__(self, layout: InputLayout, cache_dir: Path = TENSOR_CACHE_DIR,
+                 max_bytes: int = TENSOR_CACHE_MAX_BYTES,
+                 segment_rows: int = TENSOR_CACHE_SEGMENT_ROWS):
+        """
+        Open (or create) the cache for a layout.
+        
+        Args:
+            layout: Preprocessing layout of the cached tensors
+            cache_dir: Root directory of the cache
+            max_bytes: Size cap enforced by ``enforce_limit``
+            segment_rows: Rows per segment file
+        """
+        self.layout = layout
+        self.dir = Path(cache_dir) / layout_key(layout)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.segment_rows = segment_rows
+        self.row_bytes = int(np.prod(layout.sample_shape)) * np.dtype(np.float32).itemsize
+        
+        self._conn = sqlite3.connect(str(self.dir / "index.sqlite"), timeout=60, check_same_thread=False)
+        self._open_index()
+        self._lock = threading.RLock()
+        
+        self._segments: Dict[str, np.ndarray] = {}  # name -> memmap
+        self._writer: Optional[str] = None
+        self._writer_rows = 0
+        self._owner = f"{os.getpid()}_{uuid.uuid4().hex[:8]}"
+        self._touched: set = set()
+    
+    def _open_index(self):
+        """Create the index, or rebuild it (dropping its segments) if it has another schema version."""
+        self._conn.execute("BEGIN IMMEDIATE")
+        (version,) = self._conn.execute("PRAGMA user_version").fetchone()
+        if version != SCHEMA_VERSION:
+            for table in ("entries", "segments", "writers"):
+                self._conn.execute(f"DROP TABLE IF EXISTS {table}")
+            for path in self.dir.glob("seg_*.npy"):
+                path.unlink(missing_ok=True)
+            for statement in _SCHEMA.split(";"):
+                if statement.strip():
+                    self._conn.execute(statement)
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.commit()
+    
+    def _segment_path(self, name: str) -> Path:
+        return self.dir / f"{name}.npy"
+    
+    def _segment(self, name: str) -> np.ndarray:
+        """Memory-map a segment (read-only unless this process writes it)."""
+        with self._lock:
+            if name not in self._segments:
+                self._segments[name] = np.load(self._segment_path(name), mmap_mode="r")
+            return self._segments[name]
+    
+    def lookup(self, image_ids: Iterable[str]) -> Dict[str, Tuple[str, int, str]]:
+        """
+        Find cached tensors.
+        
+        Args:
+            image_ids: IDs to look up
+        
+        Returns:
+            {image_id: (segment, row, digest)} for the IDs present
+        """
+        with self._lock:
+            found = {}
+            ids = list(image_ids)
+            for i in range(0, len(ids), 500):
+                batch = ids[i:i + 500]
+                rows = self._conn.execute(
+                    "SELECT image_id, segment, row, digest FROM entries "
+                    f"WHERE image_id IN ({','.join('?' * len(batch))})",
+                    batch,
+                )
+                for image_id, segment, row, digest in rows:
+                    found[image_id] = (segment, row, digest)
+                    self._touched.add(segment)
+            return found
+    
+    def row(self, location: Tuple[str, int, str]) -> np.ndarray:
+        """Zero-copy view of one cached tensor."""
+        segment, row = location[:2]
+        return self._segment(segment)[row]
+    
+    def contiguous_slice(self, locations: List[Tuple[str, int, str]]) -> Optional[np.ndarray]:
+        """
+        Zero-copy view of several tensors if they are consecutive rows.
+        
+        Args:
+            locations: Locations from ``lookup``, in the wanted order
+        
+        Returns:
+            View of shape (len(locations), ...) or None if not consecutive
+        """
+        if not locations:
+            return None
+        segment, first = locations[0][:2]
+        for offset, (other, row, _) in enumerate(locations):
+            if other != segment or row != first + offset:
+                return None
+        return self._segment(segment)[first:first + len(locations)]
+    
+    def _claim_segment(self):
+        """Take over the fullest partially filled free segment, or start a new one."""
+        self._conn.commit()
+        candidates = self._conn.execute(
+            "SELECT name FROM segments WHERE rows_used < ? AND row_bytes = ? "
+            "AND name NOT IN (SELECT segment FROM writers) ORDER BY rows_used DESC",
+            (self.segment_rows, self.row_bytes),
+        ).fetchall()
+        for (name,) in candidates:
+            path = self._segment_path(name)
+            if not path.exists():
+                continue
+            try:
+                self._conn.execute("INSERT INTO writers VALUES (?, ?)", (name, self._owner))
+            except sqlite3.IntegrityError:
+                continue  # Claimed by another writer since the query
+            self._conn.commit()
+            
+            # Re-read the row count: its previous writer may have appended since the query
+            (rows_used,) = self._conn.execute(
+                "SELECT rows_used FROM segments WHERE name = ?", (name,)
+            ).fetchone()
+            segment = np.load(path, mmap_mode="r+")
+            if rows_used >= len(segment):
+                self._conn.execute("DELETE FROM writers WHERE segment = ?", (name,))
+                self._conn.commit()
+                continue
+            self._writer, self._writer_rows = name, rows_used
+            self._segments[name] = segment
+            return
+        self._new_segment()
+    
+    def _new_segment(self):
+        """Start a segment claimed by this writer."""
+        self._writer = f"seg_{int(time.time())}_{os.getpid()}_{uuid.uuid4().hex[:8]}"
+        self._writer_rows = 0
+        self._segments[self._writer] = np.lib.format.open_memmap(
+            self._segment_path(self._writer), mode="w+", dtype=np.float32,
+            shape=(self.segment_rows, *self.layout.sample_shape),
+        )
+        self._conn.execute(
+            "INSERT INTO segments VALUES (?, 0, ?, ?)", (self._writer, self.row_bytes, time.time())
+        )
+        self._conn.execute("INSERT INTO writers VALUES (?, ?)", (self._writer, self._owner))
+        self._conn.commit()
+    
+    def put(self, image_id: str, tensor: np.ndarray, digest: str) -> Tuple[str, int, str]:
+        """
+        Append a tensor to the segment this writer has claimed.
+        
+        Args:
+            image_id: Sample ID
+            tensor: Preprocessed sample in this layout
+            digest: Tensor digest (see prediction_cache.tensor_digest)
+        
+        Returns:
+            (segment, row, digest) where it was stored
+        """
+        with self._lock:
+            if self._writer is None or self._writer_rows >= len(self._segments[self._writer]):
+                self._release_writer()
+                self._claim_segment()
+            
+            segment, row = self._writer, self._writer_rows
+            np.copyto(self._segments[segment][row], tensor.reshape(self.layout.sample_shape))
+            self._writer_rows += 1
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", (image_id, segment, row, digest)
+            )
+            return segment, row, digest
+    
+    def _release_writer(self):
+        """Flush the claimed segment, record its row count and release the claim."""
+        if self._writer is None:
+            return
+        self._segments[self._writer].flush()
+        self._conn.execute(
+            "UPDATE segments SET rows_used = ? WHERE name = ?", (self._writer_rows, self._writer)
+        )
+        self._conn.execute("DELETE FROM writers WHERE segment = ?", (self._writer,))
+        self._writer = None
+    
+    def flush(self):
+        """Publish written rows, release the claimed segment and refresh recency of segments read."""
+        with self._lock:
+            self._release_writer()
+            now = time.time()
+            self._conn.executemany(
+                "UPDATE segments SET last_used = ? WHERE name = ?", [(now, s) for s in self._touched]
+            )
+            self._touched.clear()
+            self._conn.commit()
+    
+    def _file_bytes(self, name: str) -> int:
+        path = self._segment_path(name)
+        return path.stat().st_size if path.exists() else 0
+    
+    def size_bytes(self) -> int:
+        """Bytes held by the segment files (full capacity, not just used rows)."""
+        with self._lock:
+            names = self._conn.execute("SELECT name FROM segments").fetchall()
+            return sum(self._file_bytes(name) for (name,) in names)
+    
+    def enforce_limit(self) -> int:
+        """
+        Evict least recently used segments until the cache fits max_bytes.
+        
+        Segments claimed by a writer (in any process) are never evicted.
+        
+        Returns:
+            Number of segments evicted
+        """
+        with self._lock:
+            self.flush()
+            total = self.size_bytes()
+            evicted = 0
+            
+            for (name,) in self._conn.execute(
+                "SELECT name FROM segments WHERE name NOT IN (SELECT segment FROM writers) "
+                "ORDER BY last_used"
+            ).fetchall():
+                if total <= self.max_bytes:
+                    break
+                
+                size = self._file_bytes(name)
+                self._conn.execute("DELETE FROM entries WHERE segment = ?", (name,))
+                self._conn.execute("DELETE FROM segments WHERE name = ?", (name,))
+                self._conn.commit()
+                self._segments.pop(name, None)
+                self._segment_path(name).unlink(missing_ok=True)
+                total -= size
+                evicted += 1
+            
+            return evicted
+    
+    def close(self):
+        """Flush pending writes and release the memory maps."""
+        with self._lock:
+            self.flush()
+            self._segments.clear()
+            self._conn.close()
+    
+    def __enter__(self) -> "TensorCache":
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
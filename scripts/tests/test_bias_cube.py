@@ -0,0 +1,27 @@
+"""The sparse bias cube must roll up to the same counts as a dense one."""
+
+import numpy as np
+
+from bias_cube import CUBE_DIMENSIONS, NO_PREDICTION, BiasCube
+from pipeline_config import EMOTION_LABELS
+
+
+def test_rollups_match_dense_counts(tmp_path):
+    rng = np.random.default_rng(0)
+    samples = 5000
+    codes = {d: rng.integers(0, len(c), samples) for d, c in CUBE_DIMENSIONS.items()}
+    true = rng.integers(0, len(EMOTION_LABELS), samples)
+    predicted = rng.integers(-1, len(EMOTION_LABELS), samples)
+    
+    cube = BiasCube.load(BiasCube.build(1, true, predicted, codes).save(tmp_path / "cube.npz"))
+    
+    dense = np.zeros((len(CUBE_DIMENSIONS["skin_tone"]), len(EMOTION_LABELS), NO_PREDICTION + 1), dtype=np.int64)
+    np.add.at(dense, (codes["skin_tone"], true, np.where(predicted >= 0, predicted, NO_PREDICTION)), 1)
+    assert len(cube.cells) <= samples
+    assert np.array_equal(cube.rollup(["skin_tone"]), dense)
+    assert cube.total_samples == samples
+    assert cube.overall_accuracy == np.mean(true == predicted)
+    
+    lighting = CUBE_DIMENSIONS["lighting_condition"]
+    sliced = cube.slice({"skin_tone": CUBE_DIMENSIONS["skin_tone"][0], "lighting_condition": lighting[:2]})
+    assert sliced.total_samples == int(np.sum((codes["skin_tone"] == 0) & (codes["lighting_condition"] < 2)))
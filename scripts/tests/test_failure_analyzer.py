@@ -0,0 +1,22 @@
+"""A bias gap must compare the same categories as its bootstrap interval."""
+
+import numpy as np
+import pytest
+
+from failure_analyzer import FailureAnalyzer
+
+
+def test_bias_gap_ignores_empty_categories():
+    analyzer = FailureAnalyzer()
+    analyzer._cached_summary = {
+        "dimensions": {
+            "lighting_condition": (["bright", "dim", "backlit"], np.array([9, 6, 0]), np.array([10, 10, 0])),
+        },
+    }
+    
+    (report,) = analyzer.analyze_bias()
+    
+    assert report.bias_gap == pytest.approx(0.3)
+    assert report.min_category == "dim"
+    assert report.gap_interval[0] <= report.bias_gap <= report.gap_interval[1]
+    assert "backlit" not in report.category_intervals
@@ -0,0 +1,38 @@
+"""Stage keys must change whenever an input of the stage changes."""
+
+import pytest
+
+import pipeline_config
+from stage_graph import StageGraph, StageStore
+
+
+@pytest.fixture
+def graph(tmp_path):
+    graph = StageGraph(store=StageStore(tmp_path / "stages.sqlite"))
+    graph.digests[("generate", 1)] = "generate-output"
+    graph.digests[("evaluate", 1)] = "evaluate-output"
+    yield graph
+    graph.close()
+
+
+@pytest.mark.parametrize("stage, option, value", [
+    ("generate", "GENERATION_CHUNK_SIZE", 7),
+    ("generate", "STRATIFIED_MIN_PER_PAIR", 9),
+    ("evaluate", "AMBIGUITY_THRESHOLD", 0.9),
+    ("analyze", "EMOTION_LABELS", ["Happy", "Sad"]),
+])
+def test_config_change_changes_key(graph, monkeypatch, stage, option, value):
+    before = graph.key(stage, 1)
+    monkeypatch.setattr(pipeline_config, option, value)
+    assert graph.key(stage, 1) != before
+
+
+def test_run_control_option_keeps_key(graph, monkeypatch):
+    before = graph.key("evaluate", 1)
+    monkeypatch.setattr(pipeline_config, "MAX_CYCLES", 1)
+    assert graph.key("evaluate", 1) == before
+
+
+def test_modules_follow_local_imports(graph):
+    modules = graph.modules("generate")
+    assert {"data_generator.py", "pipeline_config.py", "sample_registry.py"} <= set(modules)